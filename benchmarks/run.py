@@ -0,0 +1,117 @@
+from __future__ import annotations
+import argparse, hashlib, json, os, platform, statistics, sys, tempfile, time
+from collections import defaultdict
+from dataclasses import asdict
+from pathlib import Path
+from duplicate_finder.core import DuplicateScanner
+from duplicate_finder.services import HashCache
+from .synthetic import TreeSpec, ensure_tree
+
+BASELINE = Path(__file__).with_name("baseline.json")
+
+def _scan(root: str, cache_path: Path, workers: int, algorithm: str, pipeline: bool) -> tuple[dict[str, float], dict[str, int]]:
+    # زمان هر مرحله از ScanResult.metrics خود اسکنر می‌آید؛ بنچمارک به متدهای داخلی اسکنر دست نمی‌زند.
+    cache = HashCache(cache_path, batched=True)
+    started = time.perf_counter()
+    try:
+        result = DuplicateScanner([root], cache=cache, workers=workers, algorithm=algorithm, pipeline=pipeline).scan(True, .86, 0)
+    finally:
+        cache.close()
+    timings = {"scan": time.perf_counter() - started, "sqlite": result.metrics.sqlite_seconds}
+    timings.update((x.name, x.wall_seconds) for x in result.metrics.stages)
+    counts = {"files": result.scanned_files, "candidates": result.candidate_files, "groups": len(result.duplicate_groups),
+              "hardlink_groups": len(result.hardlink_groups), "similar_groups": len(result.similar_groups)}
+    return timings, counts
+
+def run(root: str, work: Path, repeat: int, workers: int, algorithm: str) -> tuple[dict, dict[str, int]]:
+    # سرد یعنی کش هش خالی (کش صفحه سیستم‌عامل بدون دسترسی مدیر خالی نمی‌شود)؛ گرم یعنی اجرای دوم روی همان کش.
+    samples: dict[str, dict[str, list[float]]] = {"cold": defaultdict(list), "warm": defaultdict(list)}
+    counts: dict[str, int] = {}
+    for attempt in range(repeat):
+        for name in ("phased", "pipeline"):
+            path = work / f"{name}-{attempt}.sqlite3"
+            for leftover in work.glob(path.name + "*"):
+                leftover.unlink()
+            for mode in ("cold", "warm"):
+                timings, counts = _scan(root, path, workers, algorithm, name == "pipeline")
+                for stage, seconds in timings.items():
+                    samples[mode][f"{name}.{stage}"].append(seconds)
+    results = {mode: {stage: {"median": statistics.median(values), "min": min(values)} for stage, values in stages.items()}
+               for mode, stages in samples.items()}
+    return results, counts
+
+def compare(current: dict, baseline: dict, tolerance: float, min_delta: float) -> list[str]:
+    # کندی فقط وقتی گزارش می‌شود که هم نسبی (tolerance) و هم مطلق (min_delta ثانیه) از حد بگذرد.
+    if current["spec"] != baseline.get("spec"):
+        return ["baseline was recorded with a different tree spec; re-record it with --save-baseline"]
+    problems = []
+    if current["counts"] != baseline.get("counts"):
+        problems.append(f"result counts changed: {baseline.get('counts')} -> {current['counts']}")
+    for mode, stages in current["results"].items():
+        for stage, value in stages.items():
+            before = baseline.get("results", {}).get(mode, {}).get(stage, {}).get("median")
+            now = value["median"]
+            if before and now > before * (1 + tolerance) and now - before > min_delta:
+                problems.append(f"{mode}/{stage}: {before:.3f}s -> {now:.3f}s (+{now / before - 1:.0%})")
+    return problems
+
+def build_parser() -> argparse.ArgumentParser:
+    defaults = TreeSpec()
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Time scan stages on a synthetic tree")
+    parser.add_argument("--files", type=int, default=defaults.files)
+    parser.add_argument("--depth", type=int, default=defaults.depth)
+    parser.add_argument("--fanout", type=int, default=defaults.fanout)
+    parser.add_argument("--median-size", type=int, default=defaults.median_size, help="median file size in bytes (log-normal)")
+    parser.add_argument("--size-sigma", type=float, default=defaults.size_sigma)
+    parser.add_argument("--max-size", type=int, default=defaults.max_size)
+    parser.add_argument("--duplicate-ratio", type=float, default=defaults.duplicate_ratio)
+    parser.add_argument("--same-size-ratio", type=float, default=defaults.same_size_ratio,
+                        help="files with an existing size but different content")
+    parser.add_argument("--hardlink-ratio", type=float, default=defaults.hardlink_ratio)
+    parser.add_argument("--name-variant-ratio", type=float, default=defaults.name_variant_ratio)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--tree", type=Path, default=None, help="where to keep the generated tree (reused while the spec matches)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=max(2, min(8, os.cpu_count() or 4)))
+    parser.add_argument("--algorithm", default="sha256")
+    parser.add_argument("--output", "-o", type=Path, default=None, help="write results JSON here (default stdout)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=.2, help="allowed slowdown as a fraction of the baseline")
+    parser.add_argument("--min-delta", type=float, default=.05, help="ignore slowdowns smaller than this many seconds")
+    return parser
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    spec = TreeSpec(args.files, args.depth, args.fanout, args.median_size, args.size_sigma, args.max_size,
+                    args.duplicate_ratio, args.same_size_ratio, args.hardlink_ratio, args.name_variant_ratio, seed=args.seed)
+    key = hashlib.blake2b(json.dumps(asdict(spec), sort_keys=True).encode(), digest_size=6).hexdigest()
+    base = args.tree or Path(tempfile.gettempdir()) / "duplicate_finder_bench" / key
+    started = time.perf_counter()
+    stats = ensure_tree(base, spec)
+    print(f"tree {base} files={stats.files} bytes={stats.bytes} ({time.perf_counter() - started:.1f}s)", file=sys.stderr)
+    with tempfile.TemporaryDirectory(prefix="duplicate_finder_bench_") as work:
+        results, counts = run(str(base / "tree"), Path(work), max(1, args.repeat), args.workers, args.algorithm)
+    report = {"spec": asdict(spec), "tree": asdict(stats), "counts": counts, "results": results,
+              "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                              "cpus": os.cpu_count(), "workers": args.workers, "algorithm": args.algorithm},
+              "recorded": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    if args.save_baseline:
+        args.baseline.write_text(text, encoding="utf-8")
+        print(f"baseline saved to {args.baseline}", file=sys.stderr)
+        return 0
+    if not args.baseline.exists():
+        print(f"no baseline at {args.baseline}; run with --save-baseline to record one", file=sys.stderr)
+        return 0
+    problems = compare(report, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance, args.min_delta)
+    for problem in problems:
+        print(f"REGRESSION {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+from __future__ import annotations
+import json, math, os, random, shutil
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from duplicate_finder.core.hash_engine import QUICK_BLOCK
+
+@dataclass(slots=True)
+class TreeSpec:
+    files: int = 2000
+    depth: int = 3
+    fanout: int = 5
+    median_size: int = 16 * 1024
+    size_sigma: float = 1.4
+    max_size: int = 8 * 1024 * 1024
+    duplicate_ratio: float = .2
+    same_size_ratio: float = .1
+    hardlink_ratio: float = .02
+    name_variant_ratio: float = .1
+    extensions: list[str] = field(default_factory=lambda: [".jpg", ".png", ".mp4", ".pdf", ".docx", ".txt"])
+    seed: int = 1
+
+@dataclass(slots=True)
+class TreeStats:
+    files: int = 0
+    bytes: int = 0
+    duplicates: int = 0
+    same_size: int = 0
+    hardlinks: int = 0
+    name_variants: int = 0
+
+_VARIANTS = ("{stem} (1){ext}", "{stem} - Copy{ext}", "{stem}_copy{ext}", "{stem}-2{ext}", "{upper}{ext}", "copy of {stem}{ext}")
+
+def _payload(seed: int, size: int) -> bytearray:
+    # محتوای قطعی: یک بلوک تصادفی با seed ثابت تکرار می‌شود و seed در ابتدا و انتها نوشته می‌شود
+    # تا هر فایل اصلی (حتی هم‌اندازه) در هش سریع هم یکتا باشد.
+    rng = random.Random(seed)
+    block = rng.randbytes(min(size, 1 << 16)) or b""
+    data = bytearray((block * (size // max(1, len(block)) + 1))[:size])
+    mark = seed.to_bytes(8, "little")
+    data[:8] = mark[:min(8, size)]
+    if size > 16:
+        data[-8:] = mark
+    return data
+
+def _folders(root: Path, spec: TreeSpec) -> list[Path]:
+    folders, level = [root], [root]
+    for depth in range(spec.depth):
+        level = [parent / f"d{depth}_{i}" for parent in level for i in range(spec.fanout)]
+        folders.extend(level)
+    return folders
+
+def generate_tree(root: Path, spec: TreeSpec) -> TreeStats:
+    # هر فایل یکی از این‌هاست: اصلی با اندازه log-normal، کپی دقیق یک فایل قبلی، هم‌اندازه با محتوای
+    # متفاوت (برای فایل‌های بزرگ‌تر از دو بلوک هش سریع فقط وسط فایل فرق دارد تا به هش کامل برسد)،
+    # یا پیوند سخت. نام بخشی از فایل‌ها گونه‌ای از نام فایل دیگری است تا نام‌های مشابه هم سنجیده شوند.
+    rng = random.Random(spec.seed)
+    folders = _folders(root, spec)
+    for folder in folders:
+        folder.mkdir(parents=True, exist_ok=True)
+    stats = TreeStats()
+    originals: list[tuple[int, int]] = []
+    written: list[Path] = []
+    names: list[str] = []
+    for index in range(spec.files):
+        roll = rng.random()
+        extension = rng.choice(spec.extensions)
+        name = f"file_{index:06d}{extension}"
+        if names and rng.random() < spec.name_variant_ratio:
+            stem, ext = os.path.splitext(rng.choice(names))
+            name = rng.choice(_VARIANTS).format(stem=stem, upper=stem.upper(), ext=ext)
+            stats.name_variants += 1
+        path = rng.choice(folders) / name
+        if path.exists():
+            path = path.with_name(f"{index}_{name}")
+        names.append(path.name)
+        if written and roll < spec.hardlink_ratio:
+            try:
+                os.link(rng.choice(written), path)
+                stats.hardlinks += 1
+                stats.files += 1
+                written.append(path)
+                continue
+            except OSError:
+                roll = 1.0
+        if originals and roll < spec.hardlink_ratio + spec.duplicate_ratio:
+            seed, size = rng.choice(originals)
+            data = _payload(seed, size)
+            stats.duplicates += 1
+        elif originals and roll < spec.hardlink_ratio + spec.duplicate_ratio + spec.same_size_ratio:
+            seed, size = rng.choice(originals)
+            if size > 2 * QUICK_BLOCK:
+                data = _payload(seed, size)
+                data[size // 2] ^= 0xFF
+            else:
+                data = _payload(spec.seed * 1_000_003 + index, size)
+            stats.same_size += 1
+        else:
+            size = max(1, min(spec.max_size, int(rng.lognormvariate(math.log(spec.median_size), spec.size_sigma))))
+            seed = spec.seed * 1_000_003 + index
+            originals.append((seed, size))
+            data = _payload(seed, size)
+        path.write_bytes(data)
+        written.append(path)
+        stats.files += 1
+        stats.bytes += len(data)
+    return stats
+
+def ensure_tree(root: Path, spec: TreeSpec) -> TreeStats:
+    # درخت ساخته‌شده با همان مشخصات دوباره ساخته نمی‌شود؛ مشخصات و آمار کنار درخت ذخیره می‌شوند.
+    marker = root / "tree.json"
+    try:
+        saved = json.loads(marker.read_text(encoding="utf-8"))
+        if saved["spec"] == asdict(spec):
+            return TreeStats(**saved["stats"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    if root.exists():
+        shutil.rmtree(root)
+    stats = generate_tree(root / "tree", spec)
+    marker.write_text(json.dumps({"spec": asdict(spec), "stats": asdict(stats)}), encoding="utf-8")
+    return stats
@@ -0,0 +1,232 @@
+from __future__ import annotations
+import argparse, json, signal, sys, threading
+from pathlib import Path
+from typing import TextIO
+from duplicate_finder.core import Cancelled, DuplicateScanner
+from duplicate_finder.models import DuplicateGroup
+from duplicate_finder.services import AppConfig, CacheMaintenance, CheckpointError, FileIndex, HashCache, ScanCheckpoint
+from duplicate_finder.services.config import CACHE_PATH
+
+def group_record(group: DuplicateGroup, kind: str = "") -> dict:
+    removals = {f.path for f in group.suggested_removals}
+    return {
+        "type": kind or ("duplicate" if group.exact else "similar"),
+        "size": group.files[0].size,
+        "digest": group.files[0].digest,
+        "keeper": group.keeper.path,
+        "reclaimable_bytes": group.reclaimable_bytes,
+        **({"shared_bytes": group.shared_bytes} if group.shared_bytes else {}),
+        "files": [{"path": f.path, "size": f.size, "modified_ns": f.modified_ns, "priority": f.priority,
+                   "protected": f.protected, "links": f.links, "suggested_removal": f.path in removals} for f in group.files],
+    }
+
+class JsonLinesWriter:
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def write(self, record: dict) -> None:
+        with self.lock:
+            self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.stream.flush()
+
+def build_parser(cfg: AppConfig) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="duplicate_finder", description="Duplicate Finder")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("gui", help="open the desktop window (default)")
+    scan = commands.add_parser("scan", help="scan folders and stream duplicate groups as JSON Lines")
+    scan.add_argument("roots", nargs="*", help="folders to scan (default: saved scan_folders)")
+    scan.add_argument("--keep", default=None, help="Keep folder; files inside it are never suggested for removal")
+    scan.add_argument("--priority", action="append", default=None, help="priority folder, highest first (repeatable)")
+    scan.add_argument("--exclude-folder", action="append", default=None, help="folder to skip (repeatable)")
+    scan.add_argument("--exclude-ext", action="append", default=None, help="extension to skip, e.g. .tmp (repeatable)")
+    scan.add_argument("--rule", action="append", default=None,
+                      help="skip rule, later rules win: gitignore glob (node_modules/, /build/, **/*.tmp), "
+                           "re:REGEX, size:MIN..MAX, age:MIN..MAX (30d..), mtime:FROM..TO; prefix ! to re-include (repeatable)")
+    scan.add_argument("--min-size", type=int, default=None, help=f"minimum file size in bytes (default {cfg.min_size_bytes})")
+    scan.add_argument("--workers", type=int, default=None, help=f"hash workers (default {cfg.workers})")
+    scan.add_argument("--algorithm", default=None, help=f"hash algorithm (default {cfg.hash_algorithm})")
+    scan.add_argument("--include-hidden", action=argparse.BooleanOptionalAction, default=None)
+    scan.add_argument("--similar", action=argparse.BooleanOptionalAction, default=None,
+                      help="also report similar file names")
+    scan.add_argument("--threshold", type=float, default=None, help="similar name threshold (0..1)")
+    scan.add_argument("--similar-budget", type=float, default=None,
+                      help="seconds to spend on similar names before reporting what was found (0 = no limit)")
+    scan.add_argument("--overlap", type=int, default=None, metavar="PERCENT",
+                      help="report file pairs sharing at least PERCENT of the smaller file's bytes, found through "
+                           "content-defined chunks (0 disables); only pairs whose first chunk matches are compared, so "
+                           "truncated and appended copies are found but files with a rewritten header or prepended data are not")
+    scan.add_argument("--pipeline", action=argparse.BooleanOptionalAction, default=None,
+                      help="overlap walking, quick hashing and full hashing")
+    scan.add_argument("--cache", type=Path, default=None, help="hash cache database path")
+    scan.add_argument("--batched-cache", action=argparse.BooleanOptionalAction, default=None,
+                      help="prefetch cache rows and write new digests in batches")
+    scan.add_argument("--cache-gc", action="store_true",
+                      help="after a completed scan, drop stale cache rows, enforce the cache cap and compact")
+    scan.add_argument("--verify", choices=("hash", "lockstep", "bytes"), default=None,
+                      help="hash: full digest per file; lockstep: read each group together and stop at the first "
+                           "difference; bytes: lockstep with byte-for-byte confirmation")
+    scan.add_argument("--backend", choices=("thread", "process"), default=None,
+                      help="process: hash batches of files in worker processes (phased scan only)")
+    scan.add_argument("--mmap-threshold-mb", type=int, default=None,
+                      help="hash files at least this large through mmap (0 disables)")
+    scan.add_argument("--device-workers", action="append", default=None, metavar="FOLDER=N",
+                      help="hash concurrency for the disk holding FOLDER (repeatable)")
+    scan.add_argument("--auto-tune-io", action=argparse.BooleanOptionalAction, default=None,
+                      help="tune per-disk concurrency from measured throughput")
+    scan.add_argument("--incremental", action=argparse.BooleanOptionalAction, default=None,
+                      help="reuse the persistent file index and skip unchanged directories")
+    scan.add_argument("--trust-dir-mtime", action=argparse.BooleanOptionalAction, default=None,
+                      help="with --incremental, do not re-list directories whose mtime is unchanged")
+    scan.add_argument("--checkpoint", action=argparse.BooleanOptionalAction, default=None,
+                      help="periodically save the phased scan's file list and hashes so an interrupted scan can be resumed "
+                           "(off by default; saving starts after the walk, so a scan stopped while walking starts over)")
+    scan.add_argument("--checkpoint-interval", type=float, default=None,
+                      help=f"seconds between checkpoints (default {cfg.checkpoint_interval:g})")
+    scan.add_argument("--resume", action="store_true",
+                      help="continue the last interrupted scan from the end of its walk instead of walking again; changed files are re-checked")
+    scan.add_argument("--changes", action="store_true", help="write added/removed/modified files as records")
+    scan.add_argument("--output", "-o", type=Path, default=None, help="write JSON Lines here instead of stdout")
+    scan.add_argument("--progress", action="store_true", help="print progress to stderr")
+    scan.add_argument("--profile", action="append", default=None, metavar="STAGE[:MODE]",
+                      help="profile a stage (walk, size, quick, full, verify, partial, pipeline, group, similar or all); "
+                           "MODE sample (default) sees the worker threads, cprofile only the scanning thread (repeatable)")
+    scan.add_argument("--profile-dir", type=Path, default=None,
+                      help="write profiles here: STAGE.folded (flame graph input) or STAGE.prof (pstats)")
+    cache = commands.add_parser("cache", help="show hash cache statistics or run its maintenance")
+    cache.add_argument("action", choices=("stats", "gc"))
+    cache.add_argument("--cache", type=Path, default=None, help="hash cache database path")
+    cache.add_argument("--max-rows", type=int, default=None, help=f"row cap, oldest evicted first (default {cfg.cache_max_rows}, 0 = none)")
+    cache.add_argument("--max-mb", type=int, default=None, help=f"size cap in MB (default {cfg.cache_max_mb}, 0 = none)")
+    return parser
+
+def _pick(value, default):
+    return default if value is None else value
+
+def _device_workers(values: list[str] | None, default: dict[str, int]) -> dict[str, int]:
+    if values is None:
+        return default
+    limits: dict[str, int] = {}
+    for value in values:
+        folder, _, count = value.rpartition("=")
+        if not folder or not count.isdigit():
+            raise SystemExit(f"invalid --device-workers value: {value!r} (expected FOLDER=N)")
+        limits[folder] = int(count)
+    return limits
+
+def _profile(values: list[str] | None) -> dict[str, str]:
+    stages: dict[str, str] = {}
+    for value in values or []:
+        stage, _, mode = value.partition(":")
+        if not stage or mode not in ("", "sample", "cprofile"):
+            raise SystemExit(f"invalid --profile value: {value!r} (expected STAGE[:sample|cprofile])")
+        stages[stage] = mode or "sample"
+    return stages
+
+def _maintenance(args: argparse.Namespace, cfg: AppConfig) -> CacheMaintenance:
+    return CacheMaintenance(args.cache or CACHE_PATH, max_rows=_pick(getattr(args, "max_rows", None), cfg.cache_max_rows),
+                            max_bytes=_pick(getattr(args, "max_mb", None), cfg.cache_max_mb) * 1024 * 1024)
+
+def _gc_record(report) -> dict:
+    return {"type": "cache_gc", **report._asdict(), "seconds": round(report.seconds, 3), "stats": report.stats._asdict()}
+
+def run_cache(args: argparse.Namespace, cfg: AppConfig, stream: TextIO) -> int:
+    maintenance = _maintenance(args, cfg)
+    record = {"type": "cache_stats", **maintenance.stats()._asdict()}
+    if args.action == "gc":
+        report = maintenance.run()
+        record = _gc_record(report)
+    JsonLinesWriter(stream).write(record)
+    return 0
+
+def run_scan(args: argparse.Namespace, cfg: AppConfig, stream: TextIO) -> int:
+    checkpoint = ScanCheckpoint(interval=_pick(args.checkpoint_interval, cfg.checkpoint_interval)) \
+        if _pick(args.checkpoint, cfg.scan_checkpoint) or args.resume else None
+    # بدون پوشه صریح، ادامه روی همان پوشه‌های اسکن قطع‌شده انجام می‌شود.
+    info = checkpoint.info() if args.resume and not args.roots else None
+    if args.resume and not args.roots and info is None:
+        print("cannot resume: there is no interrupted scan to resume", file=sys.stderr)
+        return 2
+    roots = args.roots or (info["roots"] if info else cfg.scan_folders)
+    if not roots:
+        print("no folders to scan", file=sys.stderr)
+        return 2
+    writer = JsonLinesWriter(stream)
+    cancel = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            signal.signal(signum, lambda *_: cancel.set())
+        except ValueError:
+            pass
+    index = FileIndex(trust_dir_mtime=_pick(args.trust_dir_mtime, cfg.trust_directory_mtime)) \
+        if _pick(args.incremental, cfg.incremental_scan) else None
+    progress = (lambda s: print(f"[{s.percent:3d}%] {s.message}", file=sys.stderr, flush=True)) if args.progress else None
+    scanner = DuplicateScanner(
+        roots, keep_folder=_pick(args.keep, cfg.keep_folder), priority_folders=_pick(args.priority, cfg.priority_folders),
+        excluded_folders=_pick(args.exclude_folder, cfg.excluded_folders),
+        excluded_extensions=_pick(args.exclude_ext, cfg.excluded_extensions),
+        rules=_pick(args.rule, cfg.scan_rules), root_rules=cfg.root_rules,
+        min_size=_pick(args.min_size, cfg.min_size_bytes), workers=_pick(args.workers, cfg.workers),
+        algorithm=_pick(args.algorithm, cfg.hash_algorithm), include_hidden=_pick(args.include_hidden, cfg.include_hidden),
+        progress=progress, cancel_event=cancel,
+        cache=HashCache(args.cache or CACHE_PATH, batched=_pick(args.batched_cache, cfg.batched_cache)),
+        on_group=lambda group: writer.write(group_record(group)), pipeline=_pick(args.pipeline, cfg.pipeline_scan),
+        index=index, verify=_pick(args.verify, cfg.verify_mode),
+        backend=_pick(args.backend, cfg.hash_backend),
+        mmap_threshold=_pick(args.mmap_threshold_mb, cfg.mmap_threshold_mb) * 1024 * 1024,
+        device_workers=_device_workers(args.device_workers, cfg.device_workers),
+        auto_tune_io=_pick(args.auto_tune_io, cfg.auto_tune_io), overlap=_pick(args.overlap, cfg.overlap_percent) / 100,
+        profile=_profile(args.profile), profile_dir=args.profile_dir, checkpoint=checkpoint)
+    try:
+        result = scanner.scan(_pick(args.similar, cfg.detect_similar_names), _pick(args.threshold, cfg.similar_name_threshold),
+                              _pick(args.similar_budget, cfg.similar_time_budget), resume=args.resume)
+    except Cancelled:
+        writer.write({"type": "cancelled", "errors": len(scanner.errors),
+                      "resumable": checkpoint is not None and checkpoint.info() is not None})
+        return 130
+    except CheckpointError as exc:
+        print(f"cannot resume: {exc}", file=sys.stderr)
+        return 2
+    finally:
+        scanner.engine.cache.close()
+    for group in result.similar_groups:
+        writer.write(group_record(group))
+    for group in result.hardlink_groups:
+        writer.write(group_record(group, "hardlink"))
+    for group in result.overlap_groups:
+        writer.write(group_record(group, "overlap"))
+    if args.changes:
+        for kind in ("added", "removed", "modified"):
+            for path in getattr(result.changes, kind):
+                writer.write({"type": kind, "path": path})
+    for error in result.errors:
+        writer.write({"type": "error", "message": error})
+    writer.write({"type": "summary", "duplicate_groups": len(result.duplicate_groups),
+                  "similar_groups": len(result.similar_groups), "similar_complete": result.similar_complete, "hardlink_groups": len(result.hardlink_groups),
+                  "overlap_groups": len(result.overlap_groups),
+                  "reclaimable_bytes": result.reclaimable_bytes, "scanned_files": result.scanned_files,
+                  "candidate_files": result.candidate_files, "cache_hits": result.cache_hits,
+                  "cache_misses": result.cache_misses, "errors": len(result.errors),
+                  "added": len(result.changes.added), "removed": len(result.changes.removed),
+                  "modified": len(result.changes.modified), "skipped": result.skipped,
+                  "elapsed_seconds": round(result.elapsed_seconds, 3), "metrics": result.metrics.as_dict()})
+    for stage, text in result.metrics.profiles.items():
+        print(f"profile {stage}\n{text}", file=sys.stderr)
+    if args.cache_gc:
+        report = _maintenance(args, cfg).run(scanner.roots, result.files, result.listed_dirs)
+        writer.write(_gc_record(report))
+    return 0
+
+def main(argv: list[str] | None = None) -> int:
+    cfg = AppConfig.load()
+    args = build_parser(cfg).parse_args(argv)
+    if args.command == "cache":
+        return run_cache(args, cfg, sys.stdout)
+    if args.command != "scan":
+        from duplicate_finder.app import main as gui_main
+        gui_main()
+        return 0
+    if args.output:
+        with args.output.open("w", encoding="utf-8") as stream:
+            return run_scan(args, cfg, stream)
+    return run_scan(args, cfg, sys.stdout)
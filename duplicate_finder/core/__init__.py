@@ -1,5 +1,5 @@
 from .scanner import DuplicateScanner
 from .hash_engine import Cancelled
 from .priority import PriorityResolver
-from .actions import move_to_backup, restore_moves, delete_empty_folders
-__all__ = ["DuplicateScanner", "Cancelled", "PriorityResolver", "move_to_backup", "restore_moves", "delete_empty_folders"]
+from .actions import move_to_backup, restore_moves, undo_last, link_duplicates, delete_empty_folders
+__all__ = ["DuplicateScanner", "Cancelled", "PriorityResolver", "move_to_backup", "restore_moves", "undo_last", "link_duplicates", "delete_empty_folders"]
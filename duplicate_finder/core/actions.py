@@ -1,42 +1,196 @@
 from __future__ import annotations
-import os, shutil
+import errno, os, shutil, uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Iterable
+from duplicate_finder.models import DuplicateGroup, FileInfo
+from duplicate_finder.services import HashCache, MoveJournal, get_logger
 from .priority import PriorityResolver
 
-def move_to_backup(paths: Iterable[str], scan_root: str, backup_name: str, resolver: PriorityResolver) -> tuple[list[tuple[str,str]], list[str]]:
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+FICLONE = 0x40049409
+
+class _Names:
+    # نام‌های موجود پوشه پشتیبان یک بار خوانده می‌شوند و برای هر نام پایه شماره بعدی نگه داشته می‌شود؛
+    # هزار فایل IMG_0001.jpg دیگر هزار بار exists نمی‌زنند.
+    def __init__(self, folder: Path):
+        self.taken = {os.path.normcase(name) for name in os.listdir(folder)}
+        self.next: dict[str, int] = {}
+
+    def claim(self, name: str) -> str:
+        stem, suffix = os.path.splitext(name)
+        candidate, key = name, os.path.normcase(name)
+        index = self.next.get(key, 1)
+        while os.path.normcase(candidate) in self.taken:
+            candidate = f"{stem}_{index}{suffix}"
+            index += 1
+        self.next[key] = index
+        self.taken.add(os.path.normcase(candidate))
+        return candidate
+
+def _move(src: str, dst: str, same_device: bool) -> None:
+    # روی همان دستگاه فقط تغییر نام (اتمی و بدون کپی)؛ بین دستگاه‌ها کپی و سپس حذف.
+    if same_device:
+        os.rename(src, dst)
+    else:
+        shutil.move(src, dst)
+
+def move_to_backup(paths: Iterable[str], scan_root: str, backup_name: str, resolver: PriorityResolver, *,
+                   journal: MoveJournal | None = None, workers: int = 4,
+                   cache: HashCache | None = None) -> tuple[list[tuple[str,str]], list[str]]:
     backup = Path(scan_root) / backup_name
     backup.mkdir(parents=True, exist_ok=True)
-    moved: list[tuple[str, str]] = []
+    device = os.stat(backup).st_dev
+    names = _Names(backup)
     errors: list[str] = []
-    for raw in paths:
+    local: list[tuple[str, str]] = []
+    remote: list[tuple[str, str]] = []
+    for raw in dict.fromkeys(paths):
         if resolver.is_protected(raw):
             errors.append(f"محافظت‌شده (Keep): {raw}")
             continue
         try:
-            src = Path(raw)
-            target = backup / src.name
-            index = 1
-            while target.exists():
-                target = backup / f"{src.stem}_{index}{src.suffix}"
-                index += 1
-            shutil.move(str(src), str(target))
-            moved.append((str(src), str(target)))
-        except Exception as exc:
+            same = os.stat(raw, follow_symlinks=False).st_dev == device
+        except OSError as exc:
             errors.append(f"{raw}: {exc}")
+            continue
+        (local if same else remote).append((raw, str(backup / names.claim(Path(raw).name))))
+    batch = journal.begin(local + remote) if journal is not None and (local or remote) else ""
+    moved: list[tuple[str, str]] = []
+    for src, dst in local:
+        try:
+            _move(src, dst, True)
+            moved.append((src, dst))
+        except OSError as exc:
+            errors.append(f"{src}: {exc}")
+    if remote:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="duplicate-move") as executor:
+            futures = [(src, dst, executor.submit(_move, src, dst, False)) for src, dst in remote]
+            for src, dst, future in futures:
+                try:
+                    future.result()
+                    moved.append((src, dst))
+                except Exception as exc:
+                    errors.append(f"{src}: {exc}")
+    if batch:
+        journal.commit(batch, len(moved))
+    _update_cache(cache, moved)
     return moved, errors
 
-def restore_moves(moves: Iterable[tuple[str, str]]) -> tuple[int, list[str]]:
-    restored, errors = 0, []
+def _update_cache(cache: HashCache | None, moves: list[tuple[str, str]]) -> None:
+    # خطای کش جابه‌جایی را ناموفق نمی‌کند؛ بدترین حالت یک بار هش دوباره است.
+    if cache is None or not moves:
+        return
+    try:
+        cache.moved(moves)
+    except Exception as exc:
+        get_logger().warning("cache update after move failed moves=%s error=%s", len(moves), exc)
+
+def restore_moves(moves: Iterable[tuple[str, str]], cache: HashCache | None = None) -> tuple[int, list[str]]:
+    errors: list[str] = []
+    restored: list[tuple[str, str]] = []
     for original, backup in reversed(list(moves)):
         try:
+            if os.path.lexists(original):
+                raise FileExistsError(f"مسیر اصلی دوباره ساخته شده است: {original}")
             Path(original).parent.mkdir(parents=True, exist_ok=True)
             shutil.move(backup, original)
-            restored += 1
+            restored.append((backup, original))
         except Exception as exc:
             errors.append(f"{backup}: {exc}")
+    _update_cache(cache, restored)
+    return len(restored), errors
+
+def undo_last(journal: MoveJournal, cache: HashCache | None = None) -> tuple[int, list[str]]:
+    # جابه‌جایی‌های ثبت‌شده‌ای که هرگز انجام نشدند (قطع وسط دسته) یا قبلاً برگشته‌اند رد می‌شوند.
+    batch = journal.last()
+    if batch is None:
+        return 0, []
+    pending = [(src, dst) for src, dst in batch.moves if os.path.lexists(dst) and not os.path.lexists(src)]
+    restored, errors = restore_moves(pending, cache)
+    if not errors:
+        journal.undone(batch.id)
     return restored, errors
 
+def _same_content(left: str, right: str, block: int = 1024 * 1024) -> bool:
+    with open(left, "rb", buffering=0) as a, open(right, "rb", buffering=0) as b:
+        while True:
+            chunk = a.read(block)
+            if chunk != b.read(block):
+                return False
+            if not chunk:
+                return True
+
+def _reflink(source: str, target: str) -> None:
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflink is not supported on this platform")
+    with open(source, "rb") as src, open(target, "xb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.unlink(target)
+            raise
+
+def _replace_with_link(kept: FileInfo, item: FileInfo, mode: str) -> str:
+    # محتوا پیش از جایگزینی دوباره مقایسه می‌شود، پیوند زیر نام موقت کنار فایل ساخته و با
+    # os.replace به‌صورت اتمی جای آن می‌نشیند؛ مسیر فایل عوض نمی‌شود.
+    stat = os.stat(item.path, follow_symlinks=False)
+    if (stat.st_size, stat.st_mtime_ns) != (item.size, item.modified_ns):
+        raise OSError(f"فایل پس از اسکن تغییر کرده است: {item.path}")
+    if stat.st_dev != os.stat(kept.path).st_dev:
+        raise OSError(errno.EXDEV, "نگه‌دار روی دستگاه دیگری است", item.path)
+    if not _same_content(kept.path, item.path):
+        raise OSError(f"محتوا با نگه‌دار یکسان نیست: {item.path}")
+    folder, name = os.path.split(item.path)
+    temporary = os.path.join(folder, f".{name}.{uuid.uuid4().hex[:8]}.link")
+    used = mode
+    try:
+        if mode in ("reflink", "auto"):
+            try:
+                _reflink(kept.path, temporary)
+                shutil.copystat(item.path, temporary)
+                used = "reflink"
+            except OSError as exc:
+                if mode == "reflink" or exc.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EXDEV, errno.ENOSYS, None):
+                    raise
+                used = "hardlink"
+        if used == "hardlink":
+            os.link(kept.path, temporary)
+        os.replace(temporary, item.path)
+    finally:
+        if os.path.lexists(temporary):
+            os.unlink(temporary)
+    return used
+
+def link_duplicates(groups: Iterable[DuplicateGroup], resolver: PriorityResolver, *, mode: str = "auto",
+                    paths: Iterable[str] | None = None) -> tuple[list[tuple[str, str]], list[str]]:
+    # هر پیشنهاد حذف در گروه‌های دقیق با reflink (FICLONE) یا پیوند سخت به نسخه نگه‌دار جایگزین
+    # می‌شود؛ فضا بی‌درنگ و بدون کپی آزاد می‌شود. auto اول reflink و در نبودش پیوند سخت.
+    wanted = set(paths) if paths is not None else None
+    linked: list[tuple[str, str]] = []
+    errors: list[str] = []
+    for group in groups:
+        if not group.exact:
+            continue
+        kept = next((f for f in group.files if f.protected), group.keeper)
+        for item in group.suggested_removals:
+            if wanted is not None and item.path not in wanted:
+                continue
+            if resolver.is_protected(item.path):
+                errors.append(f"محافظت‌شده (Keep): {item.path}")
+                continue
+            try:
+                _replace_with_link(kept, item, mode)
+                linked.append((item.path, kept.path))
+            except OSError as exc:
+                errors.append(f"{item.path}: {exc}")
+    return linked, errors
+
 def delete_empty_folders(roots: Iterable[str], backup_name: str) -> int:
     count = 0
     for root in roots:
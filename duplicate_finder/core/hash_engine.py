@@ -1,18 +1,161 @@
 from __future__ import annotations
-import hashlib, threading
+import hashlib, mmap, os, threading, time
 from pathlib import Path
+from typing import Callable
 from duplicate_finder.models import FileInfo
 from duplicate_finder.services import HashCache
+from .metrics import MetricsRecorder
+
+QUICK_BLOCK = 1024 * 1024
+FULL_BLOCK = 4 * 1024 * 1024
+CHUNK_MIN, CHUNK_MAX = 16 * 1024, 256 * 1024
+# هر بایت با جدول ثابتی به ۰ یا ۱ نگاشته می‌شود و مرز تکه جایی است که ۱۵ بایت پشت سر هم ۰ شوند؛
+# translate و find در C اجرا می‌شوند و مرز فقط به ۱۵ بایت آخر وابسته است. میانگین حدود ۶۴KB بعد از CHUNK_MIN.
+_MARK = bytes(hashlib.blake2b(bytes([i]), digest_size=1).digest()[0] & 1 for i in range(256))
+_RUN = bytes(15)
+# پیشوند نسخه اثر انگشت؛ اثر انگشت کش‌شده با روش قبلی دوباره حساب می‌شود.
+CHUNK_TAG = "c2"
+
+_buffers = threading.local()
 
 class Cancelled(RuntimeError):
     pass
 
+def buffer(size: int) -> memoryview:
+    # هر رشته (و هر پردازه) بافر ثابت خودش را دارد و readinto مستقیم در آن می‌نویسد؛
+    # برای هر تکه شیء bytes تازه‌ای ساخته نمی‌شود.
+    pool = getattr(_buffers, "pool", None)
+    if pool is None:
+        pool = _buffers.pool = {}
+    view = pool.get(size)
+    if view is None:
+        view = pool[size] = memoryview(bytearray(size))
+    return view
+
+def advise_sequential(fd: int) -> None:
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+
+def read_into(f, view: memoryview) -> int:
+    filled = 0
+    while filled < len(view):
+        count = f.readinto(view[filled:])
+        if not count:
+            break
+        filled += count
+    return filled
+
+def read_size(size: int, kind: str) -> int:
+    if kind == "head":
+        return min(size, CHUNK_MAX)
+    return min(size, 2 * QUICK_BLOCK) if kind == "quick" else size
+
+def quick_digest(path: str, size: int, algorithm: str) -> str:
+    h = hashlib.new(algorithm)
+    view = buffer(QUICK_BLOCK)
+    with open(path, "rb", buffering=0) as f:
+        h.update(view[:read_into(f, view)])
+        if size > QUICK_BLOCK * 2:
+            f.seek(size - QUICK_BLOCK)
+            h.update(view[:read_into(f, view)])
+    h.update(str(size).encode("ascii"))
+    return h.hexdigest()
+
+def full_digest(path: str, algorithm: str, check: Callable[[], None] = lambda: None, mmap_threshold: int = 0) -> str:
+    h = hashlib.new(algorithm)
+    with open(path, "rb", buffering=0) as f:
+        fd = f.fileno()
+        size = os.fstat(fd).st_size
+        # mmap پیش‌فرض خاموش است: اگر فایل هنگام خواندن کوتاه شود دسترسی به نگاشت SIGBUS می‌دهد.
+        if mmap_threshold and size >= mmap_threshold:
+            try:
+                mapped = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                mapped = None
+            if mapped is not None:
+                with mapped:
+                    if hasattr(mapped, "madvise"):
+                        mapped.madvise(mmap.MADV_SEQUENTIAL)
+                    with memoryview(mapped) as view:
+                        for offset in range(0, len(view), FULL_BLOCK):
+                            check()
+                            h.update(view[offset:offset + FULL_BLOCK])
+                return h.hexdigest()
+        advise_sequential(fd)
+        view = buffer(FULL_BLOCK)
+        while count := f.readinto(view):
+            check()
+            h.update(view[:count])
+    return h.hexdigest()
+
+def _boundary(data: bytes, marks: bytes, start: int, final: bool) -> int:
+    limit = start + CHUNK_MAX
+    found = marks.find(_RUN, start + CHUNK_MIN - len(_RUN), min(limit, len(data)))
+    if found >= 0:
+        return found + len(_RUN)
+    if len(data) >= limit:
+        return limit
+    return len(data) if final else -1
+
+def chunk_fingerprint(path: str, check: Callable[[], None] = lambda: None) -> str:
+    # مرز تکه‌ها از خود محتوا می‌آید نه از جایگاه، پس نسخه بریده، ادامه‌دار یا جابه‌جاشده همان
+    # تکه‌ها را دارد. هر تکه ۲۴ نویسه هگز است: ۸ بایت blake2b و ۴ بایت طول.
+    parts: list[str] = [CHUNK_TAG]
+    tail = b""
+    with open(path, "rb", buffering=0) as f:
+        advise_sequential(f.fileno())
+        view = buffer(FULL_BLOCK)
+        final = False
+        while not final:
+            check()
+            count = read_into(f, view)
+            final = count < len(view)
+            # فقط دنباله کمتر از CHUNK_MAX از بلوک قبل کپی می‌شود؛ تکه‌ها با جابه‌جایی روی همان داده جدا می‌شوند.
+            data = tail + view[:count]
+            marks = data.translate(_MARK)
+            with memoryview(data) as chunks:
+                start = 0
+                while start < len(data):
+                    end = _boundary(data, marks, start, final)
+                    if end < 0:
+                        break
+                    parts.append(hashlib.blake2b(chunks[start:end], digest_size=8).hexdigest() + f"{end - start:08x}")
+                    start = end
+            tail = data[start:]
+    return "".join(parts)
+
+def head_chunk(path: str) -> str:
+    # فقط تکه اول، برای پیش‌گزینی نامزدهای هم‌پوشانی؛ همان مرزی که chunk_fingerprint می‌یابد.
+    view = buffer(CHUNK_MAX)
+    with open(path, "rb", buffering=0) as f:
+        data = bytes(view[:read_into(f, view)])
+    end = _boundary(data, data.translate(_MARK), 0, len(data) < CHUNK_MAX)
+    return CHUNK_TAG + hashlib.blake2b(data[:end], digest_size=8).hexdigest() + f"{end:08x}"
+
+def is_current(kind: str, digest: str | None) -> bool:
+    return bool(digest) and (kind not in ("partial", "head") or digest.startswith(CHUNK_TAG))
+
 class HashEngine:
-    def __init__(self, algorithm: str, cache: HashCache, cancel_event: threading.Event):
+    def __init__(self, algorithm: str, cache: HashCache, cancel_event: threading.Event, mmap_threshold: int = 0):
         self.algorithm = algorithm if algorithm in hashlib.algorithms_available else "sha256"
+        self.mmap_threshold = mmap_threshold
         self.cache = cache
         self.cancel = cancel_event
         self.cache_hits = 0
+        self.cache_misses = 0
+        self.metrics: MetricsRecorder | None = None
+
+    def _measure(self, kind: str, info: FileInfo, compute: Callable[[], str]) -> str:
+        # فقط خواندن واقعی زمان‌سنجی می‌شود؛ پاسخ از کش فایل باز شده‌ای حساب نمی‌شود.
+        if self.metrics is None:
+            return compute()
+        started = time.perf_counter()
+        digest = compute()
+        self.metrics.work(kind, info.path, time.perf_counter() - started, read_size(info.size, kind))
+        return digest
 
     def check(self) -> None:
         if self.cancel.is_set():
@@ -20,27 +163,44 @@ class HashEngine:
 
     def quick(self, info: FileInfo) -> str:
         self.check()
-        h = hashlib.new(self.algorithm)
-        block = 1024 * 1024
-        with open(info.path, "rb", buffering=0) as f:
-            h.update(f.read(block))
-            if info.size > block * 2:
-                f.seek(info.size - block)
-                h.update(f.read(block))
-        h.update(str(info.size).encode("ascii"))
-        return h.hexdigest()
+        cached = self.cache.get(info.path, info.size, info.modified_ns, self.algorithm, "quick", info.identity)
+        if cached:
+            self.cache_hits += 1
+            return cached
+        self.cache_misses += 1
+        digest = self._measure("quick", info, lambda: quick_digest(info.path, info.size, self.algorithm))
+        self.cache.put(info.path, info.size, info.modified_ns, self.algorithm, digest, "quick", info.identity)
+        return digest
 
     def full(self, info: FileInfo) -> str:
         self.check()
-        cached = self.cache.get(info.path, info.size, info.modified_ns, self.algorithm)
+        cached = self.cache.get(info.path, info.size, info.modified_ns, self.algorithm, identity=info.identity)
         if cached:
             self.cache_hits += 1
             return cached
-        h = hashlib.new(self.algorithm)
-        with open(info.path, "rb", buffering=4 * 1024 * 1024) as f:
-            while chunk := f.read(4 * 1024 * 1024):
-                self.check()
-                h.update(chunk)
-        digest = h.hexdigest()
-        self.cache.put(info.path, info.size, info.modified_ns, self.algorithm, digest)
+        self.cache_misses += 1
+        digest = self._measure("full", info, lambda: full_digest(info.path, self.algorithm, self.check, self.mmap_threshold))
+        self.cache.put(info.path, info.size, info.modified_ns, self.algorithm, digest, identity=info.identity)
         return digest
+
+    def head(self, info: FileInfo) -> str:
+        self.check()
+        cached = self.cache.get(info.path, info.size, info.modified_ns, self.algorithm, "head", info.identity)
+        if is_current("head", cached):
+            self.cache_hits += 1
+            return cached
+        self.cache_misses += 1
+        digest = self._measure("head", info, lambda: head_chunk(info.path))
+        self.cache.put(info.path, info.size, info.modified_ns, self.algorithm, digest, "head", info.identity)
+        return digest
+
+    def partial(self, info: FileInfo) -> str:
+        self.check()
+        cached = self.cache.get(info.path, info.size, info.modified_ns, self.algorithm, "partial", info.identity)
+        if is_current("partial", cached):
+            self.cache_hits += 1
+            return cached
+        self.cache_misses += 1
+        fingerprint = self._measure("partial", info, lambda: chunk_fingerprint(info.path, self.check))
+        self.cache.put(info.path, info.size, info.modified_ns, self.algorithm, fingerprint, "partial", info.identity)
+        return fingerprint
@@ -0,0 +1,186 @@
+from __future__ import annotations
+import cProfile, heapq, io, itertools, os, pstats, sys, threading, time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+from duplicate_finder.models import ScanMetrics, SlowFile, StageMetrics
+from duplicate_finder.services import get_logger
+from .progress import format_size
+
+PROFILE_MODES = ("sample", "cprofile")
+
+class SamplingProfiler:
+    # هر interval ثانیه پشته همه رشته‌ها از sys._current_frames خوانده و به شکل «پشته تاشده» شمرده می‌شود؛
+    # برخلاف cProfile که فقط رشته فراخوان را می‌بیند، کار رشته‌های استخر هم دیده می‌شود.
+    suffix = "folded"
+
+    def __init__(self, interval: float = .005, depth: int = 48):
+        self.interval, self.depth = interval, depth
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                parts: list[str] = []
+                while frame is not None and len(parts) < self.depth:
+                    parts.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(parts))] += 1
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._sample, name="duplicate-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def report(self, top: int = 25) -> str:
+        # سهم هر تابع در بالای پشته؛ رشته‌های بیکار زیر wait یا get دیده می‌شوند.
+        total = sum(self.stacks.values())
+        leaves: Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rpartition(";")[2]] += count
+        lines = [f"samples={total} interval={self.interval * 1000:g}ms"]
+        lines += [f"{count / total:6.1%} {count:8d}  {name}" for name, count in leaves.most_common(top)]
+        return "\n".join(lines)
+
+    def write(self, path: Path) -> None:
+        with path.open("w", encoding="utf-8") as stream:
+            for stack, count in self.stacks.most_common():
+                stream.write(f"{stack} {count}\n")
+
+class CallProfiler:
+    # cProfile فقط رشته‌ای را که مرحله را اجرا می‌کند می‌بیند؛ برای پیمایش و گروه‌بندی دقیق است،
+    # در مراحل هش فقط انتظار برای استخر را نشان می‌دهد.
+    suffix = "prof"
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self.profile.enable()
+
+    def stop(self) -> None:
+        self.profile.disable()
+
+    def report(self, top: int = 25) -> str:
+        stream = io.StringIO()
+        pstats.Stats(self.profile, stream=stream).sort_stats("cumulative").print_stats(top)
+        return stream.getvalue().strip()
+
+    def write(self, path: Path) -> None:
+        self.profile.dump_stats(str(path))
+
+class _Totals:
+    __slots__ = ("wall", "cpu", "files", "bytes", "busy", "workers")
+
+    def __init__(self, workers: int):
+        self.wall = self.cpu = self.busy = 0.0
+        self.files = self.bytes = 0
+        self.workers = workers
+
+class MetricsRecorder:
+    # زمان دیواری و پردازنده هر مرحله با stage و کار هر فایل (از رشته‌های کارگر) با work ثبت می‌شود.
+    # زمان پردازنده از process_time است و همه رشته‌ها را می‌شمارد، ولی پردازه‌های فرزند را نه.
+    def __init__(self, workers: int = 1, *, slowest: int = 20, profile: dict[str, str] | None = None,
+                 profile_dir: Path | None = None):
+        for stage, mode in (profile or {}).items():
+            if mode not in PROFILE_MODES:
+                raise ValueError(f"unknown profile mode for {stage}: {mode}")
+        self.workers = max(1, workers)
+        self.slowest = max(0, slowest)
+        self.profile = dict(profile or {})
+        self.profile_dir = profile_dir
+        self.files_opened = 0
+        self.bytes_read = 0
+        self.profiles: dict[str, str] = {}
+        self._stages: dict[str, _Totals] = {}
+        self._heap: list[tuple[float, int, SlowFile]] = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def _totals(self, name: str) -> _Totals:
+        totals = self._stages.get(name)
+        if totals is None:
+            totals = self._stages[name] = _Totals(self.workers)
+        return totals
+
+    def _profiler(self, name: str) -> SamplingProfiler | CallProfiler | None:
+        mode = self.profile.get(name, self.profile.get("all"))
+        if mode is None:
+            return None
+        return CallProfiler() if mode == "cprofile" else SamplingProfiler()
+
+    def _keep(self, name: str, profiler: SamplingProfiler | CallProfiler) -> None:
+        self.profiles[name] = profiler.report()
+        if self.profile_dir is None:
+            return
+        try:
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            profiler.write(self.profile_dir / f"{name}.{profiler.suffix}")
+        except OSError as exc:
+            get_logger().warning("profile write failed stage=%s error=%s", name, exc)
+
+    @contextmanager
+    def stage(self, name: str, *, workers: int | None = None, covers: tuple[str, ...] = ()) -> Iterator[None]:
+        # covers برای حالت پایپ‌لاین است: مراحلی که هم‌زمان اجرا می‌شوند زمان دیواری مرحله بیرونی را می‌گیرند
+        # تا بهره‌وری کارگرانشان حساب شود؛ زمان پردازنده فقط یک بار و برای مرحله بیرونی ثبت می‌شود.
+        profiler = self._profiler(name)
+        if profiler is not None:
+            profiler.start()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            if profiler is not None:
+                profiler.stop()
+                self._keep(name, profiler)
+            with self._lock:
+                totals = self._totals(name)
+                totals.wall += wall
+                totals.cpu += cpu
+                totals.workers = workers or self.workers
+                for part in covers:
+                    self._totals(part).wall += wall
+
+    def work(self, stage: str, path: str, seconds: float, nbytes: int, files: int = 1) -> None:
+        with self._lock:
+            totals = self._totals(stage)
+            totals.files += files
+            totals.bytes += nbytes
+            totals.busy += seconds
+            self.files_opened += files
+            self.bytes_read += nbytes
+            if self.slowest and seconds > 0:
+                entry = (seconds, next(self._order), SlowFile(path, seconds, nbytes, stage))
+                if len(self._heap) < self.slowest:
+                    heapq.heappush(self._heap, entry)
+                elif seconds > self._heap[0][0]:
+                    heapq.heapreplace(self._heap, entry)
+
+    def result(self, cache_hits: int = 0, cache_misses: int = 0, sqlite_seconds: float = 0.0) -> ScanMetrics:
+        with self._lock:
+            stages = [StageMetrics(name, x.wall, x.cpu, x.files, x.bytes, x.busy, x.workers) for name, x in self._stages.items()]
+            slowest = [entry[2] for entry in sorted(self._heap, reverse=True)]
+        return ScanMetrics(stages, self.files_opened, self.bytes_read, cache_hits, cache_misses, sqlite_seconds,
+                           slowest, dict(self.profiles))
+
+def format_metrics(metrics: ScanMetrics, top: int = 5) -> list[str]:
+    lines = []
+    for stage in metrics.stages:
+        use = f"، بهره‌وری کارگرها {stage.utilization:.0%}" if stage.utilization is not None else ""
+        volume = f"، {stage.files:,} فایل، {format_size(stage.bytes_read)}" if stage.files else ""
+        lines.append(f"{stage.name}: {stage.wall_seconds:.2f}s دیواری، {stage.cpu_seconds:.2f}s پردازنده{volume}{use}")
+    lines.append(f"فایل باز شده: {metrics.files_opened:,}، خوانده‌شده: {format_size(metrics.bytes_read)}، "
+                 f"کش: {metrics.cache_hits:,} موفق / {metrics.cache_misses:,} ناموفق، SQLite: {metrics.sqlite_seconds:.2f}s")
+    lines += [f"کند: {x.seconds:.2f}s {x.stage} {format_size(x.bytes_read)} {x.path}" for x in metrics.slowest[:top]]
+    return lines
@@ -0,0 +1,42 @@
+from __future__ import annotations
+from collections import defaultdict
+from duplicate_finder.models import DuplicateGroup, FileInfo
+
+def parse_fingerprint(fingerprint: str) -> dict[str, int]:
+    chunks: dict[str, int] = defaultdict(int)
+    # پیشوند نسخه (CHUNK_TAG) کوتاه‌تر از یک تکه است و کنار گذاشته می‌شود.
+    for offset in range(len(fingerprint) % 24, len(fingerprint), 24):
+        chunks[fingerprint[offset:offset + 16]] += int(fingerprint[offset + 16:offset + 24], 16)
+    return chunks
+
+def find_overlaps(items: list[tuple[FileInfo, str]], ratio: float, common: int = 64) -> list[DuplicateGroup]:
+    # دو فایل هم‌پوشان‌اند اگر بایت‌های تکه‌های مشترکشان دست‌کم ratio از فایل کوچک‌تر باشد؛ پس
+    # دانلود نیمه‌کاره یا لاگ ادامه‌دار کنار نسخه کاملش دیده می‌شود. تکه‌ای که در بیش از common
+    # فایل هست (مثلاً بلوک‌های صفر) نمایه نمی‌شود تا جفت‌ها انفجاری زیاد نشوند.
+    chunks = [parse_fingerprint(fingerprint) for _, fingerprint in items]
+    owners: dict[str, list[int]] = defaultdict(list)
+    for index, fingerprint in enumerate(chunks):
+        for digest in fingerprint:
+            owners[digest].append(index)
+    rank = lambda x: (x.priority, len(x.path), x.modified_ns, x.path.casefold())
+    groups: list[DuplicateGroup] = []
+    for index, fingerprint in enumerate(chunks):
+        shared: dict[int, int] = defaultdict(int)
+        for digest, size in fingerprint.items():
+            others = owners[digest]
+            if len(others) > common:
+                continue
+            for other in others:
+                if other > index:
+                    shared[other] += min(size, chunks[other][digest])
+        for other, count in shared.items():
+            left, right = items[index][0], items[other][0]
+            if left.identity is not None and left.identity == right.identity:
+                continue
+            # محتوای کاملاً یکسان گروه تکراری دقیق است، نه هم‌پوشانی.
+            if left.size == right.size == count:
+                continue
+            if count >= ratio * min(left.size, right.size):
+                groups.append(DuplicateGroup(sorted([left, right], key=rank), exact=False, shared_bytes=count))
+    groups.sort(key=lambda g: (-g.shared_bytes, g.keeper.path.casefold()))
+    return groups
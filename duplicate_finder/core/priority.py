@@ -2,31 +2,53 @@ from __future__ import annotations
 import os
 from pathlib import Path
 
+class _Node:
+    __slots__ = ("children", "rank")
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        self.rank: int | None = None
+
 class PriorityResolver:
+    # پوشه‌ها یک بار در یک trie از اجزای مسیر چیده می‌شوند؛ هزینه هر جست‌وجو به عمق مسیر بستگی دارد
+    # نه به تعداد پوشه‌ها. Keep در هر عمقی مطلق است و بین پوشه‌های تو در تو رتبه بالاتر برنده می‌شود.
     def __init__(self, keep_folder: str = "", priority_folders: list[str] | None = None):
         self.keep = self._valid(keep_folder)
         self.priorities = [p for p in (self._valid(x) for x in (priority_folders or [])) if p]
+        self._root = _Node()
+        for index, folder in enumerate(self.priorities):
+            node = self._insert(folder)
+            node.rank = index if node.rank is None else min(node.rank, index)
+        if self.keep:
+            self._insert(self.keep).rank = -1
 
     @staticmethod
     def _valid(path: str) -> str:
         return os.path.normcase(str(Path(path).resolve())) if path and Path(path).is_dir() else ""
 
     @staticmethod
-    def _inside(path: str, folder: str) -> bool:
-        if not folder:
-            return False
-        try:
-            return os.path.commonpath([os.path.normcase(os.path.abspath(path)), folder]) == folder
-        except ValueError:
-            return False
+    def _parts(path: str) -> list[str]:
+        return [x for x in os.path.normcase(os.path.abspath(path)).split(os.sep) if x]
+
+    def _insert(self, folder: str) -> _Node:
+        node = self._root
+        for part in self._parts(folder):
+            node = node.children.setdefault(part, _Node())
+        return node
 
     def value(self, path: str) -> int:
-        if self._inside(path, self.keep):
-            return -1
-        for index, folder in enumerate(self.priorities):
-            if self._inside(path, folder):
-                return index
-        return 999
+        # برای پوشه همان مقداری برمی‌گردد که فایل‌های مستقیم آن می‌گیرند؛ پیمایشگر یک بار برای هر پوشه می‌پرسد.
+        node = self._root
+        best = 999 if node.rank is None else node.rank
+        for part in self._parts(path):
+            if best < 0:
+                break
+            node = node.children.get(part)
+            if node is None:
+                break
+            if node.rank is not None and node.rank < best:
+                best = node.rank
+        return best
 
     def is_protected(self, path: str) -> bool:
-        return self._inside(path, self.keep)
+        return self.value(path) < 0
@@ -0,0 +1,136 @@
+from __future__ import annotations
+import multiprocessing, os, time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Iterator
+from duplicate_finder.models import FileInfo
+from .hash_engine import Cancelled, HashEngine, chunk_fingerprint, full_digest, head_chunk, is_current, quick_digest, read_size
+
+HashResult = tuple[FileInfo, str | None, str | None]
+
+_cancel = None
+
+def _init_worker(cancel) -> None:
+    global _cancel
+    _cancel = cancel
+
+def _check() -> None:
+    if _cancel is not None and _cancel.is_set():
+        raise Cancelled("operation cancelled")
+
+def hash_batch(kind: str, algorithm: str, batch: list[tuple[str, int]],
+               mmap_threshold: int = 0) -> list[tuple[str | None, str | None, float]]:
+    # زمان هر فایل در خود پردازه کارگر اندازه گرفته می‌شود تا صف انتظار دسته در آن نیاید.
+    output: list[tuple[str | None, str | None, float]] = []
+    for path, size in batch:
+        _check()
+        started = time.perf_counter()
+        try:
+            if kind == "quick":
+                digest = quick_digest(path, size, algorithm)
+            elif kind == "partial":
+                digest = chunk_fingerprint(path, _check)
+            elif kind == "head":
+                digest = head_chunk(path)
+            else:
+                digest = full_digest(path, algorithm, _check, mmap_threshold)
+            output.append((digest, None, time.perf_counter() - started))
+        except Cancelled:
+            raise
+        except Exception as exc:
+            output.append((None, str(exc), 0.0))
+    return output
+
+class ProcessHashBackend:
+    # برای تعداد بسیار زیاد فایل کوچک: کارها دسته‌ای (به ترتیب پوشه) به پردازه‌های جدا
+    # فرستاده می‌شوند تا هزینه پایتونی هر فایل پشت GIL نماند. کش فقط در پردازه اصلی
+    # خوانده و نوشته می‌شود.
+    def __init__(self, engine: HashEngine, workers: int, *, batch_files: int = 256, batch_bytes: int = 32 * 1024 * 1024):
+        self.engine = engine
+        self.workers = max(1, workers)
+        self.batch_files = max(1, batch_files)
+        self.batch_bytes = max(1, batch_bytes)
+        self.in_flight = 2 * self.workers
+        self._context = multiprocessing.get_context("spawn")
+        self._cancel = self._context.Event()
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context,
+                                                 initializer=_init_worker, initargs=(self._cancel,))
+        return self._executor
+
+    def _batches(self, items: list[FileInfo]) -> list[list[FileInfo]]:
+        batches: list[list[FileInfo]] = []
+        batch: list[FileInfo] = []
+        volume = 0
+        for item in sorted(items, key=lambda x: (os.path.dirname(x.path), x.path)):
+            if batch and (len(batch) >= self.batch_files or volume + item.size > self.batch_bytes):
+                batches.append(batch)
+                batch, volume = [], 0
+            batch.append(item)
+            volume += item.size
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def map(self, items: list[FileInfo], kind: str) -> Iterator[HashResult]:
+        engine, cache = self.engine, self.engine.cache
+        pending: list[FileInfo] = []
+        for item in items:
+            engine.check()
+            cached = cache.get(item.path, item.size, item.modified_ns, engine.algorithm, kind, item.identity)
+            if is_current(kind, cached):
+                engine.cache_hits += 1
+                yield item, cached, None
+            else:
+                engine.cache_misses += 1
+                pending.append(item)
+        if not pending:
+            return
+        pool = self._pool()
+        batches = iter(self._batches(pending))
+        futures: dict[Future, list[FileInfo]] = {}
+
+        # حداکثر دو دسته برای هر کارگر در راه است؛ دسته‌های بعدی با تمام شدن هر دسته فرستاده می‌شوند تا
+        # برای میلیون‌ها فایل همه دسته‌ها و Futureهایشان یک‌جا ساخته و به صف پردازه‌ها ریخته نشوند.
+        def fill() -> None:
+            while len(futures) < self.in_flight:
+                batch = next(batches, None)
+                if batch is None:
+                    return
+                futures[pool.submit(hash_batch, kind, engine.algorithm, [(x.path, x.size) for x in batch],
+                                    engine.mmap_threshold)] = batch
+
+        try:
+            fill()
+            while futures:
+                done, _ = wait(futures, timeout=.2, return_when=FIRST_COMPLETED)
+                if engine.cancel.is_set():
+                    self._cancel.set()
+                    engine.check()
+                for future in done:
+                    batch = futures.pop(future)
+                    fill()
+                    try:
+                        results = future.result()
+                    except Cancelled:
+                        raise
+                    except Exception as exc:
+                        results = [(None, str(exc), 0.0)] * len(batch)
+                    for item, (digest, error, seconds) in zip(batch, results):
+                        if digest:
+                            cache.put(item.path, item.size, item.modified_ns, engine.algorithm, digest, kind, item.identity)
+                            if engine.metrics is not None:
+                                engine.metrics.work(kind, item.path, seconds, read_size(item.size, kind))
+                        yield item, digest, error
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def close(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            self._cancel.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            self._cancel.clear()
@@ -0,0 +1,116 @@
+from __future__ import annotations
+import threading, time
+from typing import Callable
+from duplicate_finder.models import ProgressSnapshot, StageProgress
+
+ProgressSink = Callable[[ProgressSnapshot], None]
+
+def format_size(value: float) -> str:
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if value < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} PB"
+
+def format_eta(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds + .5), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+class _Stage:
+    def __init__(self, name: str, label: str, start: int, span: int, files_total: int, bytes_total: int):
+        self.name, self.label, self.start, self.span = name, label, start, span
+        self.files_total, self.bytes_total = files_total, bytes_total
+        self.files_done = self.bytes_done = 0
+        self.started = time.perf_counter()
+        self.finished = False
+
+    def snapshot(self, now: float) -> StageProgress:
+        return StageProgress(self.name, self.label, self.files_done, self.files_total, self.bytes_done, self.bytes_total,
+                             now - self.started)
+
+    def percent(self) -> int:
+        if self.bytes_total:
+            fraction = self.bytes_done / self.bytes_total
+        elif self.files_total:
+            fraction = self.files_done / self.files_total
+        else:
+            fraction = 0.0
+        return self.start + int(self.span * min(1.0, fraction))
+
+class ProgressReporter:
+    # شمارنده‌ها با هر فایل به‌روز می‌شوند ولی گیرنده حداکثر هر interval ثانیه یک تصویر کامل می‌گیرد؛
+    # شروع مرحله و پیام‌های صریح بی‌درنگ فرستاده می‌شوند.
+    def __init__(self, sink: ProgressSink | None = None, *, interval: float = .25,
+                 cache_stats: Callable[[], tuple[int, int]] = lambda: (0, 0)):
+        self.sink = sink or (lambda _snapshot: None)
+        self.interval = interval
+        self.cache_stats = cache_stats
+        self.started = time.perf_counter()
+        self._stages: dict[str, _Stage] = {}
+        self._current = ""
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def begin(self, name: str, label: str, start: int, span: int, files_total: int = 0, bytes_total: int = 0) -> None:
+        with self._lock:
+            self._stages[name] = _Stage(name, label, start, span, files_total, bytes_total)
+            self._current = name
+        self.emit(True)
+
+    def grow(self, name: str, files: int = 1, size: int = 0) -> None:
+        with self._lock:
+            stage = self._stages[name]
+            stage.files_total += files
+            stage.bytes_total += size
+
+    def finish(self, name: str) -> None:
+        with self._lock:
+            stage = self._stages[name]
+            stage.finished = True
+            stage.files_total, stage.bytes_total = stage.files_done, stage.bytes_done
+
+    def advance(self, name: str, files: int = 1, size: int = 0) -> None:
+        with self._lock:
+            stage = self._stages[name]
+            stage.files_done += files
+            stage.bytes_done += size
+        self.emit()
+
+    def say(self, percent: int, message: str) -> None:
+        self.sink(self._snapshot(time.perf_counter(), percent, message))
+
+    def emit(self, force: bool = False) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            if not force and now - self._last < self.interval:
+                return
+            self._last = now
+        self.sink(self._snapshot(now))
+
+    def _snapshot(self, now: float, percent: int | None = None, message: str = "") -> ProgressSnapshot:
+        with self._lock:
+            stages = tuple(stage.snapshot(now) for stage in self._stages.values())
+            active = [x for x, stage in zip(stages, self._stages.values())
+                      if not stage.finished and (not stage.files_total or stage.files_done < stage.files_total)]
+            if percent is None:
+                percent = max((stage.percent() for stage in self._stages.values()), default=0)
+            current = self._current
+        hits, misses = self.cache_stats()
+        rate = hits / (hits + misses) if hits + misses else None
+        etas = [x.eta_seconds for x in active if x.eta_seconds is not None]
+        eta = max(etas) if etas else None
+        if not message:
+            parts = []
+            for x in active:
+                if x.files_total:
+                    text = f"{x.label}: {x.files_done:,}/{x.files_total:,} ({x.files_per_second:,.0f} فایل در ثانیه"
+                else:
+                    text = f"{x.label}: {x.files_done:,} فایل ({x.files_per_second:,.0f} در ثانیه"
+                parts.append(text + (f"، {format_size(x.bytes_per_second)}/s)" if x.bytes_done else ")"))
+            if eta is not None:
+                parts.append(f"باقی‌مانده: {format_eta(eta)}")
+            if rate is not None:
+                parts.append(f"کش: {rate:.0%}")
+            message = " | ".join(parts)
+        return ProgressSnapshot(percent, message, current, stages, now - self.started, eta, rate)
@@ -0,0 +1,215 @@
+from __future__ import annotations
+import os, re, threading, time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple
+
+BUILTIN_DIRS = ("backup_deleted", ".git", "__pycache__")
+_UNITS = {"": 1, "b": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30, "t": 1 << 40}
+_AGES = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400, "y": 365 * 86400}
+_FLAGS = re.IGNORECASE if os.name == "nt" else 0
+
+class Rule(NamedTuple):
+    text: str
+    negate: bool
+    kind: str
+    dir_only: bool = False
+    low: float | None = None
+    high: float | None = None
+
+def _glob(pattern: str) -> str:
+    # الگوی gitignore: * و ? از / رد نمی‌شوند، **/ هر تعداد پوشه و /** همه محتوای پوشه.
+    out, i = [], 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?"); i += 3; continue
+        if pattern.startswith("**", i):
+            out.append(".*"); i += 2; continue
+        char = pattern[i]
+        if char == "*":
+            out.append("[^/]*")
+        elif char == "?":
+            out.append("[^/]")
+        elif char == "[" and (end := pattern.find("]", i + 2)) > 0:
+            body = pattern[i + 1:end].replace("\\", "\\\\")
+            out.append("[" + ("^" + body[1:] if body.startswith("!") else body) + "]")
+            i = end
+        elif char == "\\" and i + 1 < len(pattern):
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(char))
+        i += 1
+    return "".join(out)
+
+def _bound(kind: str, text: str, now: float) -> float | None:
+    text = text.strip().lower()
+    if not text:
+        return None
+    if kind == "mtime":
+        return datetime.fromisoformat(text).timestamp()
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([a-z]?)i?b?" if kind == "size" else r"(\d+(?:\.\d+)?)\s*([smhdwy])", text)
+    if match is None:
+        raise ValueError(f"invalid {kind} bound: {text}")
+    value, unit = float(match[1]), match[2]
+    if kind == "size":
+        if unit not in _UNITS:
+            raise ValueError(f"invalid size unit: {text}")
+        return value * _UNITS[unit]
+    return now - value * _AGES[unit]
+
+def parse_rule(text: str, now: float | None = None) -> tuple[Rule, str]:
+    # قالب هر خط: glob به سبک gitignore (با / پایانی فقط پوشه، با / میانی نسبت به ریشه)، re:<regex> روی مسیر
+    # نسبی، size:MIN..MAX، age:MIN..MAX (مثل 30d..) یا mtime:FROM..TO (تاریخ ISO). ! در ابتدا یعنی دوباره شامل کن.
+    # دامنه‌ها از پایین بسته و از بالا باز هستند و هر طرف می‌تواند خالی بماند.
+    source = text.strip()
+    negate = source.startswith("!")
+    body = source[1:] if negate else source
+    key, colon, value = body.partition(":")
+    if colon and key in ("size", "age", "mtime"):
+        low, dots, high = value.partition("..")
+        if not dots:
+            raise ValueError(f"range rule needs '..': {source}")
+        now = time.time() if now is None else now
+        low, high = _bound(key, low, now), _bound(key, high, now)
+        if key == "age":
+            # سن بیشتر یعنی mtime کوچک‌تر؛ دامنه سن به دامنه mtime برگردانده می‌شود.
+            low, high = high, low
+        return Rule(source, negate, "mtime" if key == "age" else key, low=low, high=high), ""
+    if colon and key == "re":
+        return Rule(source, negate, "re"), value
+    dir_only = body.endswith("/")
+    body = body.rstrip("/")
+    if not body:
+        raise ValueError(f"empty rule: {source}")
+    anchored = "/" in body
+    return Rule(source, negate, "path" if anchored else "name", dir_only), _glob(body.lstrip("/"))
+
+class RuleSet:
+    # همه قاعده‌های یک ریشه یک بار کامپایل می‌شوند: نام‌ها و پسوندهای پیش‌فرض در دیکشنری، globها در
+    # یک عبارت منظم یکپارچه که گزینه‌هایش از آخرین قاعده به اولی چیده شده‌اند (مثل gitignore آخرین قاعده
+    # منطبق برنده است)، و قاعده‌های regex و حجم/زمان در فهرست‌هایی از آخر به اول.
+    def __init__(self, root: str, texts: list[str], *, excluded_folders: set[str], excluded_extensions: set[str],
+                 include_hidden: bool, skipped: Counter, lock: threading.Lock, now: float | None = None):
+        self.root = root
+        self.rules: list[Rule] = []
+        self.names: dict[str, int] = {}
+        self.extensions: dict[str, int] = {}
+        self.hidden = -1 if include_hidden else self._add(Rule(".*", False, "builtin"))
+        for name in BUILTIN_DIRS:
+            self.names[name] = self._add(Rule(name + "/", False, "builtin", True))
+        for extension in sorted(excluded_extensions):
+            self.extensions[extension] = self._add(Rule("*" + extension, False, "builtin"))
+        self.excluded_folders = excluded_folders
+        self.blocked = next((x for x in excluded_folders if _within(os.path.normcase(root), x)), "")
+        globs: dict[tuple[str, bool], list[str]] = {("name", False): [], ("name", True): [], ("path", False): [], ("path", True): []}
+        self.regexes: list[tuple[int, re.Pattern]] = []
+        self.ranges: list[tuple[int, Rule]] = []
+        for text in texts:
+            if not text.strip() or text.lstrip().startswith("#"):
+                continue
+            rule, pattern = parse_rule(text, now)
+            index = self._add(rule)
+            if rule.kind == "re":
+                self.regexes.append((index, re.compile(pattern)))
+            elif rule.kind in ("size", "mtime"):
+                self.ranges.append((index, rule))
+            else:
+                for is_dir in (True, False) if not rule.dir_only else (True,):
+                    globs[rule.kind, is_dir].append(f"(?P<r{index}>{pattern})")
+        self.globs = {key: re.compile("|".join(reversed(parts)), _FLAGS) if parts else None for key, parts in globs.items()}
+        self.regexes.reverse()
+        self.ranges.reverse()
+        self.skipped, self._lock = skipped, lock
+
+    def _add(self, rule: Rule) -> int:
+        self.rules.append(rule)
+        return len(self.rules) - 1
+
+    def _count(self, label: str) -> None:
+        with self._lock:
+            self.skipped[label] += 1
+
+    def relative(self, folder: str) -> str:
+        # پیشوند مسیر نسبی فرزندان پوشه، با / به‌عنوان جداکننده در هر سیستم‌عامل.
+        if len(folder) <= len(self.root):
+            return ""
+        return folder[len(self.root):].strip(os.sep).replace(os.sep, "/") + "/"
+
+    def match(self, rel: str, name: str, is_dir: bool) -> int:
+        best = self.names.get(name.casefold(), -1) if is_dir else self.extensions.get(os.path.splitext(name)[1].casefold(), -1)
+        if self.hidden > best and name.startswith("."):
+            best = self.hidden
+        for target, text in (("name", name), ("path", rel)):
+            pattern = self.globs[target, is_dir]
+            found = pattern.fullmatch(text) if pattern is not None else None
+            if found is not None:
+                best = max(best, int(found.lastgroup[1:]))
+        for index, pattern in self.regexes:
+            if index <= best:
+                break
+            if pattern.search(rel):
+                best = index
+                break
+        return best
+
+    def _excludes(self, index: int) -> bool:
+        return index >= 0 and not self.rules[index].negate
+
+    def skip_dir(self, path: str, rel: str, name: str) -> bool:
+        # پوشه ردشده کامل هرس می‌شود و زیرشاخه‌اش هرگز خوانده نمی‌شود (مثل gitignore، ! داخل آن اثری ندارد).
+        if self.blocked or os.path.normcase(path) in self.excluded_folders:
+            self._count(self.blocked or os.path.normcase(path))
+            return True
+        index = self.match(rel, name, True)
+        if self._excludes(index):
+            self._count(self.rules[index].text)
+            return True
+        return False
+
+    def skip_name(self, rel: str, name: str) -> int | None:
+        # None یعنی فایل بدون stat کنار گذاشته شد؛ وگرنه شماره قاعده برای skip_stat برمی‌گردد.
+        if self.blocked:
+            self._count(self.blocked)
+            return None
+        index = self.match(rel, name, False)
+        if self._excludes(index) and not (self.ranges and self.ranges[0][0] > index):
+            self._count(self.rules[index].text)
+            return None
+        return index
+
+    def skip_stat(self, index: int, size: int, mtime_ns: int) -> bool:
+        for position, rule in self.ranges:
+            if position <= index:
+                break
+            value = size if rule.kind == "size" else mtime_ns / 1e9
+            if (rule.low is None or value >= rule.low) and (rule.high is None or value < rule.high):
+                index = position
+                break
+        if self._excludes(index):
+            self._count(self.rules[index].text)
+            return True
+        return False
+
+def _within(path: str, folder: str) -> bool:
+    return path == folder or path.startswith(folder.rstrip(os.sep) + os.sep)
+
+class ScanRules:
+    # هر ریشه اسکن قاعده‌های سراسری به‌علاوه قاعده‌های خودش را دارد؛ قاعده‌های ریشه بعد از سراسری‌ها
+    # می‌آیند و بنابراین بر آن‌ها غلبه می‌کنند. skipped شمار موارد ردشده را به ازای متن هر قاعده نگه می‌دارد.
+    def __init__(self, roots: list[str], rules: list[str] | None = None, root_rules: dict[str, list[str]] | None = None, *,
+                 excluded_folders: list[str] | None = None, excluded_extensions: list[str] | None = None,
+                 include_hidden: bool = False, now: float | None = None):
+        folders = {os.path.normcase(str(Path(x).resolve())) for x in (excluded_folders or []) if x}
+        extensions = {x.casefold() if x.startswith(".") else "." + x.casefold() for x in (excluded_extensions or []) if x}
+        overrides = {os.path.normcase(str(Path(key).resolve())): value for key, value in (root_rules or {}).items() if key}
+        self.skipped: Counter[str] = Counter()
+        lock = threading.Lock()
+        self.sets = [RuleSet(root, list(rules or []) + list(overrides.get(os.path.normcase(root), [])),
+                             excluded_folders=folders, excluded_extensions=extensions, include_hidden=include_hidden,
+                             skipped=self.skipped, lock=lock, now=now)
+                     for root in sorted(roots, key=len, reverse=True)]
+
+    def for_path(self, path: str) -> RuleSet:
+        return next(x for x in self.sets if _within(path, x.root))
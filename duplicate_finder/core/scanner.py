@@ -1,120 +1,617 @@
 from __future__ import annotations
-import os, threading, time
-from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import json, os, threading, time
+from collections import Counter, defaultdict
+from dataclasses import replace
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
 from pathlib import Path
-from typing import Callable
-from duplicate_finder.models import DuplicateGroup, FileInfo, ScanResult
-from duplicate_finder.services import HashCache, get_logger
-from .hash_engine import Cancelled, HashEngine
+from typing import Callable, Iterator
+from duplicate_finder.models import DuplicateGroup, FileChanges, FileInfo, FileTable, ScanResult
+from duplicate_finder.services import CheckpointError, FileIndex, HashCache, ScanCheckpoint, get_logger
+from duplicate_finder.services.checkpoint import CheckpointState
+from duplicate_finder.services.file_index import IndexEntry
+from .hash_engine import CHUNK_MIN, Cancelled, HashEngine, read_size
+from .metrics import MetricsRecorder
+from .overlap import find_overlaps
 from .priority import PriorityResolver
+from .rules import ScanRules
+from .progress import ProgressReporter, ProgressSink
+from .process_backend import HashResult, ProcessHashBackend
+from .scheduler import DeviceScheduler, resolve_limits
 from .similarity import find_similar
+from .verify import LockstepVerifier
+from .walker import parallel_walk
 
-Progress = Callable[[int, str], None]
+_LATE_IDENTITY = os.name == "nt"
+
+GroupSink = Callable[[DuplicateGroup], None]
 
 class DuplicateScanner:
     def __init__(self, roots: list[str], *, keep_folder: str = "", priority_folders: list[str] | None = None,
                  excluded_folders: list[str] | None = None, excluded_extensions: list[str] | None = None,
                  min_size: int = 1, workers: int = 4, algorithm: str = "sha256", include_hidden: bool = False,
-                 progress: Progress | None = None, cancel_event: threading.Event | None = None,
-                 cache: HashCache | None = None):
-        self.roots = [str(Path(x).resolve()) for x in roots if x and Path(x).is_dir()]
+                 progress: ProgressSink | None = None, cancel_event: threading.Event | None = None,
+                 cache: HashCache | None = None, on_group: GroupSink | None = None, pipeline: bool = False,
+                 index: FileIndex | None = None, verify: str = "hash", backend: str = "thread",
+                 mmap_threshold: int = 0, device_workers: dict[str, int] | None = None, auto_tune_io: bool = True,
+                 overlap: float = 0.0, rules: list[str] | None = None, root_rules: dict[str, list[str]] | None = None,
+                 profile: dict[str, str] | None = None, profile_dir: Path | None = None, slowest_files: int = 20,
+                 checkpoint: ScanCheckpoint | None = None):
+        resolved = list(dict.fromkeys(str(Path(x).resolve()) for x in roots if x and Path(x).is_dir()))
+        # ریشه‌های تو در تو فقط یک بار پیمایش می‌شوند تا فایل تکراری شمرده نشود.
+        self.roots = [x for x in resolved if not any(x != r and self._inside(x, r) for r in resolved)]
         self.resolver = PriorityResolver(keep_folder, priority_folders)
-        self.excluded_folders = [os.path.normcase(str(Path(x).resolve())) for x in (excluded_folders or []) if x]
-        self.excluded_extensions = {x.casefold() if x.startswith(".") else "." + x.casefold() for x in (excluded_extensions or [])}
+        self.rules = ScanRules(self.roots, rules, root_rules, excluded_folders=excluded_folders,
+                               excluded_extensions=excluded_extensions, include_hidden=include_hidden)
         self.min_size = max(0, int(min_size))
         self.workers = max(1, int(workers))
-        self.include_hidden = include_hidden
-        self.progress = progress or (lambda *_: None)
+        self.pipeline = pipeline
+        self.index = index
+        self.overlap = max(0.0, min(1.0, overlap))
+        self.checkpoint = checkpoint
+        self.changes = FileChanges()
+        # پوشه‌هایی که فهرستشان کامل خوانده شد؛ نگه‌داری کش فقط ردیف‌های همین پوشه‌ها را هرس می‌کند.
+        self.listed: set[str] = set()
+        self._link_reps: dict[tuple[int, int], FileInfo] = {}
+        self._aliases: dict[str, list[FileInfo]] = defaultdict(list)
         self.cancel = cancel_event or threading.Event()
-        self.engine = HashEngine(algorithm, cache or HashCache(), self.cancel)
+        self.on_group = on_group or (lambda _group: None)
+        self.engine = HashEngine(algorithm, cache or HashCache(), self.cancel, mmap_threshold)
+        self.metrics = MetricsRecorder(self.workers, slowest=slowest_files, profile=profile, profile_dir=profile_dir)
+        self.engine.metrics = self.metrics
+        self.progress = ProgressReporter(progress, cache_stats=lambda: (self.engine.cache_hits, self.engine.cache_misses))
         self.errors: list[str] = []
+        self.verifier = LockstepVerifier(self.engine, self.errors, byte_compare=verify == "bytes") \
+            if verify in ("lockstep", "bytes") else None
+        # پردازه‌ها فقط در اسکن مرحله‌ای استفاده می‌شوند؛ حالت پایپ‌لاین و تأیید هم‌گام رشته‌ای می‌مانند.
+        self.scheduler = DeviceScheduler(self.workers, limits=resolve_limits(device_workers), auto_tune=auto_tune_io,
+                                         check=self._check)
+        self.backend = ProcessHashBackend(self.engine, self.workers) if backend == "process" else None
         self.logger = get_logger()
+        # نقطه بازیابی فقط با همین تنظیمات ادامه داده می‌شود؛ Keep و پوشه‌های اولویت هنگام ادامه دوباره حساب می‌شوند.
+        self._signature = {"roots": self.roots, "algorithm": self.engine.algorithm, "min_size": self.min_size,
+                           "rules": list(rules or []), "root_rules": dict(root_rules or {}),
+                           "excluded_folders": sorted(excluded_folders or []),
+                           "excluded_extensions": sorted(excluded_extensions or []),
+                           "include_hidden": include_hidden, "verify": verify}
+
+    @staticmethod
+    def _inside(path: str, folder: str) -> bool:
+        path, folder = os.path.normcase(path), os.path.normcase(folder)
+        return path == folder or path.startswith(folder.rstrip(os.sep) + os.sep)
 
     def _check(self):
         self.engine.check()
 
-    def _skip_dir(self, path: str) -> bool:
-        name = os.path.basename(path)
-        if name.casefold() in {"backup_deleted", ".git", "__pycache__"}:
-            return True
-        if not self.include_hidden and name.startswith("."):
-            return True
-        normalized = os.path.normcase(os.path.abspath(path))
-        return any(normalized == x or normalized.startswith(x + os.sep) for x in self.excluded_folders)
-
-    def enumerate_files(self) -> list[FileInfo]:
+    def _scan_dir(self, path: str) -> tuple[list[FileInfo], list[str]]:
+        if self.index is not None:
+            return self._scan_dir_indexed(path)
         files: list[FileInfo] = []
-        seen: set[str] = set()
-        for root in self.roots:
-            for current, dirs, names in os.walk(root, followlinks=False):
-                self._check()
-                dirs[:] = [d for d in dirs if not self._skip_dir(os.path.join(current, d))]
-                for name in names:
-                    self._check()
-                    path = os.path.join(current, name)
+        dirs: list[str] = []
+        priority = self.resolver.value(path)
+        rules = self.rules.for_path(path)
+        prefix = rules.relative(path)
+        complete = True
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if self.cancel.is_set():
+                        complete = False
+                        break
+                    name = entry.name
                     try:
-                        if not self.include_hidden and name.startswith("."):
+                        if entry.is_dir(follow_symlinks=False):
+                            if not rules.skip_dir(entry.path, prefix + name, name):
+                                dirs.append(entry.path)
                             continue
-                        if Path(name).suffix.casefold() in self.excluded_extensions or os.path.islink(path):
+                        if not entry.is_file(follow_symlinks=False):
                             continue
-                        real = os.path.normcase(os.path.realpath(path))
-                        if real in seen:
+                        rule = rules.skip_name(prefix + name, name)
+                        if rule is None:
                             continue
-                        seen.add(real)
-                        stat = os.stat(path)
-                        if stat.st_size < self.min_size:
+                        stat = entry.stat(follow_symlinks=False)
+                        if stat.st_size < self.min_size or rules.skip_stat(rule, stat.st_size, stat.st_mtime_ns):
                             continue
-                        files.append(FileInfo(path, stat.st_size, stat.st_mtime_ns, self.resolver.value(path)))
+                        files.append(FileInfo(entry.path, stat.st_size, stat.st_mtime_ns, priority,
+                                              device=stat.st_dev, inode=stat.st_ino, links=max(1, stat.st_nlink)))
                     except OSError as exc:
-                        self.errors.append(f"{path}: {exc}")
+                        complete = False
+                        self.errors.append(f"{entry.path}: {exc}")
+        except OSError as exc:
+            self.errors.append(f"{path}: {exc}")
+        else:
+            if complete:
+                self.listed.add(path)
+        return files, dirs
+
+    def _read_dir(self, path: str) -> tuple[list[str], list[IndexEntry]]:
+        subdirs: list[str] = []
+        entries: list[IndexEntry] = []
+        complete = True
+        with os.scandir(path) as listing:
+            for entry in listing:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        entries.append(IndexEntry(entry.name, stat.st_size, stat.st_mtime_ns, stat.st_dev, stat.st_ino,
+                                                  max(1, stat.st_nlink)))
+                except OSError as exc:
+                    complete = False
+                    self.errors.append(f"{entry.path}: {exc}")
+        if complete:
+            self.listed.add(path)
+        subdirs.sort()
+        entries.sort()
+        return subdirs, entries
+
+    def _diff(self, path: str, old: list[IndexEntry], new: list[IndexEntry]) -> None:
+        before = {x.name: x for x in old}
+        for entry in new:
+            previous = before.pop(entry.name, None)
+            if previous is None:
+                self.changes.added.append(os.path.join(path, entry.name))
+            elif (previous.size, previous.mtime_ns) != (entry.size, entry.mtime_ns):
+                self.changes.modified.append(os.path.join(path, entry.name))
+        self.changes.removed.extend(os.path.join(path, name) for name in before)
+
+    def _scan_dir_indexed(self, path: str) -> tuple[list[FileInfo], list[str]]:
+        # پوشه‌ای که mtime آن با نمایه یکی است در حالت trust_dir_mtime اصلاً خوانده نمی‌شود. در حالت پیش‌فرض با
+        # همان scandir پیمایش عادی دوباره فهرست می‌شود (نه stat جداگانه برای هر فایل) تا ویرایش درجا دیده شود و
+        # نمایه فقط اگر چیزی عوض شده باشد نوشته می‌شود.
+        old = self.index.directory(path)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+            if old is not None and old.mtime_ns == mtime_ns and self.index.trust_dir_mtime:
+                subdirs, entries = old.subdirs, old.files
+                self.listed.add(path)
+                self.index.seen(path)
+            else:
+                subdirs, entries = self._read_dir(path)
+                if old is not None and path not in self.listed:
+                    # فایلی که stat آن خطا داد حذف‌شده حساب نمی‌شود و ردیف قبلی‌اش می‌ماند.
+                    names = {x.name for x in entries}
+                    entries = sorted(entries + [x for x in old.files if x.name not in names])
+                if old is not None and (old.mtime_ns, sorted(old.subdirs), sorted(old.files)) == (mtime_ns, subdirs, entries):
+                    self.index.seen(path)
+                else:
+                    self.index.record(path, mtime_ns, subdirs, entries)
+        except FileNotFoundError as exc:
+            self.errors.append(f"{path}: {exc}")
+            return [], []
+        except OSError as exc:
+            # خطای گذرا (قفل، دسترسی) پوشه را حذف‌شده نشان نمی‌دهد: ردیف‌های قبلی نمایه می‌مانند و زیرپوشه‌های
+            # شناخته‌شده پیمایش می‌شوند، ولی فایل‌های این پوشه در این اسکن نمی‌آیند.
+            self.errors.append(f"{path}: {exc}")
+            if old is None:
+                return [], []
+            self.index.seen(path)
+            subdirs, entries = old.subdirs, None
+        if entries is None:
+            entries = []
+        else:
+            self._diff(path, old.files if old is not None else [], entries)
+        rules = self.rules.for_path(path)
+        prefix = rules.relative(path)
+        dirs = [os.path.join(path, name) for name in subdirs if not rules.skip_dir(os.path.join(path, name), prefix + name, name)]
+        files: list[FileInfo] = []
+        priority = self.resolver.value(path)
+        for entry in entries:
+            rule = rules.skip_name(prefix + entry.name, entry.name)
+            if rule is not None and entry.size >= self.min_size and not rules.skip_stat(rule, entry.size, entry.mtime_ns):
+                full = os.path.join(path, entry.name)
+                files.append(FileInfo(full, entry.size, entry.mtime_ns, priority,
+                                      device=entry.dev, inode=entry.ino, links=entry.links))
+        return files, dirs
+
+    def _finish_walk(self) -> None:
+        if self.index is not None:
+            self.changes.removed.extend(self.index.commit(self.roots))
+
+    def enumerate_files(self) -> FileTable:
+        files = FileTable()
+        self.progress.begin("walk", "خواندن پوشه‌ها", 1, 0)
+        for batch in parallel_walk(self.roots, self._scan_dir, workers=self.workers, check=self._check):
+            files.extend(batch)
+            self.progress.advance("walk", len(batch), sum(x.size for x in batch))
+        self._check()
+        self._finish_walk()
+        self.progress.finish("walk")
         return files
 
-    def _parallel(self, items: list[FileInfo], method, start: int, span: int, label: str) -> dict[str, str]:
+    def _results(self, items: list[FileInfo], kind: str) -> Iterator[HashResult]:
+        if self.backend is not None:
+            yield from self.backend.map(items, kind)
+            return
+        yield from self.scheduler.run(items, getattr(self.engine, kind), kind)
+
+    def _parallel(self, items: list[FileInfo], kind: str, start: int, span: int, label: str,
+                  on_done: Callable[[FileInfo, str | None], None] | None = None) -> dict[str, str]:
         output: dict[str, str] = {}
-        total = max(1, len(items))
-        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="duplicate-hash") as executor:
-            futures = {executor.submit(method, item): item for item in items}
-            for done, future in enumerate(as_completed(futures), 1):
+        self.progress.begin(kind, label, start, span, len(items), sum(read_size(x.size, kind) for x in items))
+        for item, digest, error in self._results(items, kind):
+            if digest:
+                output[item.path] = digest
+                if self.checkpoint is not None and kind in ("quick", "full"):
+                    self.checkpoint.record(kind, item.path, digest)
+            else:
+                self.errors.append(f"{item.path}: {error}")
+            if on_done:
+                on_done(item, digest)
+            self.progress.advance(kind, 1, read_size(item.size, kind))
+        self.progress.finish(kind)
+        return output
+
+    @staticmethod
+    def _exact_groups(items: list[FileInfo]) -> list[DuplicateGroup]:
+        exact: dict[str, list[FileInfo]] = defaultdict(list)
+        for item in items:
+            exact[item.digest].append(item)
+        return [DuplicateGroup(sorted(group, key=lambda x: (x.priority, len(x.path), x.modified_ns, x.path.casefold())))
+                for group in exact.values() if len(group) > 1]
+
+    def _link(self, item: FileInfo) -> bool:
+        # هر inode فقط یک بار هش می‌شود؛ پیوندهای سخت دیگر کنار نماینده نگه داشته می‌شوند.
+        # فایل تک‌پیوندی نماینده‌ای لازم ندارد و نگه داشته نمی‌شود.
+        identity = item.identity
+        if identity is None or item.links < 2:
+            return False
+        rep = self._link_reps.setdefault(identity, item)
+        if rep is item or rep.path == item.path:
+            return False
+        self._aliases[rep.path].append(item)
+        return True
+
+    @staticmethod
+    def _identify(item: FileInfo) -> FileInfo:
+        # در ویندوز DirEntry.stat دستگاه، شماره فایل و تعداد پیوند را صفر می‌دهد؛ فقط فایل‌های هم‌اندازه،
+        # که پیوند سختشان در نتیجه اثر دارد، جدا با os.stat خوانده می‌شوند.
+        if not _LATE_IDENTITY or item.inode:
+            return item
+        try:
+            stat = os.stat(item.path, follow_symlinks=False)
+        except OSError:
+            return item
+        return replace(item, device=stat.st_dev, inode=stat.st_ino, links=max(1, stat.st_nlink))
+
+    def _hardlink_groups(self, groups: list[DuplicateGroup]) -> list[DuplicateGroup]:
+        grouped = {f.path for group in groups for f in group.files}
+        rank = lambda x: (x.priority, len(x.path), x.modified_ns, x.path.casefold())
+        return [DuplicateGroup(sorted([rep, *self._aliases[rep.path]], key=rank))
+                for rep in self._link_reps.values() if rep.path in self._aliases and rep.path not in grouped]
+
+    def _emit(self, items: list[FileInfo], groups: list[DuplicateGroup]) -> None:
+        items = items + [replace(alias, digest=x.digest) for x in items for alias in self._aliases.get(x.path, ())]
+        for group in self._exact_groups(items):
+            groups.append(group)
+            self.on_group(group)
+
+    def _overlap_groups(self, files: FileTable) -> list[DuplicateGroup]:
+        # فایل کوچک‌تر از دو تکه فقط یک تکه دارد و هم‌پوشانی جزئی‌اش دیده نمی‌شود؛ اندازه از ستون جدول خوانده
+        # می‌شود تا برای فایل‌های کوچک FileInfo ساخته نشود.
+        seen: set[tuple[int, int]] = set()
+        items: list[FileInfo] = []
+        for index in range(len(files)):
+            if files.size[index] < 2 * CHUNK_MIN:
+                continue
+            item = files[index]
+            if item.identity in seen:
+                continue
+            if item.identity is not None:
+                seen.add(item.identity)
+            items.append(item)
+        # فقط فایل‌هایی اثر انگشت کامل می‌گیرند که تکه اولشان در فایل دیگری هم هست؛ نسخه بریده و ادامه‌دار
+        # همیشه تکه اول مشترک دارند. تکه اول (حداکثر CHUNK_MAX بایت) در لایه head کش می‌ماند.
+        heads = self._parallel(items, "head", 90, 2, "تکه اول فایل‌ها")
+        shared = Counter(heads.values())
+        items = [x for x in items if shared[heads.get(x.path)] > 1]
+        fingerprints = self._parallel(items, "partial", 92, 7, "اثر انگشت تکه‌ها")
+        return find_overlaps([(x, fingerprints[x.path]) for x in items if x.path in fingerprints], self.overlap)
+
+    def _verify_groups(self, quick_groups: list[list[FileInfo]], groups: list[DuplicateGroup], start: int, span: int) -> None:
+        self.progress.begin("verify", "مقایسه هم‌گام", start, span, sum(map(len, quick_groups)),
+                            sum(x.size for group in quick_groups for x in group))
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="duplicate-verify") as executor:
+            futures = {executor.submit(self.verifier.verify, group): group for group in quick_groups}
+            for future in as_completed(futures):
                 self._check()
-                item = futures[future]
                 try:
-                    output[item.path] = future.result()
+                    verified = future.result()
                 except Cancelled:
                     raise
                 except Exception as exc:
-                    self.errors.append(f"{item.path}: {exc}")
-                self.progress(start + int(span * done / total), f"{label}: {done:,}/{len(items):,}")
-        return output
+                    self.errors.append(f"{futures[future][0].path}: {exc}")
+                    verified = []
+                else:
+                    if self.checkpoint is not None:
+                        # عضوی که در گروه تأییدشده‌ای نیست با full خالی ثبت می‌شود تا گروه دوباره خوانده نشود.
+                        digests = {x.path: x.digest for items in verified for x in items}
+                        for item in futures[future]:
+                            self.checkpoint.record("full", item.path, digests.get(item.path, ""))
+                for items in verified:
+                    self._emit(items, groups)
+                # خواندن هم‌گام ممکن است زودتر متوقف شود؛ حجم کل گروه انجام‌شده شمرده می‌شود.
+                self.progress.advance("verify", len(futures[future]), sum(x.size for x in futures[future]))
+        self.progress.finish("verify")
 
-    def scan(self, detect_similar_names: bool = True, similarity_threshold: float = .86) -> ScanResult:
-        started = time.perf_counter()
-        self.progress(1, "در حال خواندن پوشه‌ها...")
-        files = self.enumerate_files()
-        self.progress(15, f"{len(files):,} فایل پیدا شد")
-        by_size: dict[int, list[FileInfo]] = defaultdict(list)
-        for item in files:
-            by_size[item.size].append(item)
-        candidates = [x for group in by_size.values() if len(group) > 1 for x in group]
-        quick = self._parallel(candidates, self.engine.quick, 15, 25, "بررسی سریع") if candidates else {}
+    def _fresh(self, item: FileInfo) -> FileInfo | None:
+        try:
+            stat = os.stat(item.path, follow_symlinks=False)
+        except OSError:
+            return None
+        return replace(item, size=stat.st_size, modified_ns=stat.st_mtime_ns, device=stat.st_dev, inode=stat.st_ino,
+                       links=max(1, stat.st_nlink))
+
+    def _resume(self, state: CheckpointState) -> tuple[FileTable, list[str]]:
+        # پیمایش تکرار نمی‌شود و جدول فایل‌ها از نقطه بازیابی می‌آید. فقط فایل‌های هم‌اندازه، که نتیجه به آن‌ها
+        # بستگی دارد، دوباره stat می‌شوند؛ فایل تغییرکرده هش‌های ذخیره‌شده‌اش را از دست می‌دهد و فایل حذف‌شده
+        # کنار می‌رود. فایلی که پس از نقطه بازیابی اضافه شده فقط در اسکن تازه دیده می‌شود. مسیر فایل‌های تغییرکرده
+        # برگردانده می‌شود تا ردیف هششان در خود نقطه بازیابی هم پاک شود.
+        files = state.files
+        files.reprioritize(self.resolver.value)
+        repeated = {size for size, count in Counter(files.size).items() if count > 1}
+        indices = [index for index, size in enumerate(files.size) if size in repeated]
+        self.progress.begin("resume", "بررسی فایل‌های اسکن قبلی", 1, 14, len(indices))
+        changed: dict[int, FileInfo | None] = {}
+        stale: list[str] = []
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="duplicate-restat") as executor:
+            # دسته‌های محدود تا برای میلیون‌ها فایل میلیون‌ها Future یک‌جا ساخته نشود.
+            for start in range(0, len(indices), 4096):
+                self._check()
+                batch = [files[index] for index in indices[start:start + 4096]]
+                for index, item, fresh in zip(indices[start:start + 4096], batch, executor.map(self._fresh, batch)):
+                    if fresh is None:
+                        self.changes.removed.append(item.path)
+                    elif (fresh.size, fresh.modified_ns) != (item.size, item.modified_ns):
+                        self.changes.modified.append(item.path)
+                    else:
+                        continue
+                    changed[index] = fresh if fresh is not None and fresh.size >= self.min_size else None
+                    stale.append(item.path)
+                    state.quick.pop(item.path, None)
+                    state.full.pop(item.path, None)
+                self.progress.advance("resume", len(batch))
+        self.progress.finish("resume")
+        self.logger.info("scan resume files=%s checked=%s changed=%s stage=%s", len(files), len(indices), len(changed), state.stage)
+        if not changed:
+            return files, stale
+        return FileTable(x for x in (changed.get(index, item) for index, item in enumerate(files)) if x is not None), stale
+
+    def _phased(self, state: CheckpointState | None = None) -> tuple[FileTable, int, list[DuplicateGroup]]:
+        stale: list[str] = []
+        if state is None:
+            with self.metrics.stage("walk"):
+                files = self.enumerate_files()
+        else:
+            with self.metrics.stage("resume"):
+                files, stale = self._resume(state)
+        if self.checkpoint is not None:
+            self.checkpoint.begin(self._signature, files, resumed=state is not None, stale=stale)
+            self.checkpoint.stage("quick")
+        known_quick, known_full = (state.quick, state.full) if state is not None else ({}, {})
+        self.progress.say(15, f"{len(files):,} فایل پیدا شد")
+        # گروه‌بندی اندازه روی ستون اندازه جدول انجام می‌شود و فقط فایل‌های هم‌اندازه FileInfo می‌شوند.
+        with self.metrics.stage("size", workers=1):
+            repeated = {size for size, count in Counter(files.size).items() if count > 1}
+            by_size: dict[int, list[FileInfo]] = defaultdict(list)
+            items = (files[index] for index, size in enumerate(files.size) if size in repeated)
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="duplicate-stat") as executor:
+                for item in executor.map(self._identify, items) if _LATE_IDENTITY else items:
+                    if not self._link(item):
+                        by_size[item.size].append(item)
+            candidates = [x for group in by_size.values() if len(group) > 1 for x in group]
+        with self.metrics.stage("quick"):
+            quick = {x.path: known_quick[x.path] for x in candidates if x.path in known_quick}
+            todo = [x for x in candidates if x.path not in quick]
+            if todo:
+                quick.update(self._parallel(todo, "quick", 15, 25, "بررسی سریع"))
         quick_groups: dict[tuple[int, str], list[FileInfo]] = defaultdict(list)
         for item in candidates:
             digest = quick.get(item.path)
             if digest:
                 quick_groups[(item.size, digest)].append(item)
-        full_candidates = [x for group in quick_groups.values() if len(group) > 1 for x in group]
-        full = self._parallel(full_candidates, self.engine.full, 40, 50, "هش کامل") if full_candidates else {}
-        exact: dict[tuple[int, str], list[FileInfo]] = defaultdict(list)
-        for item in full_candidates:
-            digest = full.get(item.path)
+        quick_groups = {key: group for key, group in quick_groups.items() if len(group) > 1}
+        full_candidates = [x for group in quick_groups.values() for x in group]
+        quick_key = {x.path: key for key, group in quick_groups.items() for x in group}
+        remaining = {key: len(group) for key, group in quick_groups.items()}
+        hashed: dict[tuple[int, str], list[FileInfo]] = defaultdict(list)
+        groups: list[DuplicateGroup] = []
+
+        # هر گروه سریع به محض کامل شدن هش همه اعضایش نهایی و گزارش می‌شود.
+        def settle(item: FileInfo, digest: str | None) -> None:
+            key = quick_key[item.path]
             if digest:
-                exact[(item.size, digest)].append(FileInfo(item.path, item.size, item.modified_ns, item.priority, digest))
-        groups = [DuplicateGroup(sorted(group, key=lambda x: (x.priority, len(x.path), x.modified_ns, x.path.casefold())))
-                  for group in exact.values() if len(group) > 1]
-        groups.sort(key=lambda g: (g.keeper.priority, -g.keeper.size, g.keeper.path.casefold()))
-        similar = find_similar(files, similarity_threshold) if detect_similar_names else []
+                hashed[key].append(replace(item, digest=digest))
+            remaining[key] -= 1
+            if not remaining[key]:
+                self._emit(hashed.pop(key, []), groups)
+
+        if self.checkpoint is not None:
+            self.checkpoint.stage("full")
+        if self.verifier is not None:
+            pending = []
+            for group in quick_groups.values():
+                # گروهی که همه اعضایش پیش از توقف تأیید شده بودند دوباره خوانده نمی‌شود.
+                if all(x.path in known_full for x in group):
+                    self._emit([replace(x, digest=known_full[x.path]) for x in group if known_full[x.path]], groups)
+                else:
+                    pending.append(group)
+            with self.metrics.stage("verify"):
+                self._verify_groups(pending, groups, 40, 50)
+        elif full_candidates:
+            with self.metrics.stage("full"):
+                todo = []
+                for item in full_candidates:
+                    if known_full.get(item.path):
+                        settle(item, known_full[item.path])
+                    else:
+                        todo.append(item)
+                if todo:
+                    self._parallel(todo, "full", 40, 50, "هش کامل", settle)
+        if self.checkpoint is not None:
+            self.checkpoint.stage("group")
+        return files, len(candidates), groups
+
+    def _pipelined(self) -> tuple[FileTable, int, list[DuplicateGroup]]:
+        # پیمایش، هش سریع و هش کامل هم‌زمان اجرا می‌شوند. هر سطل اندازه با رسیدن عضو دوم
+        # وارد هش سریع و هر برخورد هش سریع مستقیماً وارد هش کامل می‌شود. تعداد کارهای
+        # در جریان محدود است تا پیمایش جلوتر از دیسک نرود و حافظه بالا نرود.
+        files = FileTable()
+        # برای هر اندازه فقط شماره ردیف اولین فایل نگه داشته می‌شود؛ با رسیدن دومی -1 می‌شود.
+        first: dict[int, int] = {}
+        candidates = 0
+        quick_groups: dict[tuple[int, str], list[FileInfo]] = defaultdict(list)
+        hashed: dict[tuple[int, str], list[FileInfo]] = defaultdict(list)
+        finished: dict[tuple[int, str], int] = defaultdict(int)
+        groups: list[DuplicateGroup] = []
+        quick_jobs: dict[Future, FileInfo] = {}
+        full_jobs: dict[Future, tuple[FileInfo, tuple[int, str]]] = {}
+        limit = self.workers * 4
+        walking = True
+        self.progress.begin("walk", "پیمایش", 5, 0)
+        self.progress.begin("quick", "بررسی سریع", 15, 35)
+        self.progress.begin("full", "هش کامل", 50, 40)
+
+        def result(future: Future, path: str) -> str | None:
+            try:
+                return future.result()
+            except Cancelled:
+                raise
+            except Exception as exc:
+                self.errors.append(f"{path}: {exc}")
+                return None
+
+        with self.metrics.stage("pipeline", covers=("walk", "quick", "full")), \
+             ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="duplicate-quick") as quick_pool, \
+             ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="duplicate-hash") as full_pool:
+
+            def submit_quick(item: FileInfo) -> None:
+                quick_jobs[quick_pool.submit(self.engine.quick, item)] = item
+                self.progress.grow("quick", 1, read_size(item.size, "quick"))
+
+            def submit_full(item: FileInfo, key: tuple[int, str]) -> None:
+                full_jobs[full_pool.submit(self.engine.full, item)] = (item, key)
+                self.progress.grow("full", 1, item.size)
+
+            def settle(key: tuple[int, str]) -> None:
+                if not walking and not quick_jobs and finished[key] == len(quick_groups[key]) > 1:
+                    self._emit(hashed.pop(key, []), groups)
+
+            def drain(block: bool) -> None:
+                self._check()
+                jobs = list(quick_jobs) + list(full_jobs)
+                if not jobs:
+                    return
+                done, _ = wait(jobs, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in quick_jobs:
+                        item = quick_jobs.pop(future)
+                        self.progress.advance("quick", 1, read_size(item.size, "quick"))
+                        digest = result(future, item.path)
+                        if digest:
+                            key = (item.size, digest)
+                            group = quick_groups[key]
+                            group.append(item)
+                            if self.verifier is not None:
+                                continue
+                            if len(group) == 2:
+                                submit_full(group[0], key)
+                            if len(group) >= 2:
+                                submit_full(item, key)
+                    else:
+                        item, key = full_jobs.pop(future)
+                        self.progress.advance("full", 1, item.size)
+                        digest = result(future, item.path)
+                        if digest:
+                            hashed[key].append(replace(item, digest=digest))
+                        finished[key] += 1
+                        settle(key)
+
+            for batch in parallel_walk(self.roots, self._scan_dir, workers=self.workers, check=self._check):
+                self.progress.advance("walk", len(batch), sum(x.size for x in batch))
+                for item in batch:
+                    index = files.append(item)
+                    if self._link(item):
+                        continue
+                    previous = first.setdefault(item.size, index)
+                    if previous == index:
+                        continue
+                    if previous >= 0:
+                        first[item.size] = -1
+                        head = self._identify(files[previous])
+                        if not self._link(head):
+                            submit_quick(head)
+                            candidates += 1
+                    item = self._identify(item)
+                    if self._link(item):
+                        continue
+                    submit_quick(item)
+                    candidates += 1
+                drain(False)
+                while len(quick_jobs) + len(full_jobs) >= limit:
+                    drain(True)
+            self._check()
+            self._finish_walk()
+            self.progress.finish("walk")
+            walking = False
+            while quick_jobs:
+                drain(True)
+            # گروه‌های سریع اکنون بسته‌اند؛ گروه‌هایی که هش کاملشان تمام شده همین حالا نهایی می‌شوند.
+            for key in list(hashed):
+                settle(key)
+            while full_jobs:
+                drain(True)
+        if self.verifier is not None:
+            with self.metrics.stage("verify"):
+                self._verify_groups([group for group in quick_groups.values() if len(group) > 1], groups, 40, 50)
+        return files, candidates, groups
+
+    def scan(self, detect_similar_names: bool = True, similarity_threshold: float = .86, similarity_budget: float = 0.0,
+             *, resume: bool = False) -> ScanResult:
+        # resume اسکن مرحله‌ای قطع‌شده را از نقطه بازیابی ادامه می‌دهد (حالت پایپ‌لاین نقطه بازیابی ندارد).
+        if resume and self.checkpoint is None:
+            raise CheckpointError("resuming needs a scan checkpoint")
+        state = self.checkpoint.load(self._signature) if resume else None
+        started = time.perf_counter()
+        sql_before = self.engine.cache.sql_seconds
+        self.progress.say(1, "در حال خواندن پوشه‌ها...")
+        with self.metrics.stage("prefetch", workers=1):
+            self.engine.cache.prefetch(self.roots, self.engine.algorithm)
+        try:
+            files, candidates, groups = self._pipelined() if self.pipeline and state is None else self._phased(state)
+            overlaps = []
+            if self.overlap > 0:
+                with self.metrics.stage("partial"):
+                    overlaps = self._overlap_groups(files)
+        except BaseException:
+            if self.checkpoint is not None:
+                self.checkpoint.save(force=True)
+            raise
+        finally:
+            if self.backend is not None:
+                self.backend.close()
+            with self.metrics.stage("flush", workers=1):
+                self.engine.cache.flush()
+        with self.metrics.stage("group", workers=1):
+            groups.sort(key=lambda g: (g.keeper.priority, -g.keeper.size, g.keeper.path.casefold()))
+            hardlinks = self._hardlink_groups(groups)
+        similar, similar_complete = [], True
+        if detect_similar_names:
+            with self.metrics.stage("similar", workers=1):
+                similar, similar_complete = find_similar(files, similarity_threshold, similarity_budget)
+            if not similar_complete:
+                self.logger.warning("similar names stopped at the %.0fs time budget groups=%s", similarity_budget, len(similar))
+        if self.checkpoint is not None:
+            self.checkpoint.clear()
         elapsed = time.perf_counter() - started
-        self.progress(100, "اسکن کامل شد")
-        self.logger.info("scan files=%s exact_groups=%s similar_groups=%s errors=%s elapsed=%.2f",
-                         len(files), len(groups), len(similar), len(self.errors), elapsed)
-        return ScanResult(groups, similar, len(files), len(candidates), self.engine.cache_hits, self.errors, elapsed)
+        metrics = self.metrics.result(self.engine.cache_hits, self.engine.cache_misses,
+                                      self.engine.cache.sql_seconds - sql_before)
+        self.progress.say(100, "اسکن کامل شد")
+        self.logger.info("scan files=%s exact_groups=%s similar_groups=%s hardlink_groups=%s overlap_groups=%s errors=%s "
+                         "cache_hits=%s cache_misses=%s elapsed=%.2f", len(files), len(groups), len(similar), len(hardlinks),
+                         len(overlaps),
+                         len(self.errors), self.engine.cache_hits, self.engine.cache_misses, elapsed)
+        self.logger.info("scan metrics %s", json.dumps(metrics.as_dict()))
+        return ScanResult(groups, similar, len(files), candidates, self.engine.cache_hits, self.errors, elapsed,
+                          self.engine.cache_misses, self.changes, hardlinks, overlaps, files, dict(self.rules.skipped),
+                          metrics, similar_complete, frozenset(self.listed))
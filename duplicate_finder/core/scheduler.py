@@ -0,0 +1,110 @@
+from __future__ import annotations
+import os, time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Hashable, Iterable, Iterator
+from duplicate_finder.models import FileInfo
+from .hash_engine import Cancelled, read_size
+from .process_backend import HashResult
+
+def device_key(item: FileInfo) -> Hashable:
+    # ویندوز در DirEntry.stat شماره دستگاه نمی‌دهد؛ حرف درایو جایگزین آن است.
+    return item.device or os.path.splitdrive(item.path)[0].casefold()
+
+def resolve_limits(folders: dict[str, int] | None) -> dict[Hashable, int]:
+    limits: dict[Hashable, int] = {}
+    for folder, limit in (folders or {}).items():
+        try:
+            device = os.stat(folder).st_dev
+        except OSError:
+            continue
+        limits[device or os.path.splitdrive(os.path.abspath(folder))[0].casefold()] = max(1, int(limit))
+    return limits
+
+class _Device:
+    def __init__(self, items: list[FileInfo], limit: int, tuned: bool):
+        self.queue = deque(items)
+        self.limit = limit
+        self.tuned = tuned
+        self.running = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+        self.best = 0.0
+
+class DeviceScheduler:
+    # کارها براساس دستگاه (st_dev) جدا می‌شوند و هر دستگاه سقف هم‌زمانی خودش را دارد. اگر سقفی
+    # تنظیم نشده باشد از ۲ شروع می‌شود و تا وقتی سرعت خواندن بهتر شود بالا می‌رود؛ دیسک
+    # چرخان معمولاً روی ۱ یا ۲ می‌ماند و SSD تا سقف workers می‌رود.
+    def __init__(self, workers: int, *, limits: dict[Hashable, int] | None = None, auto_tune: bool = True,
+                 window: float = 1.0, check: Callable[[], None] = lambda: None):
+        self.workers = max(1, workers)
+        self.limits = limits or {}
+        self.auto_tune = auto_tune
+        self.window = window
+        self.check = check
+
+    @staticmethod
+    def order(items: Iterable[FileInfo], kind: str) -> list[FileInfo]:
+        # هش سریع چند بلوک کوچک می‌خواند و هزینه‌اش جابه‌جایی هد است، پس ترتیب مکانی (پوشه، inode).
+        # هش کامل کل فایل را می‌خواند، پس بزرگ‌ترها اول تا انتهای کار منتظر یک فایل بزرگ نماند.
+        if kind == "quick":
+            return sorted(items, key=lambda x: (os.path.dirname(x.path), x.inode, x.path))
+        return sorted(items, key=lambda x: (-x.size, os.path.dirname(x.path), x.inode))
+
+    def _tune(self, device: _Device) -> None:
+        elapsed = time.perf_counter() - device.started
+        if device.tuned or elapsed < self.window:
+            return
+        rate = device.bytes / elapsed
+        if rate > device.best * 1.1 and device.limit < self.workers:
+            device.best = rate
+            device.limit += 1
+        else:
+            if rate < device.best * .9:
+                device.limit = max(1, device.limit - 1)
+            device.tuned = True
+        device.bytes, device.started = 0, time.perf_counter()
+
+    def run(self, items: list[FileInfo], method: Callable[[FileInfo], str], kind: str = "full") -> Iterator[HashResult]:
+        buckets: dict[Hashable, list[FileInfo]] = {}
+        for item in items:
+            buckets.setdefault(device_key(item), []).append(item)
+        devices = {}
+        for key, bucket in buckets.items():
+            configured = self.limits.get(key)
+            initial = configured or (min(2, self.workers) if self.auto_tune else self.workers)
+            devices[key] = _Device(self.order(bucket, kind), initial, tuned=bool(configured) or not self.auto_tune)
+        capacity = sum(self.limits.get(key) or self.workers for key in devices)
+        in_flight: dict[Future, tuple[FileInfo, _Device]] = {}
+        with ThreadPoolExecutor(max_workers=max(1, capacity), thread_name_prefix="duplicate-hash") as executor:
+
+            def fill() -> None:
+                for device in devices.values():
+                    while device.running < device.limit and device.queue:
+                        item = device.queue.popleft()
+                        in_flight[executor.submit(method, item)] = (item, device)
+                        device.running += 1
+
+            try:
+                fill()
+                while in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    self.check()
+                    for future in done:
+                        item, device = in_flight.pop(future)
+                        device.running -= 1
+                        device.bytes += read_size(item.size, kind)
+                        digest, error = None, None
+                        try:
+                            digest = future.result()
+                        except Cancelled:
+                            raise
+                        except Exception as exc:
+                            error = str(exc)
+                        if self.auto_tune:
+                            self._tune(device)
+                        yield item, digest, error
+                    fill()
+            finally:
+                for future in in_flight:
+                    future.cancel()
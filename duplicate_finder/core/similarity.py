@@ -1,9 +1,14 @@
 from __future__ import annotations
-import re
-from collections import defaultdict
+import bisect, math, re, time
+from array import array
+from collections import Counter, defaultdict
 from difflib import SequenceMatcher
 from pathlib import Path
-from duplicate_finder.models import DuplicateGroup, FileInfo
+from typing import Iterable
+from duplicate_finder.models import DuplicateGroup, FileTable
+
+Q = 3
+_PAD = "\0" * (Q - 1)
 
 def normalize_name(path: str) -> str:
     value = Path(path).stem.casefold()
@@ -12,29 +17,114 @@ def normalize_name(path: str) -> str:
     value = re.sub(r"[\W_]+", " ", value, flags=re.UNICODE)
     return re.sub(r"\s+", " ", value).strip()
 
-def find_similar(files: list[FileInfo], threshold: float) -> list[DuplicateGroup]:
-    buckets: dict[tuple[str, str], list[FileInfo]] = defaultdict(list)
-    for item in files:
-        name = normalize_name(item.path)
-        buckets[(Path(item.path).suffix.casefold(), name[:1])].append(item)
+def _tokens(name: str) -> set[tuple[str, int]]:
+    # n-gram‌های تکراری با شماره تکرارشان یکتا می‌شوند تا اشتراک مجموعه‌ها همان اشتراک چندمجموعه‌ها باشد.
+    padded = _PAD + name + _PAD
+    seen: Counter[str] = Counter()
+    tokens = set()
+    for i in range(len(name) + Q - 1):
+        gram = padded[i:i + Q]
+        tokens.add((gram, seen[gram]))
+        seen[gram] += 1
+    return tokens
+
+def _min_shared(left: int, right: int, threshold: float) -> int:
+    # اگر ratio ≥ t باشد، فاصله درج/حذف حداکثر (1-t)(la+lb) است و هر ویرایش حداکثر Q n-gram را
+    # خراب می‌کند؛ پس دو نام دست‌کم این تعداد n-gram مشترک دارند.
+    edits = math.floor((1 - threshold) * (left + right) + 1e-9)
+    return max(left, right) + Q - 1 - Q * edits
+
+def _length_range(length: int, threshold: float) -> tuple[int, int]:
+    if threshold <= 0:
+        return 0, 1 << 30
+    return math.ceil(length * threshold / (2 - threshold) - 1e-9), math.floor(length * (2 - threshold) / threshold + 1e-9)
+
+def _ids(items: Iterable[set], vocabulary: dict) -> list[array]:
+    # هر نام فقط آرایه فشرده شماره نشانه‌هایش را نگه می‌دارد (چهار بایت برای هر نشانه)؛ اندازه آن به طول
+    # نام بستگی دارد نه به واژگان کل سطل.
+    return [array("I", sorted(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)) for tokens in items]
+
+def _characters(name: str) -> set[tuple[str, int]]:
+    seen: Counter[str] = Counter()
+    for char in name:
+        seen[char] += 1
+    return {(char, n) for char, count in seen.items() for n in range(count)}
+
+def similar_pairs(names: list[str], threshold: float, deadline: float = 0.0) -> tuple[dict[int, set[int]], bool]:
+    # خروجی {i: {j > i}} برای جفت‌هایی با ratio ≥ threshold و اینکه کار پیش از مهلت تمام شد یا نه.
+    grams = _ids((_tokens(x) for x in names), {})
+    frequency: Counter[int] = Counter(t for x in grams for t in x)
+    # اشتراک چندمجموعه حروف همان کران quick_ratio است.
+    chars = _ids((_characters(x) for x in names), {})
+    index: dict[int, list[int]] = defaultdict(list)
+    by_length = sorted(range(len(names)), key=lambda i: len(names[i]))
+    lengths = [len(names[i]) for i in by_length]
+    neighbors: dict[int, set[int]] = defaultdict(set)
+    checked = 0
+
+    def score(i: int, j: int, own_chars: set[int], own_grams: set[int]) -> None:
+        # مجموعه‌های نام جاری یک بار ساخته می‌شوند و هر نامزد فقط با آرایه خودش مقایسه می‌شود.
+        left, right = (i, j) if i < j else (j, i)
+        a, b = names[left], names[right]
+        total = len(a) + len(b)
+        if 2 * len(own_chars.intersection(chars[j])) < threshold * total - 1e-9:
+            return
+        if len(own_grams.intersection(grams[j])) < _min_shared(len(a), len(b), threshold):
+            return
+        if SequenceMatcher(None, a, b).ratio() >= threshold:
+            neighbors[left].add(right)
+
+    for position, i in enumerate(by_length):
+        length = len(names[i])
+        low, high = _length_range(length, threshold)
+        needed = min(_min_shared(length, other, threshold) for other in range(low, high + 1))
+        if needed <= 0:
+            # نام‌های خیلی کوتاه با آستانه پایین هیچ کران n-gram ندارند؛ با همه هم‌طول‌ها مقایسه می‌شوند.
+            candidates = by_length[bisect.bisect_left(lengths, low):position]
+            # همه نشانه‌هایش نمایه می‌شود تا نام بلندتری که فیلتر پیشوندی دارد آن را از دست ندهد: پیشوند او
+            # دست‌کم یک نشانه مشترک را دربر دارد و آن نشانه این‌جا حتماً نمایه شده است.
+            prefix = list(grams[i])
+        else:
+            # فیلتر پیشوندی: دو نام با دست‌کم needed نشانه مشترک حتماً در نادرترین
+            # len - needed + 1 نشانه‌شان اشتراک دارند؛ فقط همین پیشوندها نمایه می‌شوند.
+            prefix = sorted(grams[i], key=lambda t: (frequency[t], t))[:max(0, len(grams[i]) - needed + 1)]
+            # نام‌ها به ترتیب طول پردازش می‌شوند، پس همه نمایه‌شده‌ها حداکثر هم‌طول‌اند.
+            candidates = {j for token in prefix for j in index.get(token, ()) if len(names[j]) >= low}
+        own_chars, own_grams = (set(chars[i]), set(grams[i])) if candidates else (set(), set())
+        for j in candidates:
+            checked += 1
+            if deadline and not checked % 4096 and time.perf_counter() > deadline:
+                return neighbors, False
+            score(i, j, own_chars, own_grams)
+        for token in prefix:
+            index[token].append(i)
+    return neighbors, True
+
+def find_similar(files: FileTable, threshold: float, time_budget: float = 0.0) -> tuple[list[DuplicateGroup], bool]:
+    # مقدار دوم False یعنی سقف زمان تمام شد و گروه‌ها ناقص‌اند.
+    deadline = time.perf_counter() + time_budget if time_budget > 0 else 0.0
+    # سطل‌ها فقط شماره ردیف جدول و نام را نگه می‌دارند؛ FileInfo فقط برای اعضای گروه‌ها ساخته می‌شود.
+    buckets: dict[str, list[tuple[int, str]]] = defaultdict(list)
+    for index in range(len(files)):
+        name = files.name(index)
+        buckets[Path(name).suffix.casefold()].append((index, name))
     groups: list[DuplicateGroup] = []
-    for bucket in buckets.values():
-        if len(bucket) > 500:
+    # گروه‌بندی حریصانه به ترتیب ورودی وابسته است و پیمایش موازی ترتیب ثابتی ندارد؛ پس با مرتب‌سازی
+    # (پوشه، نام) هر بار همان گروه‌ها ساخته می‌شوند.
+    for _, bucket in sorted(buckets.items()):
+        if len(bucket) < 2:
             continue
-        used: set[str] = set()
-        for index, left in enumerate(bucket):
-            if left.path in used:
+        bucket.sort(key=lambda x: (files.dirs[files.dir[x[0]]], x[1]))
+        neighbors, finished = similar_pairs([normalize_name(name) for _, name in bucket], threshold, deadline)
+        used: set[int] = set()
+        for index in range(len(bucket)):
+            if index in used:
                 continue
-            left_name = normalize_name(left.path)
-            matches = [left]
-            for right in bucket[index + 1:]:
-                if right.path in used:
-                    continue
-                if SequenceMatcher(None, left_name, normalize_name(right.path)).ratio() >= threshold:
-                    matches.append(right)
-                    used.add(right.path)
+            matches = [index] + [j for j in sorted(neighbors.get(index, ())) if j not in used]
             if len(matches) > 1:
-                used.add(left.path)
-                matches.sort(key=lambda x: (x.priority, len(x.path), x.path.casefold()))
-                groups.append(DuplicateGroup(matches, exact=False))
-    return groups
+                used.update(matches)
+                members = sorted((files[bucket[j][0]] for j in matches), key=lambda x: (x.priority, len(x.path), x.path.casefold()))
+                groups.append(DuplicateGroup(members, exact=False))
+        if not finished:
+            return groups, False
+    return groups, True
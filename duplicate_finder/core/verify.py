@@ -0,0 +1,109 @@
+from __future__ import annotations
+import hashlib, time
+from collections import defaultdict
+from dataclasses import replace
+from duplicate_finder.models import FileInfo
+from .hash_engine import Cancelled, HashEngine, advise_sequential, buffer, read_into
+
+class LockstepVerifier:
+    def __init__(self, engine: HashEngine, errors: list[str], *, byte_compare: bool = False,
+                 chunk_size: int = 1024 * 1024, max_open: int = 32):
+        self.engine = engine
+        self.errors = errors
+        self.byte_compare = byte_compare
+        self.chunk_size = chunk_size
+        self.max_open = max(2, max_open)
+
+    def verify(self, items: list[FileInfo]) -> list[list[FileInfo]]:
+        # اعضای یک گروه هش سریع با هم و تکه‌به‌تکه خوانده می‌شوند و به محض اختلاف جدا
+        # می‌شوند؛ عضوی که تنها بماند دیگر خوانده نمی‌شود.
+        if len(items) <= self.max_open and (self.byte_compare or not self._any_cached(items)):
+            return self._lockstep(items)
+        classes = self._by_digest(items)
+        if not self.byte_compare:
+            return classes
+        confirmed: list[list[FileInfo]] = []
+        for group in classes:
+            head, matched = group[0], [group[0]]
+            window = self.max_open - 1
+            for start in range(1, len(group), window):
+                for sub in self._lockstep([head] + group[start:start + window]):
+                    if any(x.path == head.path for x in sub):
+                        matched += [x for x in sub if x.path != head.path]
+                    else:
+                        confirmed.append(sub)
+            if len(matched) > 1:
+                confirmed.append(matched)
+        return confirmed
+
+    def _any_cached(self, items: list[FileInfo]) -> bool:
+        cache, algorithm = self.engine.cache, self.engine.algorithm
+        return any(cache.get(x.path, x.size, x.modified_ns, algorithm, identity=x.identity) for x in items)
+
+    def _by_digest(self, items: list[FileInfo]) -> list[list[FileInfo]]:
+        classes: dict[str, list[FileInfo]] = defaultdict(list)
+        for item in items:
+            try:
+                digest = self.engine.full(item)
+            except Cancelled:
+                raise
+            except Exception as exc:
+                self.errors.append(f"{item.path}: {exc}")
+                continue
+            classes[digest].append(replace(item, digest=digest))
+        return [group for group in classes.values() if len(group) > 1]
+
+    def _lockstep(self, items: list[FileInfo]) -> list[list[FileInfo]]:
+        handles, hashes = {}, {}
+        started, opened, read = time.perf_counter(), 0, 0
+        try:
+            alive: list[FileInfo] = []
+            for item in items:
+                try:
+                    handles[item.path] = open(item.path, "rb", buffering=0)
+                    advise_sequential(handles[item.path].fileno())
+                    hashes[item.path] = hashlib.new(self.engine.algorithm)
+                    alive.append(item)
+                    opened += 1
+                except OSError as exc:
+                    self.errors.append(f"{item.path}: {exc}")
+            groups = [alive] if len(alive) > 1 else []
+            remaining = items[0].size if items else 0
+            view = buffer(self.chunk_size)
+            while groups and remaining > 0:
+                self.engine.check()
+                next_groups: list[list[FileInfo]] = []
+                for group in groups:
+                    buckets: dict[bytes, list[FileInfo]] = defaultdict(list)
+                    for item in group:
+                        try:
+                            chunk = view[:read_into(handles[item.path], view)]
+                        except OSError as exc:
+                            self.errors.append(f"{item.path}: {exc}")
+                            continue
+                        read += len(chunk)
+                        running = hashes[item.path]
+                        running.update(chunk)
+                        # خلاصه پیشوند خوانده‌شده کلید مقایسه است؛ در حالت بایت‌به‌بایت خود تکه.
+                        buckets[chunk.tobytes() if self.byte_compare else running.copy().digest()].append(item)
+                    for members in buckets.values():
+                        if len(members) > 1:
+                            next_groups.append(members)
+                        else:
+                            handles.pop(members[0].path).close()
+                groups = next_groups
+                remaining -= self.chunk_size
+            result = []
+            for group in groups:
+                verified = []
+                for item in group:
+                    digest = hashes[item.path].hexdigest()
+                    self.engine.cache.put(item.path, item.size, item.modified_ns, self.engine.algorithm, digest, identity=item.identity)
+                    verified.append(replace(item, digest=digest))
+                result.append(verified)
+            return result
+        finally:
+            for handle in handles.values():
+                handle.close()
+            if self.engine.metrics is not None and opened:
+                self.engine.metrics.work("verify", items[0].path, time.perf_counter() - started, read, opened)
@@ -0,0 +1,29 @@
+from __future__ import annotations
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+DirScan = Callable[[str], tuple[list[T], list[str]]]
+
+def parallel_walk(roots: Iterable[str], scan_dir: DirScan, *, workers: int = 4,
+                  check: Callable[[], None] = lambda: None) -> Iterator[list[T]]:
+    # scan_dir یک پوشه را با os.scandir می‌خواند و (آیتم‌ها، زیرپوشه‌ها) برمی‌گرداند.
+    # پشته به‌جای صف باعث پیمایش عمقی و کوچک ماندن لیست پوشه‌های منتظر می‌شود.
+    backlog = list(reversed(list(roots)))
+    limit = max(1, workers) * 2
+    pending = set()
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="duplicate-walk") as executor:
+        try:
+            while backlog or pending:
+                check()
+                while backlog and len(pending) < limit:
+                    pending.add(executor.submit(scan_dir, backlog.pop()))
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    items, dirs = future.result()
+                    backlog.extend(reversed(dirs))
+                    if items:
+                        yield items
+        finally:
+            for future in pending:
+                future.cancel()
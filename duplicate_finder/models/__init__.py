@@ -1,2 +1,6 @@
-from .files import FileInfo, DuplicateGroup, ScanResult
-__all__ = ["FileInfo", "DuplicateGroup", "ScanResult"]
+from .files import FileInfo, DuplicateGroup, FileChanges, ScanResult
+from .metrics import ScanMetrics, SlowFile, StageMetrics
+from .progress import ProgressSnapshot, StageProgress
+from .table import FileTable
+__all__ = ["FileInfo", "DuplicateGroup", "FileChanges", "ScanResult", "ScanMetrics", "SlowFile", "StageMetrics",
+           "ProgressSnapshot", "StageProgress", "FileTable"]
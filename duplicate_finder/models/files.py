@@ -1,5 +1,11 @@
 from __future__ import annotations
+from collections import defaultdict
 from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .metrics import ScanMetrics
+    from .table import FileTable
 
 @dataclass(frozen=True, slots=True)
 class FileInfo:
@@ -8,15 +14,23 @@ class FileInfo:
     modified_ns: int
     priority: int = 999
     digest: str = ""
+    device: int = 0
+    inode: int = 0
+    links: int = 1
 
     @property
     def protected(self) -> bool:
         return self.priority == -1
 
+    @property
+    def identity(self) -> tuple[int, int] | None:
+        return (self.device, self.inode) if self.inode else None
+
 @dataclass(slots=True)
 class DuplicateGroup:
     files: list[FileInfo]
     exact: bool = True
+    shared_bytes: int = 0
 
     @property
     def keeper(self) -> FileInfo:
@@ -24,11 +38,32 @@ class DuplicateGroup:
 
     @property
     def suggested_removals(self) -> list[FileInfo]:
-        protected = [f for f in self.files if f.protected]
-        if protected:
-            return [f for f in self.files if not f.protected]
-        keeper = self.keeper
-        return [f for f in self.files if f.path != keeper.path]
+        # پیوندهای سخت نسخه نگه‌داشته‌شده پیشنهاد حذف نمی‌شوند؛ حذفشان فضایی آزاد نمی‌کند.
+        kept = [f for f in self.files if f.protected] or [self.keeper]
+        kept_paths = {f.path for f in kept}
+        kept_ids = {f.identity for f in kept if f.identity}
+        return [f for f in self.files if f.path not in kept_paths and f.identity not in kept_ids]
+
+    @property
+    def reclaimable_bytes(self) -> int:
+        freed = 0
+        links: dict[tuple[int, int], list[FileInfo]] = defaultdict(list)
+        for f in self.suggested_removals:
+            if f.identity is None:
+                freed += f.size
+            else:
+                links[f.identity].append(f)
+        # یک inode فقط وقتی آزاد می‌شود که همه پیوندهایش حذف شوند.
+        return freed + sum(same[0].size for same in links.values() if len(same) >= same[0].links)
+
+@dataclass(slots=True)
+class FileChanges:
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    modified: list[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.modified)
 
 @dataclass(slots=True)
 class ScanResult:
@@ -39,3 +74,16 @@ class ScanResult:
     cache_hits: int = 0
     errors: list[str] = field(default_factory=list)
     elapsed_seconds: float = 0.0
+    cache_misses: int = 0
+    changes: FileChanges = field(default_factory=FileChanges)
+    hardlink_groups: list[DuplicateGroup] = field(default_factory=list)
+    overlap_groups: list[DuplicateGroup] = field(default_factory=list)
+    files: FileTable | None = None
+    skipped: dict[str, int] = field(default_factory=dict)
+    metrics: ScanMetrics | None = None
+    similar_complete: bool = True
+    listed_dirs: frozenset[str] = frozenset()
+
+    @property
+    def reclaimable_bytes(self) -> int:
+        return sum(g.reclaimable_bytes for g in self.duplicate_groups)
@@ -0,0 +1,52 @@
+from __future__ import annotations
+from dataclasses import asdict, dataclass, field
+
+@dataclass(frozen=True, slots=True)
+class StageMetrics:
+    name: str
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    files: int = 0
+    bytes_read: int = 0
+    busy_seconds: float = 0.0
+    workers: int = 1
+
+    @property
+    def utilization(self) -> float | None:
+        # سهم زمانی که رشته‌های کارگر واقعاً مشغول خواندن و هش بوده‌اند؛ بدون زمان‌سنجی هر فایل None است.
+        if not self.busy_seconds or self.wall_seconds <= 0:
+            return None
+        return min(1.0, self.busy_seconds / (self.wall_seconds * max(1, self.workers)))
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_read / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+@dataclass(frozen=True, slots=True)
+class SlowFile:
+    path: str
+    seconds: float
+    bytes_read: int
+    stage: str
+
+@dataclass(slots=True)
+class ScanMetrics:
+    stages: list[StageMetrics] = field(default_factory=list)
+    files_opened: int = 0
+    bytes_read: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    sqlite_seconds: float = 0.0
+    slowest: list[SlowFile] = field(default_factory=list)
+    profiles: dict[str, str] = field(default_factory=dict)
+
+    def stage(self, name: str) -> StageMetrics | None:
+        return next((x for x in self.stages if x.name == name), None)
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        for stage, raw in zip(self.stages, data["stages"]):
+            raw["utilization"] = stage.utilization
+        # متن پروفایل در گزارش JSON نمی‌آید؛ فقط نام مراحل پروفایل‌شده.
+        data["profiles"] = sorted(self.profiles)
+        return data
@@ -0,0 +1,39 @@
+from __future__ import annotations
+from dataclasses import dataclass
+
+@dataclass(frozen=True, slots=True)
+class StageProgress:
+    name: str
+    label: str
+    files_done: int = 0
+    files_total: int = 0
+    bytes_done: int = 0
+    bytes_total: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files_done / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_done / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta_seconds(self) -> float | None:
+        # اگر حجم کل معلوم باشد ETA از سرعت بایتی و وگرنه از سرعت فایلی حساب می‌شود.
+        if self.bytes_total and self.bytes_per_second:
+            return max(0.0, self.bytes_total - self.bytes_done) / self.bytes_per_second
+        if self.files_total and self.files_per_second:
+            return max(0, self.files_total - self.files_done) / self.files_per_second
+        return None
+
+@dataclass(frozen=True, slots=True)
+class ProgressSnapshot:
+    percent: int
+    message: str
+    stage: str = ""
+    stages: tuple[StageProgress, ...] = ()
+    elapsed: float = 0.0
+    eta_seconds: float | None = None
+    cache_hit_rate: float | None = None
@@ -0,0 +1,111 @@
+from __future__ import annotations
+import json, os
+from array import array
+from typing import Callable, Iterable, Iterator
+from .files import FileInfo
+
+class FileTable:
+    # هر فایل به‌جای یک شیء FileInfo چند خانه در آرایه‌های فشرده است: شناسه پوشه (هر پوشه یک
+    # بار نگه داشته می‌شود)، نام در یک بافر UTF-8 با آرایه آفست، و اندازه، mtime و inode در
+    # آرایه‌های عددی. اولویت و دستگاه به پوشه بسته‌اند و برای هر پوشه یک بار ذخیره می‌شوند؛ فایل
+    # استثنا (مثلاً bind mount تک‌فایل) در دیکشنری جدا می‌رود. FileInfo فقط هنگام دسترسی ساخته می‌شود.
+    def __init__(self, items: Iterable[FileInfo] = ()):
+        self.dirs: list[str] = []
+        self._dir_ids: dict[str, int] = {}
+        self.dir_priority = array("h")
+        self.dir_device = array("Q")
+        self.dir = array("I")
+        self.name_end = array("Q")
+        self.names = bytearray()
+        self.size = array("q")
+        self.modified_ns = array("q")
+        self.inode = array("Q")
+        self.links = array("I")
+        self._exceptions: dict[int, tuple[int, int]] = {}
+        self.extend(items)
+
+    def append(self, info: FileInfo) -> int:
+        folder, name = os.path.split(info.path)
+        folder_id = self._dir_ids.get(folder)
+        if folder_id is None:
+            folder_id = self._dir_ids[folder] = len(self.dirs)
+            self.dirs.append(folder)
+            self.dir_priority.append(info.priority)
+            self.dir_device.append(info.device)
+        elif (self.dir_priority[folder_id], self.dir_device[folder_id]) != (info.priority, info.device):
+            self._exceptions[len(self.size)] = (info.priority, info.device)
+        self.dir.append(folder_id)
+        # surrogatepass نام‌های غیرقابل‌رمزگشایی (surrogateescape در لینوکس، نیم‌جفت‌ها در ویندوز) را سالم نگه می‌دارد.
+        self.names += name.encode("utf-8", "surrogatepass")
+        self.name_end.append(len(self.names))
+        self.size.append(info.size)
+        self.modified_ns.append(info.modified_ns)
+        self.inode.append(info.inode)
+        self.links.append(info.links)
+        return len(self.size) - 1
+
+    def extend(self, items: Iterable[FileInfo]) -> None:
+        for info in items:
+            self.append(info)
+
+    def __len__(self) -> int:
+        return len(self.size)
+
+    def name(self, index: int) -> str:
+        start = self.name_end[index - 1] if index else 0
+        return self.names[start:self.name_end[index]].decode("utf-8", "surrogatepass")
+
+    def path(self, index: int) -> str:
+        return os.path.join(self.dirs[self.dir[index]], self.name(index))
+
+    def paths(self) -> Iterator[str]:
+        return (self.path(index) for index in range(len(self)))
+
+    def path_hashes(self) -> array:
+        # آرایه مرتب hash مسیرها (۸ بایت برای هر فایل) برای پرسش عضویت با bisect بدون ساختن مجموعه رشته‌ها؛
+        # برخورد hash فقط یعنی مسیری دیده‌شده فرض شود. hash رشته در هر پردازه تصادفی است و نباید ذخیره شود.
+        return array("q", sorted(hash(path) for path in self.paths()))
+
+    def __getitem__(self, index: int) -> FileInfo:
+        if index < 0:
+            index += len(self)
+        folder = self.dir[index]
+        priority, device = self._exceptions.get(index) or (self.dir_priority[folder], self.dir_device[folder])
+        return FileInfo(self.path(index), self.size[index], self.modified_ns[index], priority,
+                        device=device, inode=self.inode[index], links=self.links[index])
+
+    def __iter__(self) -> Iterator[FileInfo]:
+        return (self[index] for index in range(len(self)))
+
+    def reprioritize(self, value: Callable[[str], int]) -> None:
+        # اولویت‌ها از روی پوشه دوباره حساب می‌شوند (مثلاً جدول بازیابی‌شده با پوشه‌های اولویت تازه).
+        for folder_id, folder in enumerate(self.dirs):
+            self.dir_priority[folder_id] = value(folder)
+        for index, (_priority, device) in list(self._exceptions.items()):
+            self._exceptions[index] = (value(self.dirs[self.dir[index]]), device)
+
+    def dump(self) -> dict[str, bytes]:
+        # ستون‌ها همان‌طور که در حافظه هستند به بایت تبدیل می‌شوند؛ ذخیره و بارگذاری میلیون‌ها فایل چند ثانیه است.
+        columns = {name: getattr(self, name).tobytes() for name in _COLUMNS}
+        columns["names"] = bytes(self.names)
+        columns["dirs"] = "\0".join(self.dirs).encode("utf-8", "surrogatepass")
+        columns["exceptions"] = json.dumps(list(self._exceptions.items())).encode("ascii")
+        return columns
+
+    @classmethod
+    def load(cls, columns: dict[str, bytes]) -> FileTable:
+        table = cls()
+        for name in _COLUMNS:
+            getattr(table, name).frombytes(columns[name])
+        table.names = bytearray(columns["names"])
+        table.dirs = columns["dirs"].decode("utf-8", "surrogatepass").split("\0") if columns["dirs"] else []
+        table._dir_ids = {folder: index for index, folder in enumerate(table.dirs)}
+        table._exceptions = {index: tuple(value) for index, value in json.loads(columns["exceptions"])}
+        return table
+
+    @property
+    def nbytes(self) -> int:
+        columns = (self.dir, self.name_end, self.size, self.modified_ns, self.inode, self.links, self.dir_priority, self.dir_device)
+        return len(self.names) + sum(x.itemsize * len(x) for x in columns) + sum(len(x) + 49 for x in self.dirs)
+
+_COLUMNS = ("dir_priority", "dir_device", "dir", "name_end", "size", "modified_ns", "inode", "links")
@@ -1,4 +1,8 @@
 from .config import AppConfig
 from .cache import HashCache
+from .cache_maintenance import CacheMaintenance, CacheStats
+from .checkpoint import CheckpointError, ScanCheckpoint
+from .file_index import FileIndex
+from .move_journal import MoveJournal
 from .logging_service import get_logger
-__all__ = ["AppConfig", "HashCache", "get_logger"]
+__all__ = ["AppConfig", "HashCache", "CacheMaintenance", "CacheStats", "CheckpointError", "ScanCheckpoint", "FileIndex", "MoveJournal", "get_logger"]
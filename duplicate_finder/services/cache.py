@@ -1,18 +1,68 @@
 from __future__ import annotations
-import sqlite3, threading
+import atexit, os, queue, sqlite3, threading, time, weakref
 from pathlib import Path
+from typing import Iterable
 from .config import CACHE_PATH
+from .logging_service import get_logger
+
+# (دستگاه، inode). در ویندوز DirEntry.stat این دو را صفر می‌دهد و اسکنر فقط برای فایل‌های هم‌اندازه آن‌ها را
+# با os.stat می‌خواند؛ پس پیدا کردن فایل جابه‌جاشده با شناسه هم فقط برای همین فایل‌ها، که هششان لازم است، کار می‌کند.
+Identity = tuple[int, int]
+
+# هر ردیف چند لایه اثر انگشت دارد؛ همه با اندازه و mtime یکسان اعتبارسنجی می‌شوند.
+TIERS = {"full": "digest", "quick": "quick", "partial": "partial", "head": "head"}
+# اثر انگشت تکه‌ها برای هر فایل تا چند مگابایت است و فقط برای نامزدهای هم‌پوشانی لازم می‌شود؛ پیش‌خوانی آن را
+# در حافظه بار نمی‌کند و get هنگام نیاز با کلید مسیر از SQLite می‌خواند.
+LAZY = ("partial",)
+NOW = "CAST(strftime('%s','now') AS INTEGER)"
+# ردیفی که از کش خوانده شد حداکثر روزی یک بار last_seen تازه می‌گیرد تا هر اسکن گرم پر از نوشتن نشود.
+TOUCH = f"UPDATE hashes SET last_seen={NOW} WHERE path=? AND algorithm=? AND last_seen<{NOW}-86400"
+# کش‌هایی که نویسنده پس‌زمینه دارند؛ ارجاع ضعیف تا ثبت در atexit کش بسته‌شده را زنده نگه ندارد.
+_OPEN: weakref.WeakSet = weakref.WeakSet()
+
+@atexit.register
+def _close_open() -> None:
+    for cache in list(_OPEN):
+        cache.close()
 
 class HashCache:
-    def __init__(self, path: Path = CACHE_PATH):
+    def __init__(self, path: Path = CACHE_PATH, *, batched: bool = False, batch_size: int = 500):
         path.parent.mkdir(parents=True, exist_ok=True)
         self.path = path
+        self.batched = batched
+        self.batch_size = max(1, batch_size)
         self._local = threading.local()
+        self._memory: dict[tuple[str, str], tuple[int, int, dict[str, str]]] = {}
+        self._identities: dict[tuple[int, int, str], str] = {}
+        self._prefetched: list[tuple[str, str]] = []
+        self._queue: queue.Queue = queue.Queue()
+        self._writer: threading.Thread | None = None
+        self._writer_lock = threading.Lock()
+        self._hits: list[tuple[str, str]] = []
+        self._hits_lock = threading.Lock()
+        # زمان صرف‌شده در SQLite (از همه رشته‌ها و نویسنده پس‌زمینه) برای گزارش معیارهای اسکن.
+        self.sql_seconds = 0.0
+        self._timing_lock = threading.Lock()
         with sqlite3.connect(path) as db:
             db.execute("""CREATE TABLE IF NOT EXISTS hashes(
                 path TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
                 algorithm TEXT NOT NULL, digest TEXT NOT NULL,
                 PRIMARY KEY(path, algorithm))""")
+            columns = {row[1] for row in db.execute("PRAGMA table_info(hashes)")}
+            for column in TIERS.values():
+                if column not in columns:
+                    db.execute(f"ALTER TABLE hashes ADD COLUMN {column} TEXT NOT NULL DEFAULT ''")
+            # last_seen (ثانیه یونیکس) مبنای بیرون‌راندن قدیمی‌ترین ردیف‌ها در نگه‌داری کش است.
+            if "last_seen" not in columns:
+                db.execute("ALTER TABLE hashes ADD COLUMN last_seen INTEGER NOT NULL DEFAULT 0")
+            db.execute("CREATE INDEX IF NOT EXISTS hashes_last_seen ON hashes(last_seen)")
+            # کلید دوم (دستگاه، inode): فایلی که فقط جابه‌جا یا تغییر نام داده شده دوباره هش نمی‌شود.
+            for column in ("device", "inode"):
+                if column not in columns:
+                    db.execute(f"ALTER TABLE hashes ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+            db.execute("CREATE INDEX IF NOT EXISTS hashes_identity ON hashes(inode, device) WHERE inode<>0")
+            if batched:
+                db.execute("PRAGMA journal_mode=WAL")
             db.commit()
 
     def _db(self) -> sqlite3.Connection:
@@ -22,15 +72,212 @@ class HashCache:
             self._local.db = db
         return db
 
-    def get(self, path: str, size: int, mtime_ns: int, algorithm: str) -> str | None:
-        row = self._db().execute(
-            "SELECT digest FROM hashes WHERE path=? AND size=? AND mtime_ns=? AND algorithm=?",
-            (path, size, mtime_ns, algorithm),
-        ).fetchone()
-        return row[0] if row else None
+    def _spent(self, started: float) -> None:
+        with self._timing_lock:
+            self.sql_seconds += time.perf_counter() - started
 
-    def put(self, path: str, size: int, mtime_ns: int, algorithm: str, digest: str) -> None:
+    def prefetch(self, roots: Iterable[str], algorithm: str) -> int:
+        # در حالت دسته‌ای، ردیف‌های زیر ریشه‌های اسکن یک‌جا در حافظه بارگذاری می‌شوند
+        # و get برای مسیرهای داخل این ریشه‌ها دیگر به SQLite نمی‌رود.
+        if not self.batched:
+            return 0
         db = self._db()
-        db.execute("INSERT OR REPLACE INTO hashes(path,size,mtime_ns,algorithm,digest) VALUES(?,?,?,?,?)",
-                   (path, size, mtime_ns, algorithm, digest))
-        db.commit()
+        started = time.perf_counter()
+        eager = [t for t in TIERS if t not in LAZY]
+        for root in roots:
+            prefix = root.rstrip(os.sep) + os.sep
+            rows = db.execute(f"SELECT path,size,mtime_ns,device,inode,{','.join(TIERS[t] for t in eager)} FROM hashes "
+                              "WHERE algorithm=? AND path>=? AND path<?",
+                              (algorithm, prefix, prefix[:-1] + chr(ord(os.sep) + 1)))
+            for path, size, mtime_ns, device, inode, *values in rows:
+                self._memory[(path, algorithm)] = (size, mtime_ns, {t: v for t, v in zip(eager, values) if v})
+                if inode:
+                    self._identities[(device, inode, algorithm)] = path
+            self._prefetched.append((prefix, algorithm))
+        self._spent(started)
+        return len(self._memory)
+
+    def _covered(self, path: str, algorithm: str) -> bool:
+        return any(algorithm == algo and path.startswith(prefix) for prefix, algo in self._prefetched)
+
+    def get(self, path: str, size: int, mtime_ns: int, algorithm: str, tier: str = "full",
+            identity: Identity | None = None) -> str | None:
+        row = self._memory.get((path, algorithm))
+        if row is not None and row[:2] == (size, mtime_ns) and tier in row[2]:
+            self._hit(path, algorithm)
+            return row[2][tier]
+        # زیر ریشه پیش‌خوانده نبودن ردیف یعنی نبودنش در پایگاه داده؛ لایه‌های LAZY اما پیش‌خوانده نشده‌اند.
+        if (row is None and not (self._prefetched and self._covered(path, algorithm))
+                or row is not None and row[:2] == (size, mtime_ns) and tier in LAZY):
+            # fetchall دستور را تا انتها اجرا می‌کند تا قفل خواندن برای نوشتن رشته‌های دیگر باز بماند.
+            started = time.perf_counter()
+            rows = self._db().execute(
+                f"SELECT {TIERS[tier]} FROM hashes WHERE path=? AND size=? AND mtime_ns=? AND algorithm=?",
+                (path, size, mtime_ns, algorithm),
+            ).fetchall()
+            self._spent(started)
+            if rows and rows[0][0]:
+                self._hit(path, algorithm)
+                return rows[0][0]
+        return self._by_identity(path, size, mtime_ns, algorithm, tier, identity) if identity else None
+
+    def _hit(self, path: str, algorithm: str) -> None:
+        if self.batched:
+            self._start_writer()
+            self._queue.put(("touch", (path, algorithm)))
+            return
+        with self._hits_lock:
+            self._hits.append((path, algorithm))
+            if len(self._hits) < self.batch_size:
+                return
+            hits, self._hits = self._hits, []
+        self._touch(hits)
+
+    def _touch(self, hits: list[tuple[str, str]]) -> None:
+        db = self._db()
+        started = time.perf_counter()
+        try:
+            db.executemany(TOUCH, hits)
+            db.commit()
+        except sqlite3.Error as exc:
+            db.rollback()
+            get_logger().warning("cache touch failed rows=%s error=%s", len(hits), exc)
+        finally:
+            self._spent(started)
+
+    def _by_identity(self, path: str, size: int, mtime_ns: int, algorithm: str, tier: str, identity: Identity) -> str | None:
+        # ردیف مسیر قبلی همان inode با همان اندازه و mtime معتبر است؛ لایه‌هایش برای مسیر تازه هم ثبت می‌شوند
+        # تا دفعه بعد با کلید مسیر پیدا شود. پیوندهای سخت هم به همین راه هش یکدیگر را به کار می‌برند.
+        tiers: dict[str, str] = {}
+        source = self._identities.get((*identity, algorithm))
+        row = self._memory.get((source, algorithm)) if source is not None else None
+        if row is not None and row[:2] == (size, mtime_ns):
+            tiers = row[2]
+        # زیر ریشه پیش‌خوانده پاسخ فقط از نقشه شناسه‌ها می‌آید و هر خطای مسیر پرس‌وجوی SQL نمی‌شود؛
+        # فایلی که از بیرون ریشه‌های اسکن به درون آن جابه‌جا شده یک بار دوباره هش می‌شود.
+        if tier not in tiers and (tier in LAZY or not self._covered(path, algorithm)):
+            started = time.perf_counter()
+            rows = self._db().execute(
+                f"SELECT {','.join(TIERS.values())} FROM hashes WHERE inode=? AND device=? AND size=? AND mtime_ns=? "
+                f"AND algorithm=? AND {TIERS[tier]}<>'' LIMIT 1",
+                (identity[1], identity[0], size, mtime_ns, algorithm),
+            ).fetchall()
+            self._spent(started)
+            tiers = {t: v for t, v in zip(TIERS, rows[0]) if v} if rows else {}
+        if tier not in tiers:
+            return None
+        for name, value in list(tiers.items()):
+            self.put(path, size, mtime_ns, algorithm, value, name, identity)
+        return tiers[tier]
+
+    @staticmethod
+    def _upsert(tier: str) -> str:
+        # اگر اندازه یا mtime عوض شده باشد لایه‌های دیگر ردیف دیگر معتبر نیستند و پاک می‌شوند.
+        column = TIERS[tier]
+        keep = ",".join(f"{c}=CASE WHEN size=excluded.size AND mtime_ns=excluded.mtime_ns THEN {c} ELSE '' END"
+                        for c in TIERS.values() if c != column)
+        values = ",".join("?" if c == column else "''" for c in TIERS.values())
+        return (f"INSERT INTO hashes(path,size,mtime_ns,algorithm,{','.join(TIERS.values())},device,inode,last_seen) "
+                f"VALUES(?,?,?,?,{values},?,?,{NOW}) "
+                f"ON CONFLICT(path,algorithm) DO UPDATE SET {keep},{column}=excluded.{column},"
+                "size=excluded.size,mtime_ns=excluded.mtime_ns,device=excluded.device,inode=excluded.inode,"
+                "last_seen=excluded.last_seen")
+
+    def put(self, path: str, size: int, mtime_ns: int, algorithm: str, digest: str, tier: str = "full",
+            identity: Identity | None = None) -> None:
+        device, inode = identity or (0, 0)
+        if self.batched:
+            row = self._memory.get((path, algorithm))
+            tiers = dict(row[2]) if row is not None and row[:2] == (size, mtime_ns) else {}
+            tiers[tier] = digest
+            self._memory[(path, algorithm)] = (size, mtime_ns, tiers)
+            if inode:
+                self._identities[(device, inode, algorithm)] = path
+            self._start_writer()
+            self._queue.put((tier, (path, size, mtime_ns, algorithm, digest, device, inode)))
+            return
+        db = self._db()
+        started = time.perf_counter()
+        try:
+            db.execute(self._upsert(tier), (path, size, mtime_ns, algorithm, digest, device, inode))
+            db.commit()
+        except sqlite3.Error:
+            db.rollback()
+            raise
+        finally:
+            self._spent(started)
+
+    def _start_writer(self) -> None:
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="duplicate-cache-writer", daemon=True)
+                    self._writer.start()
+                    _OPEN.add(self)
+
+    def _write_loop(self) -> None:
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [row for row in batch if row is not None]
+            stop = len(rows) != len(batch)
+            started = time.perf_counter()
+            try:
+                for tier in (*TIERS, "touch"):
+                    values = [row for name, row in rows if name == tier]
+                    if values:
+                        db.executemany(TOUCH if tier == "touch" else self._upsert(tier), values)
+                if rows:
+                    db.commit()
+            except sqlite3.Error as exc:
+                db.rollback()
+                get_logger().warning("cache write failed rows=%s error=%s", len(rows), exc)
+            finally:
+                self._spent(started)
+                for _ in batch:
+                    self._queue.task_done()
+        db.close()
+
+    def flush(self) -> None:
+        if self._writer is not None:
+            self._queue.join()
+        with self._hits_lock:
+            hits, self._hits = self._hits, []
+        if hits:
+            self._touch(hits)
+
+    def moved(self, moves: Iterable[tuple[str, str]]) -> None:
+        # جابه‌جایی‌های خود برنامه ردیف کش را با خودشان می‌برند؛ پس از کپی بین دستگاه‌ها inode تازه هم ثبت می‌شود.
+        self.flush()
+        updates = []
+        for src, dst in moves:
+            try:
+                stat = os.stat(dst, follow_symlinks=False)
+            except OSError:
+                continue
+            updates.append((dst, stat.st_dev, stat.st_ino, src))
+        if not updates:
+            return
+        db = self._db()
+        try:
+            db.executemany("UPDATE OR REPLACE hashes SET path=?,device=?,inode=? WHERE path=?", updates)
+            db.commit()
+        except sqlite3.Error:
+            db.rollback()
+            raise
+
+    def close(self) -> None:
+        self.flush()
+        _OPEN.discard(self)
+        writer, self._writer = self._writer, None
+        if writer is not None and writer.is_alive():
+            self._queue.put(None)
+            writer.join()
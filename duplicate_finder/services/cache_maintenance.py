@@ -0,0 +1,152 @@
+from __future__ import annotations
+import os, sqlite3, threading, time
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Callable, Container, Iterable, NamedTuple
+from duplicate_finder.models import FileTable
+from .cache import TIERS, HashCache
+from .config import CACHE_PATH
+from .logging_service import get_logger
+
+class CacheStats(NamedTuple):
+    rows: int
+    file_bytes: int
+    free_bytes: int
+    tiers: dict[str, int]
+    oldest_seen: int
+    newest_seen: int
+
+class MaintenanceReport(NamedTuple):
+    pruned: int
+    missing: int
+    evicted: int
+    freed_bytes: int
+    seconds: float
+    stats: CacheStats
+
+class CacheMaintenance:
+    # نگه‌داری کش روی اتصال جداگانه و در تکه‌های کوچک انجام می‌شود تا قفل نوشتن کوتاه بماند و اسکن
+    # بعدی یا نویسنده پس‌زمینه منتظر نماند. صفر برای سقف‌ها یعنی بدون محدودیت.
+    def __init__(self, path: Path = CACHE_PATH, *, max_rows: int = 0, max_bytes: int = 0, chunk: int = 2000,
+                 vacuum_pages: int = 4096, missing_checks: int = 20000):
+        HashCache(path)  # ساختار جدول و ستون last_seen را در صورت نیاز می‌سازد.
+        self.path = path
+        self.max_rows, self.max_bytes = max(0, max_rows), max(0, max_bytes)
+        self.chunk = max(1, chunk)
+        self.vacuum_pages = max(0, vacuum_pages)
+        self.missing_checks = max(0, missing_checks)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _delete(self, db: sqlite3.Connection, rowids: list[int]) -> int:
+        for start in range(0, len(rowids), self.chunk):
+            part = rowids[start:start + self.chunk]
+            db.execute(f"DELETE FROM hashes WHERE rowid IN ({','.join('?' * len(part))})", part)
+            db.commit()
+        return len(rowids)
+
+    def stats(self) -> CacheStats:
+        with self._connect() as db:
+            rows, oldest, newest = db.execute("SELECT COUNT(*),COALESCE(MIN(last_seen),0),COALESCE(MAX(last_seen),0) FROM hashes").fetchone()
+            tiers = dict(zip(TIERS, db.execute("SELECT " + ",".join(f"SUM({c}<>'')" for c in TIERS.values()) + " FROM hashes").fetchone()))
+            page = db.execute("PRAGMA page_size").fetchone()[0]
+            pages = db.execute("PRAGMA page_count").fetchone()[0]
+            free = db.execute("PRAGMA freelist_count").fetchone()[0]
+        return CacheStats(rows, pages * page, free * page, {k: v or 0 for k, v in tiers.items()}, oldest, newest)
+
+    def prune(self, roots: Iterable[str], files: FileTable | None, listed: Container[str]) -> int:
+        # فقط ردیف‌های پوشه‌هایی که پیمایش کامل فهرستشان کرد و فایلشان در جدول اسکن نیست حذف می‌شوند؛ زیردرخت‌هایی
+        # که عمداً رد شدند (پوشه پشتیبان، قاعده‌ها) یا خطا داشتند دست نمی‌خورند. last_seen را خود کش هنگام استفاده تازه می‌کند.
+        seen = files.path_hashes() if files is not None else array("q")
+        stale = []
+        with self._connect() as db:
+            for root in roots:
+                prefix = root.rstrip(os.sep) + os.sep
+                for rowid, path in db.execute("SELECT rowid,path FROM hashes WHERE path>=? AND path<?",
+                                              (prefix, prefix[:-1] + chr(ord(os.sep) + 1))).fetchall():
+                    if os.path.dirname(path) not in listed:
+                        continue
+                    key = hash(path)
+                    at = bisect_left(seen, key)
+                    if at == len(seen) or seen[at] != key:
+                        stale.append(rowid)
+            return self._delete(db, stale)
+
+    def drop_missing(self, exists: Callable[[str], bool] = os.path.lexists) -> int:
+        # هر اجرا حداکثر missing_checks ردیف را از جایی که اجرای قبل رسیده بود stat می‌کند (نشانگر rowid در
+        # cache_meta) و به انتها که رسید از اول می‌گیرد؛ کش بزرگ در چند اجرا و بی‌آنکه یکی طولانی شود پاک می‌شود.
+        if not self.missing_checks:
+            return 0
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS cache_meta(key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            cursor = (db.execute("SELECT value FROM cache_meta WHERE key='missing_cursor'").fetchone() or (0,))[0]
+            rows = db.execute("SELECT rowid,path FROM hashes WHERE rowid>? ORDER BY rowid LIMIT ?",
+                              (cursor, self.missing_checks)).fetchall()
+            cursor = rows[-1][0] if len(rows) == self.missing_checks else 0
+            db.execute("INSERT OR REPLACE INTO cache_meta(key,value) VALUES('missing_cursor',?)", (cursor,))
+            db.commit()
+            return self._delete(db, [rowid for rowid, path in rows if not exists(path)])
+
+    def evict(self) -> int:
+        # بیرون‌راندن به ترتیب last_seen (LRU). برای سقف حجمی تعداد ردیف از میانگین حجم هر ردیف تخمین زده می‌شود.
+        with self._connect() as db:
+            rows = db.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+            limit = self.max_rows or rows
+            if self.max_bytes and rows:
+                page = db.execute("PRAGMA page_size").fetchone()[0]
+                used = (db.execute("PRAGMA page_count").fetchone()[0] - db.execute("PRAGMA freelist_count").fetchone()[0]) * page
+                if used > self.max_bytes:
+                    limit = min(limit, int(rows * self.max_bytes / used * .9))
+            excess = rows - limit
+            if excess <= 0:
+                return 0
+            oldest = [x for x, in db.execute("SELECT rowid FROM hashes ORDER BY last_seen LIMIT ?", (excess,)).fetchall()]
+            return self._delete(db, oldest)
+
+    def compact(self) -> int:
+        # اولین بار پایگاه یک‌جا به حالت auto_vacuum=INCREMENTAL برده می‌شود؛ پس از آن هر اجرا فقط تا
+        # vacuum_pages صفحه آزاد را به سیستم‌عامل پس می‌دهد. PRAGMA optimize آمار برنامه‌ریز را تازه می‌کند.
+        before = self.path.stat().st_size
+        db = self._connect()
+        try:
+            if db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                db.execute("VACUUM")
+            elif self.vacuum_pages:
+                db.execute(f"PRAGMA incremental_vacuum({self.vacuum_pages})").fetchall()
+            if db.execute("SELECT 1 FROM sqlite_master WHERE name='sqlite_stat1'").fetchone() is None:
+                db.execute("ANALYZE")
+            else:
+                db.execute("PRAGMA optimize")
+            db.commit()
+            if db.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+                db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            db.close()
+        return max(0, before - self.path.stat().st_size)
+
+    def run(self, roots: Iterable[str] = (), files: FileTable | None = None,
+            listed: Container[str] = frozenset()) -> MaintenanceReport:
+        started = time.perf_counter()
+        pruned = self.prune(roots, files, listed) if roots else 0
+        missing = self.drop_missing()
+        evicted = self.evict()
+        freed = self.compact()
+        report = MaintenanceReport(pruned, missing, evicted, freed, time.perf_counter() - started, self.stats())
+        get_logger().info("cache maintenance pruned=%s missing=%s evicted=%s freed=%s rows=%s elapsed=%.2f",
+                          pruned, missing, evicted, freed, report.stats.rows, report.seconds)
+        return report
+
+    def start(self, roots: Iterable[str] = (), files: FileTable | None = None, listed: Container[str] = frozenset(),
+              done: Callable[[MaintenanceReport], None] = lambda _report: None) -> threading.Thread:
+        roots = list(roots)
+        def work():
+            try:
+                done(self.run(roots, files, listed))
+            except (OSError, sqlite3.Error) as exc:
+                get_logger().warning("cache maintenance failed error=%s", exc)
+        thread = threading.Thread(target=work, name="duplicate-cache-maintenance", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,132 @@
+from __future__ import annotations
+import json, sqlite3, time
+from pathlib import Path
+from typing import Iterable, NamedTuple
+from duplicate_finder.models import FileTable
+from .config import CHECKPOINT_PATH
+from .logging_service import get_logger
+
+class CheckpointError(ValueError):
+    pass
+
+class CheckpointState(NamedTuple):
+    roots: list[str]
+    stage: str
+    created: float
+    updated: float
+    files: FileTable
+    quick: dict[str, str]
+    full: dict[str, str]
+
+class ScanCheckpoint:
+    # وضعیت اسکن مرحله‌ای هر interval ثانیه و هنگام توقف یا خطا در پایگاه جداگانه‌ای نوشته می‌شود: ستون‌های
+    # جدول فایل‌ها یک‌جا، و هش سریع و کامل هر فایل افزایشی. full خالی یعنی فایل در تأیید هم‌گام کنار رفت.
+    # اسکنی که زودتر از interval تمام شود چیزی نمی‌نویسد. فقط رشته اصلی اسکن آن را صدا می‌زند.
+    def __init__(self, path: Path = CHECKPOINT_PATH, *, interval: float = 60.0):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.interval = max(0.0, interval)
+        self._signature: dict = {}
+        self._files: FileTable | None = None
+        self._written = False
+        self._stage = ""
+        self._created = 0.0
+        self._pending: dict[str, list[tuple[str, str]]] = {"quick": [], "full": []}
+        self._stale: list[str] = []
+        self._saved = time.monotonic()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute("CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        db.execute("CREATE TABLE IF NOT EXISTS columns(name TEXT PRIMARY KEY, data BLOB NOT NULL)")
+        db.execute("CREATE TABLE IF NOT EXISTS hashes(path TEXT PRIMARY KEY, quick TEXT NOT NULL DEFAULT '', full TEXT)")
+        return db
+
+    def _meta(self) -> dict[str, str]:
+        if not self.path.exists():
+            return {}
+        db = self._connect()
+        try:
+            return dict(db.execute("SELECT key,value FROM meta").fetchall())
+        finally:
+            db.close()
+
+    def info(self) -> dict | None:
+        meta = self._meta()
+        if "signature" not in meta:
+            return None
+        return {"roots": json.loads(meta["signature"])["roots"], "stage": meta["stage"], "files": int(meta["files"]),
+                "created": float(meta["created"]), "updated": float(meta["updated"])}
+
+    def begin(self, signature: dict, files: FileTable, *, resumed: bool = False, stale: Iterable[str] = ()) -> None:
+        # stale: فایل‌هایی که پس از توقف تغییر کردند یا حذف شدند. هش‌های قبلی‌شان همراه جدول تازه فایل‌ها پاک
+        # می‌شود؛ وگرنه اگر این ادامه هم پیش از هش دوباره قطع شود، ادامه بعدی هش کهنه را با stat تازه می‌پذیرد.
+        if not resumed:
+            self.clear()
+        self._signature, self._files, self._written = signature, files, False
+        self._stale = list(stale)
+        self._created = float(self._meta().get("created", time.time())) if resumed else time.time()
+        self._stage = "walk"
+        self._pending = {"quick": [], "full": []}
+        self._saved = time.monotonic()
+
+    def stage(self, name: str) -> None:
+        self._stage = name
+
+    def record(self, kind: str, path: str, digest: str) -> None:
+        if self._files is None:
+            return
+        self._pending[kind].append((path, digest))
+        self.save()
+
+    def save(self, force: bool = False) -> bool:
+        if self._files is None or (not force and time.monotonic() - self._saved < self.interval):
+            return False
+        started = time.perf_counter()
+        quick, full = self._pending["quick"], self._pending["full"]
+        db = self._connect()
+        try:
+            if not self._written:
+                # جدول فایل‌ها فقط در اولین ذخیره (و پس از ادامه، که ممکن است عوض شده باشد) نوشته می‌شود.
+                db.execute("DELETE FROM columns")
+                db.executemany("INSERT INTO columns(name,data) VALUES(?,?)", self._files.dump().items())
+                db.executemany("DELETE FROM hashes WHERE path=?", ((path,) for path in self._stale))
+            db.executemany("INSERT INTO hashes(path,quick) VALUES(?,?) ON CONFLICT(path) DO UPDATE SET quick=excluded.quick", quick)
+            db.executemany("INSERT INTO hashes(path,full) VALUES(?,?) ON CONFLICT(path) DO UPDATE SET full=excluded.full", full)
+            meta = {"signature": json.dumps(self._signature), "stage": self._stage, "files": str(len(self._files)),
+                    "created": str(self._created), "updated": str(time.time())}
+            db.executemany("INSERT OR REPLACE INTO meta(key,value) VALUES(?,?)", meta.items())
+            db.commit()
+        except sqlite3.Error as exc:
+            db.rollback()
+            get_logger().warning("scan checkpoint failed error=%s", exc)
+            return False
+        finally:
+            db.close()
+        self._written = True
+        self._stale = []
+        self._pending = {"quick": [], "full": []}
+        self._saved = time.monotonic()
+        get_logger().info("scan checkpoint stage=%s files=%s quick=%s full=%s elapsed=%.2f", self._stage, len(self._files),
+                          len(quick), len(full), time.perf_counter() - started)
+        return True
+
+    def load(self, signature: dict) -> CheckpointState:
+        meta = self._meta()
+        if "signature" not in meta:
+            raise CheckpointError("there is no interrupted scan to resume")
+        if json.loads(meta["signature"]) != json.loads(json.dumps(signature)):
+            raise CheckpointError("the interrupted scan used different folders or scan settings")
+        db = self._connect()
+        try:
+            files = FileTable.load(dict(db.execute("SELECT name,data FROM columns").fetchall()))
+            quick = dict(db.execute("SELECT path,quick FROM hashes WHERE quick<>''").fetchall())
+            full = dict(db.execute("SELECT path,full FROM hashes WHERE full IS NOT NULL").fetchall())
+        finally:
+            db.close()
+        return CheckpointState(signature["roots"], meta["stage"], float(meta["created"]), float(meta["updated"]),
+                               files, quick, full)
+
+    def clear(self) -> None:
+        self._files = None
+        self.path.unlink(missing_ok=True)
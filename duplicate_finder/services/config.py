@@ -7,21 +7,43 @@ APP_DIR = Path(os.getenv("APPDATA") or (Path.home() / ".config")) / "DuplicateFi
 CONFIG_PATH = APP_DIR / "config.json"
 CACHE_PATH = APP_DIR / "hash_cache.sqlite3"
 LOG_PATH = APP_DIR / "duplicate_finder.log"
+INDEX_PATH = APP_DIR / "file_index.sqlite3"
+JOURNAL_PATH = APP_DIR / "moves.jsonl"
+CHECKPOINT_PATH = APP_DIR / "scan_checkpoint.sqlite3"
 
 @dataclass(slots=True)
 class AppConfig:
     scan_folders: list[str] = field(default_factory=list)
     keep_folder: str = ""
-    priority_folders: list[str] = field(default_factory=lambda: [""])
+    priority_folders: list[str] = field(default_factory=list)
     excluded_folders: list[str] = field(default_factory=list)
     excluded_extensions: list[str] = field(default_factory=list)
+    scan_rules: list[str] = field(default_factory=list)
+    root_rules: dict[str, list[str]] = field(default_factory=dict)
     min_size_bytes: int = 1
     workers: int = max(2, min(8, os.cpu_count() or 4))
     hash_algorithm: str = "sha256"
     detect_similar_names: bool = True
     similar_name_threshold: float = 0.86
+    similar_time_budget: float = 60.0
+    overlap_percent: int = 0
     include_hidden: bool = False
+    pipeline_scan: bool = False
+    batched_cache: bool = True
+    cache_maintenance: bool = True
+    cache_max_rows: int = 0
+    cache_max_mb: int = 0
+    incremental_scan: bool = False
+    trust_directory_mtime: bool = False
+    verify_mode: str = "hash"
+    hash_backend: str = "thread"
+    mmap_threshold_mb: int = 0
+    device_workers: dict[str, int] = field(default_factory=dict)
+    auto_tune_io: bool = True
+    scan_checkpoint: bool = False
+    checkpoint_interval: float = 60.0
     backup_folder_name: str = "backup_deleted"
+    link_mode: str = "auto"
     window_geometry: str = "1180x760"
 
     @classmethod
@@ -32,7 +54,7 @@ class AppConfig:
             for key, value in raw.items():
                 if hasattr(obj, key):
                     setattr(obj, key, value)
-            obj.priority_folders = (list(obj.priority_folders) + ["", "", ""])[:3]
+            obj.priority_folders = [str(x) for x in obj.priority_folders if x]
             return obj
         except Exception:
             return cls()
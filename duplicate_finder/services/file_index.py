@@ -0,0 +1,93 @@
+from __future__ import annotations
+import os, sqlite3, threading
+from pathlib import Path
+from typing import Iterable, NamedTuple
+from .config import INDEX_PATH
+
+class IndexEntry(NamedTuple):
+    name: str
+    size: int
+    mtime_ns: int
+    dev: int
+    ino: int
+    links: int = 1
+
+class IndexedDir(NamedTuple):
+    mtime_ns: int
+    subdirs: list[str]
+    files: list[IndexEntry]
+
+class FileIndex:
+    def __init__(self, path: Path = INDEX_PATH, *, trust_dir_mtime: bool = False):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        # با trust_dir_mtime فایل‌های پوشه‌های بدون تغییر دوباره stat نمی‌شوند؛ ویرایش درجا
+        # (که mtime پوشه را عوض نمی‌کند) در این حالت تا تغییر بعدی پوشه دیده نمی‌شود.
+        self.trust_dir_mtime = trust_dir_mtime
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._dirty: dict[str, tuple[int, list[str], list[IndexEntry]]] = {}
+        self._seen: set[str] = set()
+        with sqlite3.connect(path) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS dirs(path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, subdirs TEXT NOT NULL)")
+            db.execute("""CREATE TABLE IF NOT EXISTS files(
+                dir TEXT NOT NULL, name TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
+                dev INTEGER NOT NULL, ino INTEGER NOT NULL, links INTEGER NOT NULL DEFAULT 1, PRIMARY KEY(dir, name))""")
+            if "links" not in {row[1] for row in db.execute("PRAGMA table_info(files)")}:
+                db.execute("ALTER TABLE files ADD COLUMN links INTEGER NOT NULL DEFAULT 1")
+            db.commit()
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            self._local.db = db
+        return db
+
+    def directory(self, path: str) -> IndexedDir | None:
+        db = self._db()
+        row = db.execute("SELECT mtime_ns, subdirs FROM dirs WHERE path=?", (path,)).fetchall()
+        if not row:
+            return None
+        files = [IndexEntry(*x) for x in db.execute("SELECT name,size,mtime_ns,dev,ino,links FROM files WHERE dir=?", (path,))]
+        return IndexedDir(row[0][0], row[0][1].split("\0") if row[0][1] else [], files)
+
+    def seen(self, path: str) -> None:
+        with self._lock:
+            self._seen.add(path)
+
+    def record(self, path: str, mtime_ns: int, subdirs: list[str], files: list[IndexEntry]) -> None:
+        with self._lock:
+            self._seen.add(path)
+            self._dirty[path] = (mtime_ns, subdirs, files)
+
+    def commit(self, roots: Iterable[str]) -> list[str]:
+        # پوشه‌های ثبت‌شده زیر ریشه‌ها که در این پیمایش دیده نشدند حذف می‌شوند و
+        # مسیر فایل‌هایشان به‌عنوان فایل حذف‌شده برگردانده می‌شود.
+        db = self._db()
+        removed: list[str] = []
+        with self._lock:
+            dirty, seen = self._dirty, self._seen
+            self._dirty, self._seen = {}, set()
+        try:
+            for root in roots:
+                prefix = root.rstrip(os.sep) + os.sep
+                rows = db.execute("SELECT path FROM dirs WHERE path=? OR (path>=? AND path<?)",
+                                  (root, prefix, prefix[:-1] + chr(ord(os.sep) + 1))).fetchall()
+                for (path,) in rows:
+                    if path in seen:
+                        continue
+                    removed += [os.path.join(path, name) for (name,) in db.execute("SELECT name FROM files WHERE dir=?", (path,))]
+                    db.execute("DELETE FROM files WHERE dir=?", (path,))
+                    db.execute("DELETE FROM dirs WHERE path=?", (path,))
+            for path, (mtime_ns, subdirs, files) in dirty.items():
+                db.execute("INSERT OR REPLACE INTO dirs(path,mtime_ns,subdirs) VALUES(?,?,?)", (path, mtime_ns, "\0".join(subdirs)))
+                db.execute("DELETE FROM files WHERE dir=?", (path,))
+                db.executemany("INSERT INTO files(dir,name,size,mtime_ns,dev,ino,links) VALUES(?,?,?,?,?,?,?)",
+                               [(path, *entry) for entry in files])
+            db.commit()
+        except sqlite3.Error:
+            db.rollback()
+            raise
+        return removed
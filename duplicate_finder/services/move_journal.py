@@ -0,0 +1,68 @@
+from __future__ import annotations
+import json, os, threading, time, uuid
+from pathlib import Path
+from typing import Iterable, NamedTuple
+from .config import JOURNAL_PATH
+
+class MoveBatch(NamedTuple):
+    id: str
+    created: float
+    moves: list[tuple[str, str]]
+    committed: bool
+
+class MoveJournal:
+    # دفترچه فقط افزودنی (JSON Lines). هر جابه‌جایی پیش از انجام ثبت و روی دیسک fsync می‌شود؛
+    # پس بعد از بسته شدن برنامه یا قطع شدن وسط دسته هم می‌توان آن را برگرداند. بازگردانی فقط
+    # جابه‌جایی‌هایی را برمی‌گرداند که مقصدشان واقعاً وجود دارد.
+    def __init__(self, path: Path = JOURNAL_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _append(self, records: Iterable[dict]) -> None:
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def begin(self, moves: list[tuple[str, str]]) -> str:
+        batch = uuid.uuid4().hex
+        self._append([{"op": "begin", "batch": batch, "time": time.time(), "count": len(moves)},
+                      *({"op": "move", "batch": batch, "src": src, "dst": dst} for src, dst in moves)])
+        return batch
+
+    def commit(self, batch: str, moved: int) -> None:
+        self._append([{"op": "commit", "batch": batch, "moved": moved}])
+
+    def undone(self, batch: str) -> None:
+        self._append([{"op": "undo", "batch": batch}])
+
+    def batches(self) -> list[MoveBatch]:
+        # دسته‌هایی که هنوز برگردانده نشده‌اند، قدیمی‌ترین اول. خط ناقص آخر (قطع هنگام نوشتن) نادیده گرفته می‌شود.
+        found: dict[str, dict] = {}
+        try:
+            lines = self.path.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            return []
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            op, batch = record.get("op"), record.get("batch")
+            if op == "begin":
+                found[batch] = {"created": record.get("time", 0.0), "moves": [], "committed": False}
+            elif batch not in found:
+                continue
+            elif op == "move":
+                found[batch]["moves"].append((record["src"], record["dst"]))
+            elif op == "commit":
+                found[batch]["committed"] = True
+            elif op == "undo":
+                del found[batch]
+        return [MoveBatch(key, x["created"], x["moves"], x["committed"]) for key, x in found.items()]
+
+    def last(self) -> MoveBatch | None:
+        batches = self.batches()
+        return batches[-1] if batches else None
@@ -3,9 +3,11 @@ import os, queue, subprocess, sys, threading, tkinter as tk
 from pathlib import Path
 from tkinter import filedialog, messagebox, ttk
 from duplicate_finder.core import (Cancelled, DuplicateScanner, PriorityResolver,
-                                   delete_empty_folders, move_to_backup, restore_moves)
-from duplicate_finder.models import DuplicateGroup, ScanResult
-from duplicate_finder.services import AppConfig
+                                   delete_empty_folders, link_duplicates, move_to_backup, undo_last)
+from duplicate_finder.core.metrics import format_metrics
+from duplicate_finder.models import ScanResult
+from duplicate_finder.services import AppConfig, CacheMaintenance, FileIndex, HashCache, MoveJournal, ScanCheckpoint
+from .result_view import ResultView
 from .settings_dialog import SettingsDialog
 
 class MainWindow(tk.Tk):
@@ -18,8 +20,7 @@ class MainWindow(tk.Tk):
         self.protocol("WM_DELETE_WINDOW", self.close)
         self.events: queue.Queue = queue.Queue()
         self.cancel_event = threading.Event()
-        self.row_paths: dict[str, str] = {}
-        self.last_moves: list[tuple[str, str]] = []
+        self.journal = MoveJournal()
         self.result: ScanResult | None = None
         self.last_scan_roots: list[str] = []
         self._build(); self.after(100, self._poll)
@@ -37,22 +38,27 @@ class MainWindow(tk.Tk):
 
         special = ttk.LabelFrame(outer, text="پوشه‌های ویژه", padding=8); special.pack(fill="x", pady=8)
         self.keep_var = tk.StringVar(value=self.cfg.keep_folder)
-        priority_value = (
-            self.cfg.priority_folders[0]
-            if self.cfg.priority_folders
-            else ""
-        )
-        self.priority_var = tk.StringVar(value=priority_value)
-
         self._folder_row(special, 0, "Keep (محافظت مطلق)", self.keep_var)
-        self._folder_row(special, 1, "PriorityFolder", self.priority_var)
+        # پوشه‌های اولویت به ترتیب رتبه؛ بالاترین ردیف مهم‌ترین است.
+        ttk.Label(special, text="PriorityFolders (به ترتیب)", width=22).grid(row=1, column=0, sticky="nw", pady=3)
+        self.priority_list = tk.Listbox(special, height=4, selectmode="extended")
+        self.priority_list.grid(row=1, column=1, sticky="ew", pady=3)
+        for p in self.cfg.priority_folders: self.priority_list.insert("end", p)
+        ranks = ttk.Frame(special); ranks.grid(row=1, column=2, columnspan=2, sticky="n", padx=4)
+        ttk.Button(ranks, text="افزودن", command=self.add_priority).pack(fill="x")
+        ttk.Button(ranks, text="حذف", command=lambda: [self.priority_list.delete(i) for i in reversed(self.priority_list.curselection())]).pack(fill="x")
+        ttk.Button(ranks, text="▲", command=lambda: self.move_priority(-1)).pack(fill="x")
+        ttk.Button(ranks, text="▼", command=lambda: self.move_priority(1)).pack(fill="x")
 
         commands = ttk.Frame(outer); commands.pack(fill="x", pady=(0, 8))
         self.scan_btn = ttk.Button(commands, text="شروع اسکن", command=self.start_scan); self.scan_btn.pack(side="left")
+        self.resume_btn = ttk.Button(commands, text="ادامه اسکن قبلی", command=lambda: self.start_scan(resume=True),
+                                     state="normal" if ScanCheckpoint().info() else "disabled"); self.resume_btn.pack(side="left", padx=5)
         self.cancel_btn = ttk.Button(commands, text="توقف", state="disabled", command=self.cancel_scan); self.cancel_btn.pack(side="left", padx=5)
         ttk.Button(commands, text="انتخاب پیشنهادی", command=self.select_suggested).pack(side="left", padx=5)
         ttk.Button(commands, text="انتقال به پشتیبان", command=self.remove_selected).pack(side="left", padx=5)
-        self.undo_btn = ttk.Button(commands, text="بازگردانی آخرین عملیات", command=self.undo, state="disabled"); self.undo_btn.pack(side="left", padx=5)
+        ttk.Button(commands, text="جایگزینی با پیوند", command=self.link_selected).pack(side="left", padx=5)
+        self.undo_btn = ttk.Button(commands, text="بازگردانی آخرین عملیات", command=self.undo, state="normal" if self.journal.last() else "disabled"); self.undo_btn.pack(side="left", padx=5)
         ttk.Button(commands, text="تنظیمات", command=lambda: SettingsDialog(self, self.cfg)).pack(side="right")
         self.similar_var = tk.BooleanVar(value=self.cfg.detect_similar_names)
         ttk.Checkbutton(commands, text="نام‌های مشابه", variable=self.similar_var).pack(side="right", padx=8)
@@ -61,9 +67,11 @@ class MainWindow(tk.Tk):
         self.status = tk.StringVar(value="آماده")
         ttk.Label(outer, textvariable=self.status).pack(anchor="w", pady=4)
         notebook = ttk.Notebook(outer); notebook.pack(fill="both", expand=True)
-        exact_tab = ttk.Frame(notebook); similar_tab = ttk.Frame(notebook); log_tab = ttk.Frame(notebook)
-        notebook.add(exact_tab, text="تکراری دقیق"); notebook.add(similar_tab, text="نام مشابه"); notebook.add(log_tab, text="گزارش")
-        self.exact_tree = self._tree(exact_tab); self.similar_tree = self._tree(similar_tab)
+        exact_tab = ttk.Frame(notebook); similar_tab = ttk.Frame(notebook); hardlink_tab = ttk.Frame(notebook); overlap_tab = ttk.Frame(notebook); log_tab = ttk.Frame(notebook)
+        notebook.add(exact_tab, text="تکراری دقیق"); notebook.add(similar_tab, text="نام مشابه"); notebook.add(hardlink_tab, text="پیوند سخت"); notebook.add(overlap_tab, text="هم‌پوشانی محتوا"); notebook.add(log_tab, text="گزارش")
+        self.exact_view, self.similar_view, self.hardlink_view, self.overlap_view = (
+            ResultView(tab, self.fmt_size, self.open_selected) for tab in (exact_tab, similar_tab, hardlink_tab, overlap_tab))
+        self.views = (self.exact_view, self.similar_view, self.hardlink_view, self.overlap_view)
         self.log = tk.Text(log_tab, wrap="word", state="disabled"); self.log.pack(fill="both", expand=True)
         bottom = ttk.Frame(outer); bottom.pack(fill="x", pady=(8, 0))
         ttk.Button(bottom, text="بازکردن فایل", command=self.open_selected).pack(side="left")
@@ -77,27 +85,29 @@ class MainWindow(tk.Tk):
         ttk.Button(parent, text="×", width=3, command=lambda v=variable: v.set("")).grid(row=row, column=3)
         parent.columnconfigure(1, weight=1)
 
-    def _tree(self, parent):
-        cols = ("status", "name", "size", "priority", "path")
-        tree = ttk.Treeview(parent, columns=cols, show="tree headings", selectmode="extended")
-        tree.heading("#0", text="گروه"); widths = (145, 220, 100, 80, 600)
-        labels = ("وضعیت", "نام", "حجم", "اولویت", "مسیر")
-        for col, label, width in zip(cols, labels, widths): tree.heading(col, text=label); tree.column(col, width=width, anchor="w")
-        tree.column("#0", width=70); tree.pack(fill="both", expand=True)
-        tree.bind("<Double-1>", lambda _e: self.open_selected())
-        return tree
-
     def add_folder(self):
         p = filedialog.askdirectory(parent=self)
         if p and p not in self.folder_list.get(0, "end"): self.folder_list.insert("end", p)
     def remove_folder(self):
         for i in reversed(self.folder_list.curselection()): self.folder_list.delete(i)
+    def add_priority(self):
+        p = filedialog.askdirectory(parent=self)
+        if p and p not in self.priority_list.get(0, "end"): self.priority_list.insert("end", p)
+    def move_priority(self, step):
+        chosen = self.priority_list.curselection()
+        if len(chosen) != 1 or not 0 <= chosen[0] + step < self.priority_list.size(): return
+        index = chosen[0]; value = self.priority_list.get(index)
+        self.priority_list.delete(index); self.priority_list.insert(index + step, value); self.priority_list.selection_set(index + step)
+    def priority_folders(self):
+        return list(self.priority_list.get(0, "end"))
     def pick_special(self, variable):
         p = filedialog.askdirectory(parent=self)
         if p: variable.set(p)
 
-    def start_scan(self):
-        roots = list(self.folder_list.get(0, "end"))
+    def start_scan(self, resume=False):
+        info = ScanCheckpoint().info() if resume else None
+        # ادامه روی همان پوشه‌های اسکن قطع‌شده انجام می‌شود، نه فهرست فعلی پنجره.
+        roots = info["roots"] if info else list(self.folder_list.get(0, "end"))
         if not roots:
             return messagebox.showwarning(
                 "پوشه",
@@ -106,72 +116,78 @@ class MainWindow(tk.Tk):
 
         self.last_scan_roots = roots.copy()
         self.cancel_event.clear()
-        self.scan_btn.config(state="disabled")
+        self.scan_btn.config(state="disabled"); self.resume_btn.config(state="disabled")
         self.cancel_btn.config(state="normal")
-        self.progress["value"] = 0; self._clear(); self.status.set("شروع اسکن...")
-        threading.Thread(target=self._scan_worker, args=(roots,), daemon=True).start()
+        self.progress["value"] = 0; self._clear(); self.status.set("ادامه اسکن قبلی از پایان پیمایش پوشه‌ها..." if resume else "شروع اسکن...")
+        threading.Thread(target=self._scan_worker, args=(roots, resume), daemon=True).start()
 
-    def _scan_worker(self, roots):
+    def _scan_worker(self, roots, resume=False):
+        cache = HashCache(batched=self.cfg.batched_cache)
         try:
-            scanner = DuplicateScanner(roots, keep_folder=self.keep_var.get(), priority_folders=[self.priority_var.get()],
+            scanner = DuplicateScanner(roots, keep_folder=self.keep_var.get(), priority_folders=self.priority_folders(),
                 excluded_folders=self.cfg.excluded_folders, excluded_extensions=self.cfg.excluded_extensions,
+                rules=self.cfg.scan_rules, root_rules=self.cfg.root_rules,
                 min_size=self.cfg.min_size_bytes, workers=self.cfg.workers, algorithm=self.cfg.hash_algorithm,
-                include_hidden=self.cfg.include_hidden, progress=lambda p,m: self.events.put(("progress",p,m)), cancel_event=self.cancel_event)
-            result = scanner.scan(self.similar_var.get(), self.cfg.similar_name_threshold)
+                include_hidden=self.cfg.include_hidden, progress=lambda s: self.events.put(("progress", s)), cancel_event=self.cancel_event,
+                pipeline=self.cfg.pipeline_scan, cache=cache,
+                index=FileIndex(trust_dir_mtime=self.cfg.trust_directory_mtime) if self.cfg.incremental_scan else None,
+                verify=self.cfg.verify_mode, backend=self.cfg.hash_backend,
+                mmap_threshold=self.cfg.mmap_threshold_mb * 1024 * 1024, device_workers=self.cfg.device_workers,
+                auto_tune_io=self.cfg.auto_tune_io, overlap=self.cfg.overlap_percent / 100,
+                checkpoint=ScanCheckpoint(interval=self.cfg.checkpoint_interval) if self.cfg.scan_checkpoint or resume else None)
+            result = scanner.scan(self.similar_var.get(), self.cfg.similar_name_threshold, self.cfg.similar_time_budget, resume=resume)
+            cache.close()
             self.events.put(("done", result))
+            if self.cfg.cache_maintenance:
+                # نگه‌داری کش پس از نمایش نتیجه در پس‌زمینه اجرا می‌شود و فقط گزارشش به پنجره می‌آید.
+                CacheMaintenance(max_rows=self.cfg.cache_max_rows, max_bytes=self.cfg.cache_max_mb * 1024 * 1024).start(
+                    scanner.roots, result.files, result.listed_dirs, lambda report: self.events.put(("cache", report)))
         except Cancelled: self.events.put(("cancelled",))
         except Exception as exc: self.events.put(("error", str(exc)))
+        finally: cache.close()
 
     def cancel_scan(self): self.cancel_event.set(); self.status.set("در حال توقف امن...")
     def _poll(self):
         try:
             while True:
                 event = self.events.get_nowait()
-                if event[0] == "progress": self.progress["value"] = event[1]; self.status.set(event[2])
+                if event[0] == "progress": self.progress["value"] = event[1].percent; self.status.set(event[1].message)
                 elif event[0] == "done": self._show(event[1]); self._idle()
-                elif event[0] == "cancelled": self.status.set("اسکن متوقف شد"); self._idle()
+                elif event[0] == "cache": self._log(f"کش: {event[1].stats.rows:,} ردیف، {self.fmt_size(event[1].stats.file_bytes)} | حذف‌شده: {event[1].pruned + event[1].missing:,} کهنه، {event[1].evicted:,} بیرون‌رانده | آزادشده: {self.fmt_size(event[1].freed_bytes)}")
+                elif event[0] == "cancelled": self.status.set("اسکن متوقف شد" + (" — با «ادامه اسکن قبلی» از همین‌جا ادامه بده" if ScanCheckpoint().info() else "")); self._idle()
                 elif event[0] == "error": messagebox.showerror("خطا", event[1]); self._idle()
         except queue.Empty: pass
         self.after(100, self._poll)
-    def _idle(self): self.scan_btn.config(state="normal"); self.cancel_btn.config(state="disabled")
+    def _idle(self):
+        self.scan_btn.config(state="normal"); self.cancel_btn.config(state="disabled")
+        self.resume_btn.config(state="normal" if ScanCheckpoint().info() else "disabled")
     def _clear(self):
-        self.row_paths.clear()
-        for tree in (self.exact_tree, self.similar_tree):
-            for item in tree.get_children(): tree.delete(item)
+        for view in self.views: view.clear()
         self.log.config(state="normal"); self.log.delete("1.0", "end"); self.log.config(state="disabled")
 
     def _show(self, result: ScanResult):
-        self.result = result; self._fill(self.exact_tree, result.duplicate_groups); self._fill(self.similar_tree, result.similar_groups)
-        reclaim = sum(sum(x.size for x in g.suggested_removals) for g in result.duplicate_groups)
-        self.status.set(f"{len(result.duplicate_groups):,} گروه دقیق | {len(result.similar_groups):,} مشابه | قابل آزادسازی: {self.fmt_size(reclaim)}")
-        self._log(f"فایل‌ها: {result.scanned_files:,}\nکاندیدها: {result.candidate_files:,}\nکش: {result.cache_hits:,}\nزمان: {result.elapsed_seconds:.2f} ثانیه\nخطاها: {len(result.errors):,}")
+        self.result = result
+        for view, groups in zip(self.views, (result.duplicate_groups, result.similar_groups, result.hardlink_groups, result.overlap_groups)):
+            view.set_groups(groups)
+        # فقط فضایی شمرده می‌شود که واقعاً آزاد می‌شود؛ پیوندهای سخت نسخه نگه‌دار حسابی ندارند.
+        reclaim = result.reclaimable_bytes
+        self.status.set(f"{len(result.duplicate_groups):,} گروه دقیق | {len(result.similar_groups):,} مشابه | {len(result.hardlink_groups):,} پیوند سخت | {len(result.overlap_groups):,} هم‌پوشان | قابل آزادسازی: {self.fmt_size(reclaim)}")
+        self._log(f"فایل‌ها: {result.scanned_files:,}\nکاندیدها: {result.candidate_files:,}\nکش: {result.cache_hits:,} موفق / {result.cache_misses:,} ناموفق\nزمان: {result.elapsed_seconds:.2f} ثانیه\nخطاها: {len(result.errors):,}")
+        if not result.similar_complete: self._log("جست‌وجوی نام‌های مشابه به سقف زمان رسید و فهرست مشابه‌ها ناقص است؛ سقف را در تنظیمات بیشتر کن."); self.status.set(self.status.get() + " | مشابه‌ها ناقص")
+        if result.changes: self._log(f"تغییرات: {len(result.changes.added):,} جدید | {len(result.changes.removed):,} حذف‌شده | {len(result.changes.modified):,} ویرایش‌شده")
+        if result.skipped: self._log("ردشده با قاعده‌ها:\n" + "\n".join(f"  {rule}: {count:,}" for rule, count in sorted(result.skipped.items(), key=lambda x: -x[1])))
+        if result.metrics: self._log("معیارهای مراحل:\n" + "\n".join(f"  {line}" for line in format_metrics(result.metrics)))
         if result.errors: self._log("\n".join(result.errors[:500]))
 
-    def _fill(self, tree, groups: list[DuplicateGroup]):
-        for index, group in enumerate(groups, 1):
-            parent = tree.insert("", "end", text=f"#{index}", values=("", f"{len(group.files)} فایل", self.fmt_size(group.files[0].size), "", ""))
-            keeper = group.keeper.path
-            protected_paths = {f.path for f in group.files if f.protected}
-            for info in group.files:
-                if info.protected: status, tag, pr = "Keep — محافظت‌شده", "keep", "Keep"
-                elif protected_paths: status, tag, pr = "تکراری", "duplicate", info.priority + 1 if info.priority < 999 else "-"
-                elif info.path == keeper: status, tag, pr = "نگه‌دار", "keep", info.priority + 1 if info.priority < 999 else "-"
-                else: status, tag, pr = ("تکراری" if group.exact else "بررسی"), "duplicate", info.priority + 1 if info.priority < 999 else "-"
-                iid = tree.insert(parent, "end", values=(status, Path(info.path).name, self.fmt_size(info.size), pr, info.path), tags=(tag,))
-                self.row_paths[iid] = info.path
-            tree.item(parent, open=True)
-        tree.tag_configure("keep", background="#e9f7ec"); tree.tag_configure("duplicate", background="#fff0f0")
-
-    def _active_tree(self):
-        return self.similar_tree if self.focus_get() is self.similar_tree else self.exact_tree
+    def _active_view(self):
+        focused = self.focus_get()
+        return next((view for view in self.views if view.tree is focused), self.exact_view)
     def selected_paths(self):
-        tree = self._active_tree(); return [self.row_paths[i] for i in tree.selection() if i in self.row_paths]
+        return self._active_view().selected_paths()
     def select_suggested(self):
         if not self.result: return
-        paths = {f.path for group in self.result.duplicate_groups for f in group.suggested_removals}
-        ids = [iid for iid, p in self.row_paths.items() if p in paths and self.exact_tree.exists(iid)]
-        self.exact_tree.selection_set(ids)
-        if ids: self.exact_tree.focus(ids[0]); self.exact_tree.see(ids[0])
+        count = self.exact_view.select(f.path for group in self.result.duplicate_groups for f in group.suggested_removals)
+        self.exact_view.tree.focus_set(); self.status.set(f"{count:,} فایل انتخاب شد")
 
     def remove_selected(self):
         paths = self.selected_paths()
@@ -181,10 +197,7 @@ class MainWindow(tk.Tk):
                 "فایلی انتخاب نشده است.",
             )
 
-        resolver = PriorityResolver(
-            self.keep_var.get(),
-            [self.priority_var.get()],
-        )
+        resolver = PriorityResolver(self.keep_var.get(), self.priority_folders())
 
         protected = [path for path in paths if resolver.is_protected(path)]
         if protected:
@@ -223,21 +236,37 @@ class MainWindow(tk.Tk):
             backup_root,
             self.cfg.backup_folder_name,
             resolver,
+            journal=self.journal,
+            workers=self.cfg.workers,
+            cache=HashCache(),
         )
-        self.last_moves = moved; self.undo_btn.config(state="normal" if moved else "disabled")
+        self.undo_btn.config(state="normal" if self.journal.last() else "disabled")
         messagebox.showinfo("نتیجه", f"{len(moved)} فایل منتقل شد.\nخطا: {len(errors)}")
         if errors: self._log("\n".join(errors))
-        for iid, path in list(self.row_paths.items()):
-            if any(path == original for original, _ in moved):
-                for tree in (self.exact_tree, self.similar_tree):
-                    if tree.exists(iid): tree.delete(iid)
-                self.row_paths.pop(iid, None)
+        for view in self.views: view.remove(original for original, _ in moved)
+
+    def link_selected(self):
+        paths = self.selected_paths()
+        if not paths or not self.result:
+            return messagebox.showinfo("انتخاب", "فایلی انتخاب نشده است.")
+        if not messagebox.askyesno(
+            "تأیید",
+            f"{len(paths)} فایل با پیوند به نسخه نگه‌دار گروهشان جایگزین شود؟\n\n"
+            "مسیرها همان می‌مانند و فضا بی‌درنگ آزاد می‌شود. فقط گروه‌های تکراری دقیق.",
+        ):
+            return
+        resolver = PriorityResolver(self.keep_var.get(), self.priority_folders())
+        linked, errors = link_duplicates(self.result.duplicate_groups, resolver, mode=self.cfg.link_mode, paths=paths)
+        messagebox.showinfo("نتیجه", f"{len(linked)} فایل جایگزین شد.\nخطا: {len(errors)}")
+        if errors: self._log("\n".join(errors))
+        for view in self.views: view.remove(path for path, _ in linked)
 
     def undo(self):
-        if not self.last_moves: return
-        restored, errors = restore_moves(self.last_moves)
-        self.last_moves = []; self.undo_btn.config(state="disabled")
+        # دفترچه روی دیسک است؛ آخرین دسته حتی پس از بستن برنامه یا قطع وسط کار برمی‌گردد.
+        restored, errors = undo_last(self.journal, HashCache())
+        self.undo_btn.config(state="normal" if self.journal.last() else "disabled")
         messagebox.showinfo("بازگردانی", f"{restored} فایل بازگردانده شد.\nخطا: {len(errors)}")
+        if errors: self._log("\n".join(errors))
     def remove_empty(self):
         roots = list(self.folder_list.get(0, "end")) or self.last_scan_roots
         if not roots:
@@ -279,4 +308,4 @@ class MainWindow(tk.Tk):
         return f"{value:.1f} PB"
     def close(self):
         self.cancel_event.set(); self.cfg.scan_folders = list(self.folder_list.get(0, "end")); self.cfg.keep_folder = self.keep_var.get()
-        self.cfg.priority_folders = [self.priority_var.get()]; self.cfg.detect_similar_names = self.similar_var.get(); self.cfg.window_geometry = self.geometry(); self.cfg.save(); self.destroy()
+        self.cfg.priority_folders = self.priority_folders(); self.cfg.detect_similar_names = self.similar_var.get(); self.cfg.window_geometry = self.geometry(); self.cfg.save(); self.destroy()
@@ -0,0 +1,134 @@
+from __future__ import annotations
+from pathlib import Path
+from tkinter import ttk
+from typing import Callable, Iterable
+from duplicate_finder.models import DuplicateGroup
+
+class ResultView:
+    # ردیف گروه‌ها صفحه‌به‌صفحه هنگام پیمایش ساخته می‌شوند و ردیف فایل‌ها فقط وقتی گروه باز شود.
+    # انتخاب در مدل (مجموعه مسیرها) نگه داشته می‌شود، پس انتخاب و حذف به تعداد ردیف‌های ساخته‌شده
+    # وابسته نیست. شناسه ردیف‌ها از جایگاه گروه و فایل ساخته می‌شود: g{گروه} و g{گروه}:{فایل}.
+    PAGE = 500
+
+    def __init__(self, parent, fmt_size: Callable[[int], str], on_open: Callable[[], None]):
+        self.fmt_size = fmt_size
+        cols = ("status", "name", "size", "priority", "path")
+        frame = ttk.Frame(parent); frame.pack(fill="both", expand=True)
+        self.tree = ttk.Treeview(frame, columns=cols, show="tree headings", selectmode="extended")
+        scroll = ttk.Scrollbar(frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=lambda first, last: (scroll.set(first, last), self._scrolled(last)))
+        self.tree.heading("#0", text="گروه"); widths = (145, 220, 100, 80, 600)
+        labels = ("وضعیت", "نام", "حجم", "اولویت", "مسیر")
+        for col, label, width in zip(cols, labels, widths): self.tree.heading(col, text=label); self.tree.column(col, width=width, anchor="w")
+        self.tree.column("#0", width=70); scroll.pack(side="right", fill="y"); self.tree.pack(fill="both", expand=True)
+        self.tree.tag_configure("keep", background="#e9f7ec"); self.tree.tag_configure("duplicate", background="#fff0f0")
+        self.tree.bind("<Double-1>", lambda _e: on_open())
+        self.tree.bind("<<TreeviewOpen>>", lambda _e: self._expand(self.tree.focus()))
+        self.tree.bind("<<TreeviewSelect>>", lambda _e: self._sync())
+        self.groups: list[DuplicateGroup] = []
+        self.where: dict[str, list[tuple[int, int]]] = {}
+        self.removed: set[str] = set()
+        self.selected: set[str] = set()
+        self.expanded: set[int] = set()
+        self.shown = 0
+        self._paging = False
+
+    def clear(self) -> None:
+        self.tree.delete(*self.tree.get_children())
+        self.groups, self.where, self.shown = [], {}, 0
+        self.removed.clear(); self.selected.clear(); self.expanded.clear()
+
+    def set_groups(self, groups: list[DuplicateGroup]) -> None:
+        self.clear()
+        self.groups = groups
+        for g, group in enumerate(groups):
+            for pos, f in enumerate(group.files):
+                self.where.setdefault(f.path, []).append((g, pos))
+        self._more()
+
+    def _more(self) -> None:
+        end = min(len(self.groups), self.shown + self.PAGE)
+        for index in range(self.shown, end):
+            group = self.groups[index]
+            shared = f"مشترک: {self.fmt_size(group.shared_bytes)}" if group.shared_bytes else ""
+            self.tree.insert("", "end", iid=f"g{index}", text=f"#{index + 1}",
+                             values=(shared, f"{len(group.files)} فایل", self.fmt_size(group.files[0].size), "", Path(group.keeper.path).name))
+            # فرزند موقت فقط برای نمایش فلش بازشدن است و با باز شدن گروه جایگزین می‌شود.
+            self.tree.insert(f"g{index}", "end", iid=f"g{index}:")
+        self.shown = end
+
+    def _scrolled(self, last: str) -> None:
+        if float(last) > .9 and self.shown < len(self.groups) and not self._paging:
+            self._paging = True
+            self.tree.after_idle(self._page)
+
+    def _page(self) -> None:
+        self._paging = False
+        self._more()
+
+    def _expand(self, iid: str) -> None:
+        if not iid.startswith("g") or ":" in iid:
+            return
+        index = int(iid[1:])
+        if index in self.expanded:
+            return
+        self.expanded.add(index)
+        self.tree.delete(f"{iid}:")
+        group = self.groups[index]
+        keeper = group.keeper.path
+        protected_paths = {f.path for f in group.files if f.protected}
+        removals = {f.path for f in group.suggested_removals}
+        chosen = []
+        for pos, info in enumerate(group.files):
+            if info.path in self.removed:
+                continue
+            priority = "Keep" if info.protected else info.priority + 1 if info.priority < 999 else "-"
+            if info.protected: status, tag = "Keep — محافظت‌شده", "keep"
+            elif info.path == keeper and not protected_paths: status, tag = "نگه‌دار", "keep"
+            elif info.path not in removals: status, tag = "پیوند سخت", "keep"
+            elif protected_paths: status, tag = "تکراری", "duplicate"
+            else: status, tag = ("تکراری" if group.exact else "بررسی"), "duplicate"
+            row = f"{iid}:{pos}"
+            self.tree.insert(iid, "end", iid=row, values=(status, Path(info.path).name, self.fmt_size(info.size), priority, info.path), tags=(tag,))
+            if info.path in self.selected:
+                chosen.append(row)
+        if chosen:
+            self.tree.selection_add(chosen)
+
+    def path(self, iid: str) -> str | None:
+        head, _, pos = iid.partition(":")
+        return self.groups[int(head[1:])].files[int(pos)].path if pos else None
+
+    def _sync(self) -> None:
+        # مسیرهای گروه‌های باز از انتخاب Tk خوانده می‌شوند؛ انتخاب گروه‌های بسته دست نمی‌خورد.
+        visible = {f.path for index in self.expanded for f in self.groups[index].files}
+        picked = {p for p in map(self.path, self.tree.selection()) if p}
+        self.selected = (self.selected - visible) | picked
+
+    def selected_paths(self) -> list[str]:
+        return sorted((p for p in self.selected if p not in self.removed), key=lambda p: self.where[p][0])
+
+    def select(self, paths: Iterable[str]) -> int:
+        self.selected = {p for p in paths if p in self.where and p not in self.removed}
+        rows = [f"g{g}:{pos}" for p in self.selected for g, pos in self.where[p] if g in self.expanded]
+        self.tree.selection_set(rows)
+        first = min((self.where[p][0][0] for p in self.selected), default=None)
+        if first is not None and first < self.shown:
+            self.tree.focus(f"g{first}"); self.tree.see(f"g{first}")
+        return len(self.selected)
+
+    def remove(self, paths: Iterable[str]) -> None:
+        counts: dict[int, int] = {}
+        for path in paths:
+            if path not in self.where or path in self.removed:
+                continue
+            self.removed.add(path)
+            self.selected.discard(path)
+            for index, pos in self.where[path]:
+                counts[index] = counts.get(index, 0) + 1
+                if index in self.expanded:
+                    self.tree.delete(f"g{index}:{pos}")
+        for index in counts:
+            if index < self.shown:
+                left = sum(f.path not in self.removed for f in self.groups[index].files)
+                self.tree.set(f"g{index}", "name", f"{left} فایل")
@@ -1,6 +1,7 @@
 from __future__ import annotations
 import tkinter as tk
 from tkinter import messagebox, ttk
+from duplicate_finder.core.rules import ScanRules
 from duplicate_finder.services import AppConfig
 
 class SettingsDialog(tk.Toplevel):
@@ -8,30 +9,61 @@ class SettingsDialog(tk.Toplevel):
         super().__init__(parent)
         self.config_obj = config
         self.title("تنظیمات")
-        self.geometry("560x430")
-        self.transient(parent); self.grab_set(); self.resizable(False, False)
-        frame = ttk.Frame(self, padding=18); frame.pack(fill="both", expand=True)
+        self.geometry("560x680"); self.minsize(460, 320)
+        self.transient(parent); self.grab_set()
+        # دکمه‌ها بیرون ناحیه پیمایش‌پذیر پایین پنجره می‌مانند تا در هر اندازه صفحه دیده شوند.
+        buttons = ttk.Frame(self, padding=(18, 12)); buttons.pack(side="bottom", fill="x")
+        ttk.Button(buttons, text="ذخیره", command=self.save).pack(side="right")
+        ttk.Button(buttons, text="انصراف", command=self.destroy).pack(side="right", padx=8)
+        canvas = tk.Canvas(self, highlightthickness=0)
+        scroll = ttk.Scrollbar(self, orient="vertical", command=canvas.yview)
+        canvas.configure(yscrollcommand=scroll.set); scroll.pack(side="right", fill="y"); canvas.pack(fill="both", expand=True)
+        frame = ttk.Frame(canvas, padding=18); window = canvas.create_window(0, 0, window=frame, anchor="nw")
+        frame.bind("<Configure>", lambda _e: canvas.configure(scrollregion=canvas.bbox("all")))
+        canvas.bind("<Configure>", lambda e: canvas.itemconfigure(window, width=e.width))
+        self.bind("<MouseWheel>", lambda e: canvas.yview_scroll(-1 if e.delta > 0 else 1, "units"))
         self.workers = tk.IntVar(value=config.workers)
         self.minimum = tk.DoubleVar(value=config.min_size_bytes / 1024 / 1024)
         self.algorithm = tk.StringVar(value=config.hash_algorithm)
         self.hidden = tk.BooleanVar(value=config.include_hidden)
+        self.pipeline = tk.BooleanVar(value=config.pipeline_scan)
+        self.incremental = tk.BooleanVar(value=config.incremental_scan)
         self.extensions = tk.StringVar(value=", ".join(config.excluded_extensions))
         self.threshold = tk.DoubleVar(value=config.similar_name_threshold)
+        self.budget = tk.DoubleVar(value=config.similar_time_budget)
+        self.overlap = tk.IntVar(value=config.overlap_percent)
+        self.verify = tk.StringVar(value=config.verify_mode)
+        self.backend = tk.StringVar(value=config.hash_backend)
+        self.link_mode = tk.StringVar(value=config.link_mode)
+        self.cache_mb = tk.IntVar(value=config.cache_max_mb)
+        self.cache_gc = tk.BooleanVar(value=config.cache_maintenance)
+        self.checkpoint = tk.BooleanVar(value=config.scan_checkpoint)
         controls = [
             ("تعداد پردازش هم‌زمان", ttk.Spinbox(frame, from_=1, to=64, textvariable=self.workers)),
             ("حداقل حجم فایل (MB)", ttk.Entry(frame, textvariable=self.minimum)),
             ("الگوریتم هش", ttk.Combobox(frame, textvariable=self.algorithm, values=("sha256", "blake2b", "md5"), state="readonly")),
             ("پسوندهای مستثنا", ttk.Entry(frame, textvariable=self.extensions)),
             ("آستانه شباهت نام", ttk.Entry(frame, textvariable=self.threshold)),
+            ("سقف زمان نام مشابه (ثانیه)", ttk.Entry(frame, textvariable=self.budget)),
+            ("حداقل هم‌پوشانی محتوا (٪، ۰ = خاموش؛ فقط فایل‌های با ابتدای یکسان)", ttk.Spinbox(frame, from_=0, to=100, textvariable=self.overlap)),
+            ("روش تأیید", ttk.Combobox(frame, textvariable=self.verify, values=("hash", "lockstep", "bytes"), state="readonly")),
+            ("اجرای هش", ttk.Combobox(frame, textvariable=self.backend, values=("thread", "process"), state="readonly")),
+            ("روش پیوند", ttk.Combobox(frame, textvariable=self.link_mode, values=("auto", "reflink", "hardlink"), state="readonly")),
+            ("سقف حجم کش (MB، ۰ = بی‌سقف)", ttk.Spinbox(frame, from_=0, to=1_000_000, increment=64, textvariable=self.cache_mb)),
         ]
         for row, (label, widget) in enumerate(controls):
             ttk.Label(frame, text=label).grid(row=row, column=0, sticky="w", pady=9)
             widget.grid(row=row, column=1, sticky="ew", pady=9)
-        ttk.Checkbutton(frame, text="شامل فایل‌های مخفی", variable=self.hidden).grid(row=6, column=0, columnspan=2, sticky="w")
+        ttk.Checkbutton(frame, text="شامل فایل‌های مخفی", variable=self.hidden).grid(row=11, column=0, columnspan=2, sticky="w")
+        ttk.Checkbutton(frame, text="اسکن هم‌زمان (پیمایش و هش با هم)", variable=self.pipeline).grid(row=12, column=0, columnspan=2, sticky="w")
+        ttk.Checkbutton(frame, text="اسکن افزایشی (پرش از پوشه‌های بدون تغییر)", variable=self.incremental).grid(row=13, column=0, columnspan=2, sticky="w")
+        ttk.Checkbutton(frame, text="نگه‌داری کش پس از اسکن (حذف ردیف‌های کهنه و فشرده‌سازی)", variable=self.cache_gc).grid(row=14, column=0, columnspan=2, sticky="w")
+        ttk.Checkbutton(frame, text="ذخیره نقطه بازیابی برای ادامه اسکن متوقف‌شده (از پایان پیمایش پوشه‌ها به بعد)", variable=self.checkpoint).grid(row=15, column=0, columnspan=2, sticky="w")
+        # هر خط یک قاعده: node_modules/، *.iso، re:...، size:1G..، age:365d..؛ ! یعنی دوباره شامل کن.
+        ttk.Label(frame, text="قاعده‌های رد کردن (هر خط یکی)").grid(row=16, column=0, sticky="nw", pady=9)
+        self.rules = tk.Text(frame, height=5, width=30, wrap="none"); self.rules.grid(row=16, column=1, sticky="ew", pady=9)
+        self.rules.insert("1.0", "\n".join(config.scan_rules))
         frame.columnconfigure(1, weight=1)
-        buttons = ttk.Frame(frame); buttons.grid(row=9, column=0, columnspan=2, sticky="e", pady=24)
-        ttk.Button(buttons, text="انصراف", command=self.destroy).pack(side="left")
-        ttk.Button(buttons, text="ذخیره", command=self.save).pack(side="left", padx=8)
 
     def save(self):
         try:
@@ -39,8 +71,21 @@ class SettingsDialog(tk.Toplevel):
             self.config_obj.min_size_bytes = max(0, int(float(self.minimum.get()) * 1024 * 1024))
             self.config_obj.hash_algorithm = self.algorithm.get()
             self.config_obj.include_hidden = self.hidden.get()
+            self.config_obj.pipeline_scan = self.pipeline.get()
+            self.config_obj.incremental_scan = self.incremental.get()
             self.config_obj.excluded_extensions = [x.strip() for x in self.extensions.get().split(",") if x.strip()]
+            rules = [x.strip() for x in self.rules.get("1.0", "end").splitlines() if x.strip()]
+            ScanRules([""], rules)  # قاعده نادرست همین‌جا خطا می‌دهد، نه هنگام اسکن.
+            self.config_obj.scan_rules = rules
             self.config_obj.similar_name_threshold = min(1.0, max(0.0, float(self.threshold.get())))
+            self.config_obj.similar_time_budget = max(0.0, float(self.budget.get()))
+            self.config_obj.overlap_percent = min(100, max(0, int(self.overlap.get())))
+            self.config_obj.verify_mode = self.verify.get()
+            self.config_obj.hash_backend = self.backend.get()
+            self.config_obj.link_mode = self.link_mode.get()
+            self.config_obj.cache_max_mb = max(0, int(self.cache_mb.get()))
+            self.config_obj.cache_maintenance = self.cache_gc.get()
+            self.config_obj.scan_checkpoint = self.checkpoint.get()
             self.config_obj.save(); self.destroy()
         except Exception as exc:
             messagebox.showerror("تنظیمات", str(exc), parent=self)
@@ -1,4 +1,6 @@
+import multiprocessing
 from duplicate_finder.app import main
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,25 @@
+import os
+from pathlib import Path
+from duplicate_finder.core import PriorityResolver, move_to_backup, undo_last
+from duplicate_finder.services import MoveJournal
+
+def test_moves_resolve_collisions_and_undo_from_journal(tmp_path: Path):
+    root = tmp_path / "root"
+    paths = []
+    for i in range(5):
+        p = root / f"d{i}" / "IMG_0001.jpg"; p.parent.mkdir(parents=True); p.write_text(str(i)); paths.append(str(p))
+    (root / "backup_deleted").mkdir(); (root / "backup_deleted" / "IMG_0001.jpg").write_text("old")
+    moved, errors = move_to_backup(paths, str(root), "backup_deleted", PriorityResolver("", []), journal=MoveJournal(tmp_path / "j.jsonl"))
+    assert not errors and len({dst for _, dst in moved}) == 5
+    assert sorted(os.listdir(root / "backup_deleted")) == ["IMG_0001.jpg"] + [f"IMG_0001_{i}.jpg" for i in range(1, 6)]
+    # دفترچه تازه (مثل اجرای بعدی برنامه) همان دسته را برمی‌گرداند.
+    journal = MoveJournal(tmp_path / "j.jsonl")
+    assert undo_last(journal) == (5, []) and journal.last() is None
+    assert [Path(p).read_text() for p in paths] == [str(i) for i in range(5)]
+def test_undo_after_crash_restores_only_completed_moves(tmp_path: Path):
+    a, b = tmp_path / "a.txt", tmp_path / "b.txt"; a.write_text("a"); b.write_text("b")
+    journal = MoveJournal(tmp_path / "j.jsonl")
+    journal.begin([(str(a), str(tmp_path / "x_a.txt")), (str(b), str(tmp_path / "x_b.txt"))])
+    os.rename(a, tmp_path / "x_a.txt")
+    with open(tmp_path / "j.jsonl", "a") as f: f.write('{"op": "comm')
+    assert undo_last(MoveJournal(tmp_path / "j.jsonl")) == (1, []) and a.read_text() == "a" and b.exists()
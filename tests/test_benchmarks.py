@@ -0,0 +1,22 @@
+from pathlib import Path
+from benchmarks.run import compare
+from benchmarks.synthetic import TreeSpec, ensure_tree
+from duplicate_finder.core import DuplicateScanner
+from duplicate_finder.services import HashCache
+
+def test_synthetic_tree_is_reproducible_and_scannable(tmp_path: Path):
+    spec = TreeSpec(files=120, depth=2, fanout=3, median_size=2048, duplicate_ratio=.3, hardlink_ratio=.05, seed=7)
+    stats = ensure_tree(tmp_path / "a", spec)
+    assert stats.files == 120 and stats.duplicates and stats.same_size and stats.name_variants
+    assert ensure_tree(tmp_path / "a", spec) == stats
+    ensure_tree(tmp_path / "b", spec)
+    listing = lambda root: sorted((p.relative_to(root).as_posix(), p.read_bytes()) for p in root.rglob("*") if p.is_file())
+    assert listing(tmp_path / "a" / "tree") == listing(tmp_path / "b" / "tree")
+    result = DuplicateScanner([str(tmp_path / "a" / "tree")], cache=HashCache(tmp_path / "c.sqlite3")).scan(False)
+    assert result.scanned_files == 120 and result.duplicate_groups
+
+def test_compare_flags_slow_stages():
+    base = {"spec": {}, "counts": {"groups": 1}, "results": {"cold": {"full": {"median": 1.0}, "quick": {"median": .01}}}}
+    now = {"spec": {}, "counts": {"groups": 1}, "results": {"cold": {"full": {"median": 1.5}, "quick": {"median": .03}}}}
+    assert compare(now, base, .2, .05) == ["cold/full: 1.000s -> 1.500s (+50%)"]
+    assert compare({**now, "spec": {"files": 1}}, base, .2, .05)[0].startswith("baseline was recorded")
@@ -0,0 +1,42 @@
+from pathlib import Path
+from duplicate_finder.services import HashCache
+
+def test_batched_cache_prefetches_and_writes_behind(tmp_path: Path):
+    db = tmp_path / "cache.sqlite3"; root = str(tmp_path / "root")
+    plain = HashCache(db); plain.put(f"{root}/a", 1, 1, "sha256", "aa"); plain.put(str(tmp_path / "rootx" / "b"), 1, 1, "sha256", "bb")
+    cache = HashCache(db, batched=True)
+    assert cache.prefetch([root], "sha256") == 1
+    assert cache.get(f"{root}/a", 1, 1, "sha256") == "aa" and cache.get(f"{root}/a", 1, 2, "sha256") is None
+    cache.put(f"{root}/c", 2, 2, "sha256", "cc")
+    assert cache.get(f"{root}/c", 2, 2, "sha256") == "cc"
+    cache.close()
+    assert HashCache(db).get(f"{root}/c", 2, 2, "sha256") == "cc"
+def test_closed_cache_is_not_kept_alive(tmp_path: Path):
+    import gc, weakref
+    cache = HashCache(tmp_path / "cache.sqlite3", batched=True); cache.put("/a", 1, 1, "sha256", "aa"); cache.close()
+    ref = weakref.ref(cache); del cache; gc.collect()
+    assert ref() is None
+def test_tiers_share_validation(tmp_path: Path):
+    cache = HashCache(tmp_path / "cache.sqlite3")
+    cache.put("/a", 1, 1, "sha256", "full"); cache.put("/a", 1, 1, "sha256", "quick", "quick")
+    assert (cache.get("/a", 1, 1, "sha256"), cache.get("/a", 1, 1, "sha256", "quick")) == ("full", "quick")
+    cache.put("/a", 1, 2, "sha256", "quick2", "quick")
+    assert cache.get("/a", 1, 2, "sha256") is None and cache.get("/a", 1, 2, "sha256", "quick") == "quick2"
+def test_repeat_scan_reads_no_files(tmp_path: Path, monkeypatch):
+    from duplicate_finder.core import DuplicateScanner, hash_engine
+    root = tmp_path / "root"; root.mkdir()
+    for name, data in (("a", b"1" * 9), ("b", b"1" * 9), ("c", b"2" * 9)): (root / name).write_bytes(data)
+    scan = lambda: DuplicateScanner([str(root)], cache=HashCache(tmp_path / "c.sqlite3", batched=True)).scan(False)
+    first = scan()
+    monkeypatch.setattr(hash_engine, "open", lambda *a, **k: (_ for _ in ()).throw(AssertionError("read")), raising=False)
+    second = scan()
+    assert len(second.duplicate_groups) == len(first.duplicate_groups) == 1 and not second.errors
+    assert (second.cache_hits, second.cache_misses) == (5, 0)
+def test_prefetch_leaves_partial_fingerprints_on_disk(tmp_path: Path):
+    db = tmp_path / "cache.sqlite3"; root = str(tmp_path / "root")
+    plain = HashCache(db); plain.put(f"{root}/a", 1, 1, "sha256", "aa"); plain.put(f"{root}/a", 1, 1, "sha256", "pp", "partial", (1, 2))
+    cache = HashCache(db, batched=True); cache.prefetch([root], "sha256")
+    assert cache._memory[(f"{root}/a", "sha256")][2] == {"full": "aa"}
+    assert cache.get(f"{root}/a", 1, 1, "sha256", "partial") == "pp" and cache.get(f"{root}/a", 1, 2, "sha256", "partial") is None
+    assert cache.get(f"{root}/b", 1, 1, "sha256", "partial", (1, 2)) == "pp"
+    cache.close()
@@ -0,0 +1,33 @@
+import os
+from pathlib import Path
+from duplicate_finder.core import DuplicateScanner, move_to_backup, PriorityResolver
+from duplicate_finder.services import HashCache
+
+def test_renamed_file_hits_identity(tmp_path: Path):
+    for batched in (False, True):
+        db = tmp_path / f"c{batched}.sqlite3"; root = tmp_path / f"root{batched}"; (root / "a").mkdir(parents=True)
+        for name in ("x", "y"): (root / "a" / name).write_bytes(b"1" * 9)
+        scan = lambda: DuplicateScanner([str(root)], cache=HashCache(db, batched=batched)).scan(False)
+        assert scan().cache_misses == 4
+        (root / "b").mkdir(); os.rename(root / "a" / "x", root / "b" / "moved")
+        second = scan()
+        assert (second.cache_hits, second.cache_misses) == (4, 0) and len(second.duplicate_groups) == 1
+        assert HashCache(db).get(str(root / "b" / "moved"), 9, os.stat(root / "b" / "moved").st_mtime_ns, "sha256") is not None
+
+def test_app_moves_rekey_cache(tmp_path: Path):
+    root = tmp_path / "root"; root.mkdir(); (root / "x").write_bytes(b"1" * 9)
+    cache = HashCache(tmp_path / "c.sqlite3")
+    stat = os.stat(root / "x")
+    cache.put(str(root / "x"), 9, stat.st_mtime_ns, "sha256", "digest")
+    moved, errors = move_to_backup([str(root / "x")], str(root), "backup", PriorityResolver(), cache=cache)
+    assert not errors and cache.get(moved[0][1], 9, stat.st_mtime_ns, "sha256") == "digest"
+    assert cache.get(str(root / "x"), 9, stat.st_mtime_ns, "sha256") is None
+
+def test_prefetched_miss_skips_sql(tmp_path: Path):
+    db = tmp_path / "c.sqlite3"; root = str(tmp_path / "root")
+    HashCache(db).put(f"{root}/a", 9, 1, "sha256", "aa", identity=(1, 2))
+    cache = HashCache(db, batched=True); cache.prefetch([root], "sha256")
+    spent = cache.sql_seconds
+    assert cache.get(f"{root}/b", 9, 1, "sha256", identity=(1, 2)) == "aa"
+    assert cache.get(f"{root}/c", 9, 1, "sha256", identity=(1, 3)) is None and cache.sql_seconds == spent
+    cache.close()
@@ -0,0 +1,32 @@
+import sqlite3
+from pathlib import Path
+from duplicate_finder.models import FileInfo, FileTable
+from duplicate_finder.services import CacheMaintenance, HashCache
+
+def test_prune_evict_and_compact(tmp_path: Path):
+    db = tmp_path / "cache.sqlite3"; root = tmp_path / "root"; root.mkdir(); (root / "a").write_bytes(b"x")
+    cache = HashCache(db)
+    for name in ("a", "gone", "skipped/b"): cache.put(str(root / name), 1, 1, "sha256", name)
+    outside = [str(tmp_path / "elsewhere" / f"f{i}") for i in range(200)]
+    for i, path in enumerate(outside): cache.put(path, 1, 1, "sha256", "x" * 64)
+    with sqlite3.connect(db) as c:
+        c.executemany("UPDATE hashes SET last_seen=? WHERE path=?", [(i, p) for i, p in enumerate(outside)])
+    maintenance = CacheMaintenance(db, max_rows=50, missing_checks=0)
+    assert maintenance.stats().rows == 203 and maintenance.stats().tiers["full"] == 203
+    # پوشه skipped فهرست نشد (مثلاً با قاعده رد شد) و ردیفش هرس نمی‌شود.
+    report = maintenance.run([str(root)], FileTable([FileInfo(str(root / "a"), 1, 1)]), {str(root)})
+    assert (report.pruned, report.evicted, report.stats.rows) == (1, 152, 50)
+    left = {p for p, in sqlite3.connect(db).execute("SELECT path FROM hashes")}
+    assert {str(root / "a"), str(root / "skipped/b")} <= left and outside[-1] in left and outside[0] not in left
+    assert sqlite3.connect(db).execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    missing = CacheMaintenance(db, missing_checks=30)
+    assert missing.drop_missing() == 29 and missing.drop_missing() == 20 and missing.stats().rows == 1
+def test_cache_hits_refresh_last_seen(tmp_path: Path):
+    db = tmp_path / "cache.sqlite3"
+    HashCache(db).put("/r/a", 1, 1, "sha256", "aa")
+    for batched in (False, True):
+        with sqlite3.connect(db) as c: c.execute("UPDATE hashes SET last_seen=0")
+        cache = HashCache(db, batched=batched); cache.prefetch(["/r"], "sha256")
+        assert cache.get("/r/a", 1, 1, "sha256") == "aa"
+        cache.close()
+        assert sqlite3.connect(db).execute("SELECT last_seen FROM hashes").fetchone()[0] > 0
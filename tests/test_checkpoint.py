@@ -0,0 +1,89 @@
+import os
+from pathlib import Path
+import pytest
+from duplicate_finder.core import Cancelled, DuplicateScanner
+from duplicate_finder.services import CheckpointError, HashCache, ScanCheckpoint
+
+def _tree(root: Path):
+    root.mkdir()
+    for i in range(30):
+        (root / f"f{i}.bin").write_bytes(bytes([i % 5]) * (4000 + i % 3))
+
+def _scanner(tmp_path: Path, cache: str, **kw):
+    return DuplicateScanner([str(tmp_path / "root")], workers=1, cache=HashCache(tmp_path / cache),
+                            checkpoint=ScanCheckpoint(tmp_path / "cp.sqlite3", interval=0), **kw)
+
+def _interrupt(scanner: DuplicateScanner, after: int):
+    full, calls = scanner.engine.full, []
+    def limited(info):
+        calls.append(info)
+        if len(calls) > after:
+            raise Cancelled("stop")
+        return full(info)
+    scanner.engine.full = limited
+    with pytest.raises(Cancelled):
+        scanner.scan(False)
+
+def _groups(result):
+    return sorted(sorted(f.path for f in g.files) for g in result.duplicate_groups)
+
+def test_resume_continues_without_walking_or_rehashing(tmp_path: Path):
+    _tree(tmp_path / "root")
+    expected = _groups(DuplicateScanner([str(tmp_path / "root")], cache=HashCache(tmp_path / "ref.sqlite3")).scan(False))
+    _interrupt(_scanner(tmp_path, "a.sqlite3"), 12)
+    info = ScanCheckpoint(tmp_path / "cp.sqlite3").info()
+    assert info["stage"] == "full" and info["files"] == 30
+    os.utime(tmp_path / "root" / "f29.bin", ns=(1, 1))
+    (tmp_path / "root" / "f28.bin").unlink()
+    resumed = _scanner(tmp_path, "b.sqlite3")
+    resumed.enumerate_files = lambda: pytest.fail("resume must not walk again")
+    result = resumed.scan(False, resume=True)
+    metrics = result.metrics
+    # فقط فایل تغییرکرده هش سریع تازه می‌خواهد و ۱۲ هش کامل پیش از توقف دوباره خوانده نمی‌شوند.
+    assert metrics.stage("quick").files == 1 and metrics.stage("full").files == 29 - 12
+    assert result.changes.modified == [str(tmp_path / "root" / "f29.bin")]
+    assert result.changes.removed == [str(tmp_path / "root" / "f28.bin")]
+    survivors = [[p for p in g if not p.endswith("f28.bin")] for g in expected]
+    assert _groups(result) == [g for g in survivors if len(g) > 1]
+    assert ScanCheckpoint(tmp_path / "cp.sqlite3").info() is None
+
+def test_lockstep_resume_skips_settled_groups(tmp_path: Path):
+    _tree(tmp_path / "root")
+    expected = _groups(DuplicateScanner([str(tmp_path / "root")], cache=HashCache(tmp_path / "ref.sqlite3")).scan(False))
+    scanner = _scanner(tmp_path, "a.sqlite3", verify="lockstep")
+    verify, calls = scanner.verifier.verify, []
+    def limited(group):
+        calls.append(group)
+        if len(calls) > 2:
+            raise Cancelled("stop")
+        return verify(group)
+    scanner.verifier.verify = limited
+    with pytest.raises(Cancelled):
+        scanner.scan(False)
+    resumed = _scanner(tmp_path, "b.sqlite3", verify="lockstep")
+    result = resumed.scan(False, resume=True)
+    assert _groups(result) == expected and result.metrics.stage("verify").files < 30
+
+def test_resume_requires_matching_checkpoint(tmp_path: Path):
+    _tree(tmp_path / "root")
+    with pytest.raises(CheckpointError):
+        _scanner(tmp_path, "a.sqlite3").scan(False, resume=True)
+    _interrupt(_scanner(tmp_path, "a.sqlite3"), 3)
+    with pytest.raises(CheckpointError):
+        _scanner(tmp_path, "a.sqlite3", min_size=10).scan(False, resume=True)
+    assert ScanCheckpoint(tmp_path / "cp.sqlite3").info() is not None
+
+def test_change_between_two_interruptions_drops_old_hashes(tmp_path: Path):
+    root = tmp_path / "root"; root.mkdir()
+    data = os.urandom(40_000)
+    for name in ("a.bin", "b.bin"): (root / name).write_bytes(data)
+    first = _scanner(tmp_path, "a.sqlite3", on_group=lambda group: (_ for _ in ()).throw(Cancelled("stop")))
+    with pytest.raises(Cancelled):
+        first.scan(False)
+    (root / "a.bin").write_bytes(os.urandom(40_000)); os.utime(root / "a.bin", ns=(10**18, 10**18))
+    second = _scanner(tmp_path, "b.sqlite3")
+    second.engine.quick = lambda info: (_ for _ in ()).throw(Cancelled("stop"))
+    with pytest.raises(Cancelled):
+        second.scan(False, resume=True)
+    result = _scanner(tmp_path, "c.sqlite3").scan(False, resume=True)
+    assert not result.duplicate_groups and result.changes.modified == []
@@ -0,0 +1,16 @@
+import json, subprocess, sys
+from pathlib import Path
+from duplicate_finder.cli import main
+
+def test_scan_streams_json_lines(tmp_path: Path, capsys):
+    root = tmp_path / "root"; (root / "a").mkdir(parents=True); (root / "b").mkdir()
+    (root / "a" / "x.bin").write_bytes(b"same" * 100); (root / "b" / "y.bin").write_bytes(b"same" * 100)
+    (root / "b" / "z.bin").write_bytes(b"diff" * 100)
+    assert main(["scan", str(root), "--cache", str(tmp_path / "cache.sqlite3"), "--no-similar"]) == 0
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [r["type"] for r in records] == ["duplicate", "summary"]
+    assert {f["path"] for f in records[0]["files"]} == {str(root / "a" / "x.bin"), str(root / "b" / "y.bin")}
+    assert records[1]["scanned_files"] == 3
+def test_cli_does_not_import_tkinter():
+    code = "import sys, duplicate_finder.cli; print('tkinter' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.strip() == "False"
@@ -8,3 +8,8 @@ def test_priority_keeper_without_keep():
     group = DuplicateGroup([f("p2/a", 1), f("p1/a", 0), f("other/a", 999)])
     assert group.keeper.path == "p1/a"
     assert {x.path for x in group.suggested_removals} == {"p2/a", "other/a"}
+def test_hardlinks_of_keeper_are_not_removed_or_counted():
+    link = lambda path, ino, links=2: FileInfo(path, 10, 1, 999, "x", device=1, inode=ino, links=links)
+    group = DuplicateGroup([link("a", 5), link("bb", 5), link("ccc", 6), link("dddd", 7), link("eeeee", 7)])
+    assert [x.path for x in group.suggested_removals] == ["ccc", "dddd", "eeeee"]
+    assert group.reclaimable_bytes == 10
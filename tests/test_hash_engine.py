@@ -0,0 +1,12 @@
+import hashlib
+from pathlib import Path
+from duplicate_finder.core.hash_engine import FULL_BLOCK, QUICK_BLOCK, full_digest, quick_digest
+
+def test_readinto_and_mmap_paths_agree_with_hashlib(tmp_path: Path):
+    data = bytes(range(256)) * (FULL_BLOCK // 128 + 3)
+    path = tmp_path / "big.bin"; path.write_bytes(data)
+    expected = hashlib.sha256(data).hexdigest()
+    assert full_digest(str(path), "sha256") == expected
+    assert full_digest(str(path), "sha256", mmap_threshold=1) == expected
+    quick = hashlib.sha256(data[:QUICK_BLOCK] + data[-QUICK_BLOCK:] + str(len(data)).encode()).hexdigest()
+    assert quick_digest(str(path), len(data), "sha256") == quick
@@ -0,0 +1,19 @@
+import os
+from pathlib import Path
+from duplicate_finder.core import DuplicateScanner, PriorityResolver, link_duplicates
+from duplicate_finder.services import HashCache
+
+def test_suggested_removals_become_links_to_the_keeper(tmp_path: Path):
+    root = tmp_path / "root"; root.mkdir()
+    for name in ("a.bin", "copy_b.bin", "copy_c.bin"):
+        (root / name).write_bytes(b"x" * 5000)
+    result = DuplicateScanner([str(root)], cache=HashCache(tmp_path / "c.sqlite3")).scan(False)
+    changed = next(f for f in result.duplicate_groups[0].files if f.path.endswith("copy_c.bin"))
+    (root / "copy_c.bin").write_bytes(b"z" * 5000); os.utime(changed.path, ns=(changed.modified_ns,) * 2)
+    linked, errors = link_duplicates(result.duplicate_groups, PriorityResolver("", []), mode="auto")
+    assert linked == [(str(root / "copy_b.bin"), str(root / "a.bin"))]
+    assert len(errors) == 1 and "copy_c.bin" in errors[0]
+    assert (root / "copy_b.bin").read_bytes() == b"x" * 5000 and sorted(os.listdir(root)) == ["a.bin", "copy_b.bin", "copy_c.bin"]
+    # بدون پشتیبانی reflink، حالت auto به پیوند سخت برمی‌گردد.
+    reflinked = os.stat(root / "a.bin").st_nlink == 1
+    assert reflinked or os.stat(root / "copy_b.bin").st_ino == os.stat(root / "a.bin").st_ino
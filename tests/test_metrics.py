@@ -0,0 +1,45 @@
+import json
+from pathlib import Path
+from duplicate_finder.cli import main
+from duplicate_finder.core import DuplicateScanner
+from duplicate_finder.core.metrics import MetricsRecorder, format_metrics
+from duplicate_finder.services import HashCache
+
+def _tree(root: Path):
+    root.mkdir()
+    for i in range(40):
+        (root / f"f{i}.bin").write_bytes(bytes([i % 4]) * (5000 + i % 2))
+
+def test_recorder_keeps_slowest_and_utilization():
+    recorder = MetricsRecorder(2, slowest=3)
+    with recorder.stage("full"):
+        for i in range(10):
+            recorder.work("full", f"p{i}", i / 1000, 100)
+    metrics = recorder.result(4, 6, .5)
+    stage = metrics.stage("full")
+    assert (stage.files, stage.bytes_read, metrics.files_opened, metrics.cache_misses) == (10, 1000, 10, 6)
+    assert [x.path for x in metrics.slowest] == ["p9", "p8", "p7"]
+    assert stage.utilization is not None and 0 < stage.utilization <= 1
+    assert json.loads(json.dumps(metrics.as_dict()))["stages"][0]["name"] == "full"
+    assert any("p9" in line for line in format_metrics(metrics))
+
+def test_scan_reports_stage_metrics(tmp_path: Path):
+    _tree(tmp_path / "root")
+    scan = lambda **kw: DuplicateScanner([str(tmp_path / "root")], cache=HashCache(tmp_path / "c.sqlite3"), **kw).scan()
+    metrics = scan(profile={"quick": "sample", "walk": "cprofile"}, profile_dir=tmp_path / "prof").metrics
+    names = [x.name for x in metrics.stages]
+    assert {"walk", "quick", "full", "group", "similar"} <= set(names)
+    assert metrics.stage("quick").files == 40 and metrics.stage("full").bytes_read == 40 * 5000 + 20
+    assert metrics.files_opened == 80 and metrics.cache_misses == 80 and metrics.sqlite_seconds > 0
+    assert set(metrics.profiles) == {"quick", "walk"}
+    assert (tmp_path / "prof" / "quick.folded").exists() and (tmp_path / "prof" / "walk.prof").exists()
+    warm = scan(pipeline=True, verify="lockstep").metrics
+    assert warm.files_opened == 0 and warm.cache_hits == 80
+    assert {"pipeline", "walk", "verify"} <= {x.name for x in warm.stages}
+
+def test_cli_summary_contains_metrics(tmp_path: Path, capsys):
+    _tree(tmp_path / "root")
+    main(["scan", str(tmp_path / "root"), "--cache", str(tmp_path / "c.sqlite3"), "--profile", "full:sample"])
+    out, err = capsys.readouterr()
+    summary = json.loads(out.strip().splitlines()[-1])
+    assert summary["metrics"]["files_opened"] == 80 and "profile full" in err
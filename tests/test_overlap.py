@@ -0,0 +1,22 @@
+import random
+from pathlib import Path
+from duplicate_finder.core import DuplicateScanner
+from duplicate_finder.services import HashCache
+
+def test_truncated_and_appended_copies_overlap(tmp_path: Path):
+    random.seed(5)
+    data = random.randbytes(600_000)
+    root = tmp_path / "root"; root.mkdir()
+    (root / "a.bin").write_bytes(data); (root / "a_copy.bin").write_bytes(data)
+    (root / "b.part").write_bytes(data[:400_000]); (root / "c.log").write_bytes(data + random.randbytes(100_000))
+    (root / "d.bin").write_bytes(random.randbytes(300_000))
+    run = lambda: DuplicateScanner([str(root)], cache=HashCache(tmp_path / "c.sqlite3"), overlap=.5).scan(False)
+    result = run()
+    pairs = sorted(tuple(sorted(Path(f.path).name for f in g.files)) for g in result.overlap_groups)
+    assert pairs == [("a.bin", "b.part"), ("a.bin", "c.log"), ("a_copy.bin", "b.part"), ("a_copy.bin", "c.log"), ("b.part", "c.log")]
+    assert all(0 < g.shared_bytes <= min(f.size for f in g.files) for g in result.overlap_groups)
+    assert [len(g.files) for g in result.duplicate_groups] == [2]
+    # d.bin تکه اول مشترکی ندارد و اثر انگشت کامل نمی‌گیرد.
+    assert {x.name: x.files for x in result.metrics.stages}["partial"] == 4
+    again = run()
+    assert again.cache_misses == 0 and again.metrics.files_opened == 0
@@ -8,3 +8,14 @@ def test_keep_has_absolute_priority(tmp_path: Path):
     assert resolver.value(str(keep / "a.txt")) == -1
     assert resolver.value(str(p1 / "a.txt")) == 0
     assert resolver.value(str(other / "a.txt")) == 999
+
+def test_many_nested_folders_use_best_rank(tmp_path: Path):
+    folders = [tmp_path / f"p{i}" for i in range(40)]
+    for folder in folders: folder.mkdir()
+    inner = folders[5] / "inner"; keep = folders[30] / "keep"; inner.mkdir(); keep.mkdir()
+    resolver = PriorityResolver(str(keep), [str(x) for x in folders] + [str(inner)])
+    assert resolver.value(str(folders[39] / "a")) == 39
+    assert resolver.value(str(inner / "deep" / "a")) == 5
+    assert resolver.value(str(keep / "a")) == -1 and resolver.is_protected(str(keep))
+    assert not resolver.is_protected(str(folders[30] / "a")) and resolver.value(str(tmp_path)) == 999
+    assert PriorityResolver(str(tmp_path), [str(inner)]).value(str(inner / "a")) == -1
@@ -0,0 +1,26 @@
+from pathlib import Path
+from duplicate_finder.core import DuplicateScanner
+from duplicate_finder.core.progress import ProgressReporter
+from duplicate_finder.services import HashCache
+
+def test_updates_are_coalesced_into_snapshots():
+    seen = []
+    reporter = ProgressReporter(seen.append, interval=3600, cache_stats=lambda: (3, 1))
+    reporter.begin("full", "هش کامل", 40, 50, files_total=1000, bytes_total=1000 * 4096)
+    for _ in range(500):
+        reporter.advance("full", 1, 4096)
+    reporter.emit(True)
+    assert len(seen) == 2
+    snapshot = seen[-1]
+    stage = snapshot.stages[0]
+    assert (snapshot.percent, stage.files_done, stage.bytes_done, snapshot.cache_hit_rate) == (65, 500, 500 * 4096, .75)
+    assert stage.files_per_second > 0 and stage.bytes_per_second == stage.files_per_second * 4096
+    assert snapshot.eta_seconds is not None and "هش کامل" in snapshot.message
+def test_scan_streams_snapshots(tmp_path: Path):
+    root = tmp_path / "root"; root.mkdir()
+    for i in range(200):
+        (root / f"f{i}.bin").write_bytes(b"%d" % (i % 10))
+    seen = []
+    DuplicateScanner([str(root)], cache=HashCache(tmp_path / "c.sqlite3"), progress=seen.append).scan(False)
+    assert seen[-1].percent == 100 and len(seen) < 50
+    assert [s.percent for s in seen] == sorted(s.percent for s in seen)
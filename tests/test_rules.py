@@ -0,0 +1,46 @@
+import os, time
+from pathlib import Path
+from duplicate_finder.core import DuplicateScanner
+from duplicate_finder.core.rules import ScanRules, parse_rule
+from duplicate_finder.services import HashCache
+
+def make(path: Path, data: bytes = b"data", age: float = 0):
+    path.parent.mkdir(parents=True, exist_ok=True); path.write_bytes(data)
+    if age: os.utime(path, (time.time() - age, time.time() - age))
+    return path
+
+def test_rules_match_like_gitignore(tmp_path: Path):
+    rules = ScanRules([str(tmp_path)], ["node_modules/", "*.iso", "!keep.iso", "docs/**/*.md", "re:\\.bak\\d*$"]).for_path(str(tmp_path))
+    assert rules.skip_dir(str(tmp_path / "a" / "node_modules"), "a/node_modules", "node_modules")
+    assert not rules.skip_dir(str(tmp_path / "docs"), "docs", "docs") and rules.skip_dir(str(tmp_path / ".git"), ".git", ".git")
+    assert rules.skip_name("x/disk.iso", "disk.iso") is None and rules.skip_name("x/keep.iso", "keep.iso") is not None
+    assert rules.skip_name("docs/a/b/c.md", "c.md") is None and rules.skip_name("other/docs/c.md", "c.md") is not None
+    assert rules.skip_name("a/f.bak12", "f.bak12") is None and rules.skip_name(".hidden", ".hidden") is None
+    assert rules.skipped["node_modules/"] == 1 and rules.skipped["*.iso"] == 1 and rules.skipped[".git/"] == 1
+    ranged = ScanRules([str(tmp_path)], ["*.iso", "size:1G..", "!size:..1K"]).for_path(str(tmp_path))
+    index = ranged.skip_name("a/big.bin", "big.bin")
+    assert ranged.skip_stat(index, 2 << 30, 0) and not ranged.skip_stat(index, 5 << 20, 0)
+    index = ranged.skip_name("a/t.iso", "t.iso")
+    assert ranged.skip_stat(index, 5 << 20, 0) and not ranged.skip_stat(index, 100, 0)
+    assert ranged.skipped == {"size:1G..": 1, "*.iso": 1}
+
+def test_age_range_and_invalid_rule():
+    rule, _ = parse_rule("age:30d..", now=100 * 86400)
+    assert (rule.kind, rule.low, rule.high) == ("mtime", None, 70 * 86400)
+    try:
+        parse_rule("size:10X..")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("invalid unit accepted")
+
+def test_scan_prunes_and_reports_per_root_rules(tmp_path: Path):
+    one, two = tmp_path / "one", tmp_path / "two"
+    make(one / "node_modules" / "pkg" / "a.js"); make(one / "old.txt", age=90 * 86400); make(one / "new.txt")
+    make(two / "node_modules" / "b.js"); make(two / "tmp" / "c.txt")
+    scanner = DuplicateScanner([str(one), str(two)], cache=HashCache(tmp_path / "cache.sqlite3"),
+                               rules=["node_modules/", "age:30d.."], root_rules={str(two): ["!node_modules/", "/tmp/"]})
+    result = scanner.scan(False)
+    found = sorted(os.path.relpath(f.path, tmp_path) for f in result.files)
+    assert found == [os.path.join("one", "new.txt"), os.path.join("two", "node_modules", "b.js")]
+    assert result.skipped == {"node_modules/": 1, "age:30d..": 1, "/tmp/": 1}
@@ -0,0 +1,87 @@
+import os
+from pathlib import Path
+from duplicate_finder.core import DuplicateScanner
+from duplicate_finder.services import HashCache
+
+def make(path: Path, data: bytes = b"data"):
+    path.parent.mkdir(parents=True, exist_ok=True); path.write_bytes(data); return path
+def scanner(tmp_path: Path, roots, **kw):
+    return DuplicateScanner([str(r) for r in roots], cache=HashCache(tmp_path / "cache.sqlite3"), **kw)
+
+def test_enumerate_honors_filters_and_nested_roots(tmp_path: Path):
+    root = tmp_path / "root"
+    keep = [make(root / "a.txt"), make(root / "sub" / "deep" / "b.txt")]
+    make(root / ".hidden.txt"); make(root / "c.tmp"); make(root / "skip" / "d.txt"); make(root / ".git" / "e.txt")
+    os.symlink(keep[0], root / "link.txt")
+    walker = scanner(tmp_path, [root, root / "sub"], excluded_folders=[str(root / "skip")], excluded_extensions=["tmp"])
+    found = walker.enumerate_files()
+    assert sorted(f.path for f in found) == sorted(str(p) for p in keep)
+    assert str(root / "sub" / "deep") in walker.listed and str(root / "skip") not in walker.listed
+def test_pipelined_scan_matches_phased(tmp_path: Path):
+    root = tmp_path / "root"
+    for i in range(30):
+        make(root / f"d{i % 4}" / f"f{i}.bin", (b"%d" % (i % 7)) * (3 + i % 3))
+    phased = scanner(tmp_path, [root], workers=3).scan(False)
+    streamed = []
+    piped = scanner(tmp_path, [root], workers=3, pipeline=True, on_group=streamed.append).scan(False)
+    shape = lambda r: [[f.path for f in g.files] for g in r.duplicate_groups]
+    assert shape(piped) == shape(phased) and piped.duplicate_groups
+    assert (piped.scanned_files, piped.candidate_files) == (phased.scanned_files, phased.candidate_files)
+    assert len(streamed) == len(piped.duplicate_groups)
+def test_incremental_scan_reports_changes(tmp_path: Path):
+    from duplicate_finder.services import FileIndex
+    root = tmp_path / "root"
+    a = make(root / "a.txt"); b = make(root / "sub" / "b.txt"); c = make(root / "gone" / "c.txt")
+    run = lambda: scanner(tmp_path, [root], index=FileIndex(tmp_path / "index.sqlite3")).scan(False)
+    assert sorted(run().changes.added) == sorted(map(str, (a, b, c)))
+    assert not run().changes
+    os.utime(a, ns=(1, 1)); c.unlink(); c.parent.rmdir(); d = make(root / "sub" / "d.txt")
+    changes = run().changes
+    assert (changes.added, changes.removed, changes.modified) == ([str(d)], [str(c)], [str(a)])
+def test_unreadable_directory_keeps_index_entries(tmp_path: Path, monkeypatch):
+    from duplicate_finder.services import FileIndex
+    root = tmp_path / "root"; make(root / "a.txt"); b = make(root / "sub" / "b.txt"); make(root / "sub" / "deep" / "c.txt")
+    run = lambda: scanner(tmp_path, [root], index=FileIndex(tmp_path / "index.sqlite3")).scan(False)
+    run()
+    read = DuplicateScanner._read_dir
+    def locked(self, path):
+        if path == str(b.parent):
+            raise PermissionError("locked")
+        return read(self, path)
+    monkeypatch.setattr(DuplicateScanner, "_read_dir", locked)
+    result = run()
+    assert not result.changes and result.scanned_files == 2 and str(b.parent) not in result.listed_dirs
+    monkeypatch.undo()
+    assert not run().changes and run().scanned_files == 3
+def test_hardlinks_are_hashed_once_and_grouped(tmp_path: Path):
+    root = tmp_path / "root"
+    a = make(root / "a.bin", b"x" * 50); os.link(a, root / "a_link.bin"); make(root / "copy.bin", b"x" * 50)
+    b = make(root / "b.bin", b"y" * 50); os.link(b, root / "b_link.bin")
+    for pipeline in (False, True):
+        result = scanner(tmp_path, [root], pipeline=pipeline).scan(False)
+        assert [len(g.files) for g in result.duplicate_groups] == [3]
+        assert [sorted(Path(f.path).name for f in g.files) for g in result.hardlink_groups] == [["b.bin", "b_link.bin"]]
+        assert result.reclaimable_bytes == 50 and result.candidate_files == 3
+def test_hardlinks_found_when_walk_has_no_identity(tmp_path: Path, monkeypatch):
+    from dataclasses import replace
+    from duplicate_finder.core import scanner as module
+    root = tmp_path / "root"
+    a = make(root / "a.bin", b"x" * 50); os.link(a, root / "a_link.bin"); make(root / "b.bin", b"y" * 60)
+    walk = DuplicateScanner._scan_dir
+    monkeypatch.setattr(module, "_LATE_IDENTITY", True)
+    monkeypatch.setattr(DuplicateScanner, "_scan_dir", lambda self, path: (lambda files, dirs: (
+        [replace(x, device=0, inode=0, links=1) for x in files], dirs))(*walk(self, path)))
+    for pipeline in (False, True):
+        result = scanner(tmp_path, [root], pipeline=pipeline).scan(False)
+        assert not result.duplicate_groups and [len(g.files) for g in result.hardlink_groups] == [2]
+def test_process_backend_matches_thread_backend(tmp_path: Path):
+    root = tmp_path / "root"
+    for i in range(40):
+        make(root / f"d{i % 3}" / f"f{i}.bin", (b"%d" % (i % 5)) * 20)
+    shape = lambda r: [[f.path for f in g.files] for g in r.duplicate_groups]
+    threads = scanner(tmp_path / "t", [root]).scan(False)
+    pooled = scanner(tmp_path / "p", [root], backend="process", workers=2)
+    pooled.backend.batch_files = 3  # بیش از پنجره دسته‌های در راه
+    processes = pooled.scan(False)
+    assert shape(processes) == shape(threads) and len(threads.duplicate_groups) == 5
+    assert {f.digest for g in processes.duplicate_groups for f in g.files} == {f.digest for g in threads.duplicate_groups for f in g.files}
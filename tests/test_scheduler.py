@@ -0,0 +1,19 @@
+import threading, time
+from collections import defaultdict
+from duplicate_finder.core.scheduler import DeviceScheduler
+from duplicate_finder.models import FileInfo
+
+def test_per_device_limits_and_ordering():
+    items = [FileInfo(f"/d{dev}/f{i}", size=i, modified_ns=1, device=dev, inode=i) for dev in (1, 2) for i in range(12)]
+    running, peak, order, lock = defaultdict(int), defaultdict(int), defaultdict(list), threading.Lock()
+    def method(item):
+        with lock:
+            running[item.device] += 1; peak[item.device] = max(peak[item.device], running[item.device]); order[item.device].append(item.size)
+        time.sleep(.005)
+        with lock: running[item.device] -= 1
+        return str(item.size)
+    scheduler = DeviceScheduler(8, limits={1: 1, 2: 4}, auto_tune=False)
+    results = list(scheduler.run(items, method, "full"))
+    assert sorted(x[0].path for x in results) == sorted(x.path for x in items) and all(x[1] for x in results)
+    assert (peak[1], peak[2]) == (1, 4)
+    assert order[1] == sorted(order[1], reverse=True)
@@ -0,0 +1,38 @@
+import random
+from difflib import SequenceMatcher
+from duplicate_finder.core.similarity import find_similar, similar_pairs
+from duplicate_finder.models import FileInfo, FileTable
+
+def test_pairs_match_brute_force():
+    random.seed(7)
+    names = ["".join(random.choice("ab cd") for _ in range(random.randint(1, 14))) for _ in range(300)]
+    for threshold in (.5, .86, .95):
+        neighbors, finished = similar_pairs(names, threshold)
+        expected = {(i, j) for i in range(300) for j in range(i + 1, 300) if SequenceMatcher(None, names[i], names[j]).ratio() >= threshold}
+        assert finished and {(i, j) for i, v in neighbors.items() for j in v} == expected
+def test_pairs_match_brute_force_across_thresholds():
+    random.seed(11)
+    names = ["".join(random.choice("abc") for _ in range(random.randint(1, 36))) for _ in range(150)]
+    names += ["cccbacbcbc", "ccacbaacbcc"]
+    ratios = {(i, j): SequenceMatcher(None, names[i], names[j]).ratio() for i in range(len(names)) for j in range(i + 1, len(names))}
+    for threshold in (.6, .7, .78, .8, .81, .82, .83, .86, .9):
+        neighbors, _ = similar_pairs(names, threshold)
+        assert {(i, j) for i, v in neighbors.items() for j in v} == {pair for pair, ratio in ratios.items() if ratio >= threshold}, threshold
+def test_large_buckets_are_not_skipped():
+    files = [FileInfo(f"/x/report {i:04d}.pdf", 1, 1) for i in range(600)] + [FileInfo("/x/annual summary.pdf", 1, 1), FileInfo("/y/Annual_Summary (2).pdf", 1, 1)]
+    groups, complete = find_similar(FileTable(files), .86)
+    assert complete
+    assert any({x.path for x in g.files} == {"/x/annual summary.pdf", "/y/Annual_Summary (2).pdf"} for g in groups)
+def test_deadline_stops_early():
+    names = [f"img {i:05d}" for i in range(3000)]
+    assert similar_pairs(names, .86, deadline=1e-9)[1] is False
+def test_budget_marks_result_partial():
+    files = [FileInfo(f"/x/img {i:05d}.jpg", 1, 1) for i in range(3000)]
+    assert find_similar(FileTable(files), .86, 1e-9)[1] is False
+def test_only_group_members_become_file_info(monkeypatch):
+    rng = random.Random(3)
+    files = FileTable([FileInfo(f"/x/{''.join(rng.choices('abcdefghijklmnop', k=16))}.txt", 1, 1) for i in range(200)] + [FileInfo("/y/holiday photo.txt", 1, 1), FileInfo("/z/Holiday_Photo (2).txt", 1, 1)])
+    built = []; getitem = FileTable.__getitem__
+    monkeypatch.setattr(FileTable, "__getitem__", lambda self, index: built.append(index) or getitem(self, index))
+    groups, _ = find_similar(files, .86)
+    assert [{x.path for x in g.files} for g in groups] == [{"/y/holiday photo.txt", "/z/Holiday_Photo (2).txt"}] and sorted(built) == [200, 201]
@@ -0,0 +1,11 @@
+from duplicate_finder.models import FileInfo, FileTable
+
+def test_table_round_trips_file_info():
+    files = [FileInfo("/a/b/x.jpg", 10, 1, 2, device=5, inode=7, links=1),
+             FileInfo("/a/b/y\udcff.jpg", 20, 2, 2, device=5, inode=8, links=2),
+             FileInfo("/a/b/z.jpg", 30, 3, -1, device=6, inode=9, links=1),
+             FileInfo("/c/ن.txt", 0, 4, 999, device=5, inode=10, links=1)]
+    table = FileTable(files)
+    assert len(table) == 4 and list(table) == files and table[-2] == files[2]
+    assert table.dirs == ["/a/b", "/c"] and list(table.size) == [10, 20, 30, 0]
+    assert [table.name(i) for i in range(4)] == ["x.jpg", "y\udcff.jpg", "z.jpg", "ن.txt"]
@@ -0,0 +1,27 @@
+import threading
+from pathlib import Path
+from duplicate_finder.core.hash_engine import HashEngine
+from duplicate_finder.core.verify import LockstepVerifier
+from duplicate_finder.models import FileInfo
+from duplicate_finder.services import HashCache
+
+def files(tmp_path: Path, contents):
+    out = []
+    for i, data in enumerate(contents):
+        p = tmp_path / f"f{i}"; p.write_bytes(data); out.append(FileInfo(str(p), len(data), p.stat().st_mtime_ns))
+    return out
+def groups(result): return sorted(sorted(Path(x.path).name for x in g) for g in result)
+
+def test_lockstep_splits_and_digests_match_full_hash(tmp_path: Path):
+    engine = HashEngine("sha256", HashCache(tmp_path / "c.sqlite3"), threading.Event())
+    items = files(tmp_path, [b"aaaabbbbcccc", b"aaaabbbbcccc", b"aaaaXbbbcccc", b"aaaabbbbccc!", b"aaaabbbbccc!"])
+    for mode in (False, True):
+        result = LockstepVerifier(engine, [], byte_compare=mode, chunk_size=4).verify(items)
+        assert groups(result) == [["f0", "f1"], ["f3", "f4"]]
+    first = next(g for g in result if g[0].path == items[0].path or g[1].path == items[0].path)
+    assert {x.digest for x in first} == {engine.full(items[0])}
+def test_large_groups_are_confirmed_in_windows(tmp_path: Path):
+    engine = HashEngine("sha256", HashCache(tmp_path / "c.sqlite3"), threading.Event())
+    items = files(tmp_path, [b"same"] * 7 + [b"diff"])
+    result = LockstepVerifier(engine, [], byte_compare=True, chunk_size=2, max_open=3).verify(items)
+    assert groups(result) == [[f"f{i}" for i in range(7)]]